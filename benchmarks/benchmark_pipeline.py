@@ -0,0 +1,234 @@
+"""
+Benchmark del pipeline completo sobre un corpus sintético (no requiere OneDrive ni archivos reales).
+
+Genera, bajo una raíz temporal, los libros de Excel de HC, datos adicionales, puestos, entrenamiento y cobertura,
+los CSV de Roster y Faltas, y constancias SAT, SMS y AVSEC en PDF (individuales y agrupadas). Después ejecuta
+'run_hc_etl', 'generador_lista_archivos_no_excluidos' y 'run_pdf_etl' y reporta el tiempo, el rendimiento
+(filas/s, archivos/s, páginas/s) y el pico de memoria residente del proceso al terminar cada etapa.
+
+Uso: python benchmarks/benchmark_pipeline.py --empleados 500 --constancias 300 --agrupados 10 --paginas-por-agrupado 25
+"""
+import sys
+import os
+import json
+import random
+import shutil
+import argparse
+import tempfile
+import contextlib
+from datetime import datetime
+
+import fitz
+import pandas as pd
+
+# Obtener la ruta de la carpeta raíz del proyecto para importar el paquete 'src' (igual que src/main.py)
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.config import Config
+from src.etl_bd_hc import run_hc_etl
+from src.generador_lista_no_excluidos import generador_lista_archivos_no_excluidos
+from src.etl_pdf_entrenamiento import run_pdf_etl, preparar_contexto_hc
+from src.metricas import iniciar_metricas, medir, guardar_reporte_metricas
+
+_NOMBRES = ['JUAN', 'MARIA', 'JOSE ANGEL', 'ANA', 'LUIS', 'SOFIA', 'PEDRO', 'LAURA', 'ALEJANDRO', 'ROSA',
+            'CARLOS', 'ELENA', 'MIGUEL', 'PATRICIA', 'JORGE', 'DIANA', 'RICARDO', 'ADRIANA', 'FERNANDO', 'KARLA']
+_APELLIDOS = ['GARCIA', 'LOPEZ', 'MARTINEZ', 'HERNANDEZ', 'PEREZ', 'GONZALEZ', 'GOMEZ', 'DIAZ', 'REYES', 'CRUZ',
+              'MORALES', 'ORTIZ', 'RAMIREZ', 'TORRES', 'FLORES', 'RIVERA', 'VARGAS', 'CASTILLO', 'MENDOZA', 'SALAZAR']
+_PUESTOS = {'agente de rampa': 'RAMPA', 'operador': 'OPERADOR', 'asc': 'ASC', 'supervisor': 'SUPERVISOR'}
+_MESES = ['enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio', 'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre']
+_INSTRUCTORES = ['Maria Lopez Ruiz', 'Carlos Vargas Torres', 'Elena Rivera Flores']
+
+# --- 1. GENERACIÓN DEL CORPUS SINTÉTICO ---
+def _nombre_empleado(i: int) -> tuple:
+    """(nombre, paterno, materno) único para cada índice (hasta 8000 empleados)."""
+    return _NOMBRES[i % 20], _APELLIDOS[(i // 20) % 20], _APELLIDOS[(i // 400) % 20]
+
+def _sufijo_letras(i: int) -> str:
+    """Índice en letras ('A', 'B', ..., 'BA'...): los nombres de archivo no deben contener años excluidos como '2019'."""
+    letras = ''
+    while True:
+        letras = chr(65 + i % 26) + letras
+        i //= 26
+        if i == 0:
+            return letras
+
+def generar_libros_hc(config: Config, n_empleados: int, rnd: random.Random) -> pd.DataFrame:
+    """Escribe con openpyxl los libros de Excel y los CSV (Roster y Faltas) que lee 'run_hc_etl'. Retorna el maestro HC."""
+    for carpeta in [os.path.dirname(ruta) for ruta in config.hc_etl_files.values()] + list(config.hc_etl_folders.values()):
+        os.makedirs(carpeta, exist_ok=True)
+
+    empleados = []
+    for i in range(n_empleados):
+        nombre, paterno, materno = _nombre_empleado(i)
+        empleados.append({'ID': 1000 + i, 'PATERNO': paterno, 'MATERNO': materno, 'NOMBRE': nombre, 'RFC': f"RFC{i}", 'CURP': f"CURP{i}",
+                          'TELEFONO': f"81 {i:04d}", 'ESTATUS': 'BAJA' if i % 9 == 0 else 'ALTA', 'AREA': 'OPS',
+                          'PUESTO': rnd.choice(list(_PUESTOS)), 'NOVEDADES / COMENTARIOS': '', 'FECHA NACIMIENTO': '01/02/1990',
+                          'FECHAALTA': f"{1 + i % 28:02d}/03/2023", 'FECHA BAJA': '', 'FECHA ANTIGUEDAD': '01/03/2023'})
+    df_hc = pd.DataFrame(empleados)
+    df_bajas = pd.DataFrame({'ID': df_hc.loc[df_hc['ESTATUS'] == 'BAJA', 'ID'], 'FECHA DE BAJA': '05/06/2024', 'MOTIVO': 'renuncia', 'CAUSA': 'personal'})
+    with pd.ExcelWriter(config.hc_etl_files['FILE_MAESTRO_HC'], engine='openpyxl') as writer:
+        df_hc.to_excel(writer, sheet_name=config.hc_etl_sheets_names['MAESTRO_HC'], index=False)
+        df_bajas.to_excel(writer, sheet_name=config.hc_etl_sheets_names['BAJAS_HC'], index=False)
+
+    df_adicionales = pd.DataFrame({'#EMP': df_hc['ID'], 'DIRECCION': 'CALLE 1', 'CORREO ELECTRONICO': [f"empleado{i}@correo.com" for i in range(n_empleados)]})
+    df_adicionales.to_excel(config.hc_etl_files['FILE_DATOS_ADICIONALES_HC'], sheet_name=config.hc_etl_sheets_names['DATOS_ADICIONALES_HC'], index=False, engine='openpyxl')
+
+    df_puestos = pd.DataFrame({'POSICIÓN VH': list(_PUESTOS), 'CARGO HOMOLOGADO': list(_PUESTOS.values()), 'AREA': 'OPS', 'HORAS DIARIAS': 8})
+    df_puestos.to_excel(config.hc_etl_files['FILE_PUESTOS'], sheet_name='Hoja1', index=False, engine='openpyxl')
+
+    n_registros = n_empleados * 2
+    df_entrenamiento = pd.DataFrame({'#EMP': [1000 + rnd.randrange(n_empleados) for _ in range(n_registros)],
+                                     'CURSO': [rnd.choice(['SAT', 'AVSEC', 'SMS', 'OTRO']) for _ in range(n_registros)],
+                                     'FECHA CONSTANCIA': '01/01/2025', 'FECHA VIGENCIA': '01/01/2026',
+                                     'FECHA PROGRAMADA': [f"{1 + k % 28:02d}/02/2025" for k in range(n_registros)],
+                                     'ESTATUS VIGENCIA': [rnd.choice(['VIGENTE', 'VENCIDO', 'POR VENCER']) for _ in range(n_registros)]})
+    df_programacion = pd.DataFrame({'#EMP': df_entrenamiento['#EMP'], 'CURSO': df_entrenamiento['CURSO'], 'FECHA PROGRAMADA': df_entrenamiento['FECHA PROGRAMADA'],
+                                    'ASISTENCIA': [rnd.choice(['ASISTIO', 'FALTO']) for _ in range(n_registros)], 'MOTIVO': ''})
+    with pd.ExcelWriter(config.hc_etl_files['FILE_ENTRENAMIENTO'], engine='openpyxl') as writer:
+        df_entrenamiento.to_excel(writer, sheet_name=config.hc_etl_sheets_names['ENTRENAMIENTO'], index=False, startrow=8)
+        df_programacion.to_excel(writer, sheet_name=config.hc_etl_sheets_names['PROGRAMACION'], index=False, startrow=5)
+
+    df_cobertura = pd.DataFrame({'CARGO': list(_PUESTOS.values()), 'REQUERIDO': [10, 4, 3, 2], 'MES': [1, 2, 3, 4], 'AÑO': 2025})
+    df_cobertura.to_excel(config.hc_etl_files['FILE_COBERTURA'], sheet_name=config.hc_etl_sheets_names['COBERTURA_REQUERIDO'], index=False, engine='openpyxl')
+
+    # Roster y Faltas: CSV con tres líneas de encabezado previas, como los exporta el sistema de origen
+    for mes in ['enero', 'febrero']:
+        df_roster = pd.DataFrame({'ID': df_hc['ID'], **{f"D{k}": [rnd.choice(['03AT', '12AT', '21 AT']) for _ in range(n_empleados)] for k in range(9)}})
+        with open(os.path.join(config.hc_etl_folders['FOLDER_ROSTER'], f"Roster_{mes}_2025.csv"), 'w', encoding=config.hc_etl_csv_encoding, newline='') as f:
+            f.write('Reporte\nRoster\nPeriodo\n')
+            df_roster.to_csv(f, index=False)
+    for k in range(2):
+        df_faltas = pd.DataFrame({'TRABAJADOR': [1000 + rnd.randrange(n_empleados) for _ in range(n_empleados)], 'FECHAFALTA': '03/04/2025',
+                                  'CLAVE': [rnd.choice(['FIJ', 'PER']) for _ in range(n_empleados)],
+                                  'CONCEPTO': [rnd.choice(['falta injustificada', 'permiso']) for _ in range(n_empleados)]})
+        with open(os.path.join(config.hc_etl_folders['FOLDER_RELOJ_CHECADOR'], f"faltas_{k}.csv"), 'w', encoding=config.hc_etl_csv_encoding, newline='') as f:
+            f.write('Reporte\nFaltas\nPeriodo\n')
+            df_faltas.to_csv(f, index=False)
+    return df_hc
+
+def _texto_constancia(tipo: str, nombre: str, rnd: random.Random) -> str:
+    """Texto de una constancia con la estructura que reconoce 'extraer_datos_constancia' para cada tipo."""
+    fecha = f"{rnd.randint(1, 28)} de {rnd.choice(_MESES)} de 2025"
+    instructor = rnd.choice(_INSTRUCTORES)
+    if tipo == 'SAT':
+        return (f"Otorga la presente constancia a:\n{nombre}\nPor haber concluido satisfactoriamente el curso\n"
+                f"Servicio de Apoyo en Tierra Agente de Rampa\nImpartido en Monterrey, N.L. el {fecha}\nDuración: 8 horas\n"
+                f"{instructor}\nInstructor\nGrupo: SAT-{rnd.randint(1, 999):03d}-25")
+    if tipo == 'SMS':
+        return (f"Grants this recognition to:\n{nombre}\nPor haber concluido satisfactoriamente el curso\n"
+                f"Safety Management System (SMS)\nImpartido el {fecha}\nSMS-N-{rnd.randint(1, 999):03d}-25\n{instructor}\nInstructor")
+    return (f"{nombre}\nImpartido en Ciudad de Mexico el {fecha}\nPor haber concluido satisfactoriamente el curso\n"
+            f"Seguridad de la Aviación Civil\nDuración de: 8 horas\nGrupo: AVSEC-{rnd.randint(1, 999):04d}-25\n{instructor}\nInstructor")
+
+def _agregar_pagina(doc, texto: str):
+    pagina = doc.new_page()
+    pagina.insert_text((50, 72), texto, fontsize=11)
+
+def generar_constancias_pdf(config: Config, df_hc: pd.DataFrame, n_individuales: int, n_agrupados: int, paginas_por_agrupado: int, rnd: random.Random) -> int:
+    """
+    Genera con PyMuPDF constancias individuales (una página, en la tercera carpeta fuente) y PDFs agrupados
+    (varias constancias por archivo, en la primera carpeta fuente). Retorna el total de páginas generadas.
+    """
+    carpeta_agrupados, carpeta_individuales = config.source_folders_pdfs[0], config.source_folders_pdfs[2]
+    os.makedirs(carpeta_agrupados, exist_ok=True)
+    os.makedirs(carpeta_individuales, exist_ok=True)
+    nombres = (df_hc['NOMBRE'] + ' ' + df_hc['PATERNO'] + ' ' + df_hc['MATERNO']).tolist()
+
+    for i in range(n_individuales):
+        tipo, nombre = rnd.choice(['SAT', 'SMS', 'AVSEC']), rnd.choice(nombres)
+        doc = fitz.open()
+        _agregar_pagina(doc, _texto_constancia(tipo, nombre, rnd))
+        doc.save(os.path.join(carpeta_individuales, f"{tipo} 2025 {nombre} {_sufijo_letras(i)}.pdf"))
+        doc.close()
+
+    for i in range(n_agrupados):
+        doc = fitz.open()
+        for _ in range(paginas_por_agrupado):
+            _agregar_pagina(doc, _texto_constancia(rnd.choice(['SAT', 'SMS', 'AVSEC']), rnd.choice(nombres), rnd))
+        doc.save(os.path.join(carpeta_agrupados, f"Constancias agrupadas {_sufijo_letras(i)}.pdf"))
+        doc.close()
+    return n_individuales + n_agrupados * paginas_por_agrupado
+
+# --- 2. EJECUCIÓN Y REPORTE ---
+def _paso(reporte: dict, ruta: str) -> dict:
+    return next((paso for paso in reporte['pasos'] if paso['paso'] == ruta), {})
+
+def _por_segundo(cantidad, segundos):
+    return round(cantidad / segundos, 1) if cantidad and segundos else None
+
+def ejecutar_benchmark(raiz: str, n_empleados: int, n_individuales: int, n_agrupados: int, paginas_por_agrupado: int, semilla: int = 0, verbose: bool = False) -> dict:
+    """Genera el corpus bajo 'raiz', ejecuta las tres etapas y retorna los resultados por etapa."""
+    rnd = random.Random(semilla)
+    config = Config(user_home=raiz)
+    df_hc = generar_libros_hc(config, n_empleados, rnd)
+    total_paginas = generar_constancias_pdf(config, df_hc, n_individuales, n_agrupados, paginas_por_agrupado, rnd)
+    print(f"Corpus sintético generado en '{raiz}': {n_empleados} empleados, {n_individuales} constancias individuales, "
+          f"{n_agrupados} PDFs agrupados de {paginas_por_agrupado} páginas ({total_paginas} páginas en total).")
+
+    # La salida de los ETL se descarta salvo con --verbose; las métricas se toman de 'metricas.py'
+    iniciar_metricas()
+    with contextlib.ExitStack() as pila:
+        if not verbose:
+            pila.enter_context(contextlib.redirect_stdout(pila.enter_context(open(os.devnull, 'w', encoding='utf-8'))))
+        with medir('ETL HC'):
+            df_hc_tabla = run_hc_etl(config)[0]
+        with medir('Lista PDFs no excluidos'):
+            generador_lista_archivos_no_excluidos(config)
+        with medir('ETL Constancias PDF', archivos=total_paginas):
+            run_pdf_etl(config, contexto_hc=preparar_contexto_hc(df_hc_tabla, config))
+        reporte = guardar_reporte_metricas(config)
+
+    hc, lista, pdf = _paso(reporte, 'ETL HC'), _paso(reporte, 'Lista PDFs no excluidos'), _paso(reporte, 'ETL Constancias PDF')
+    filas_leidas_hc = sum(paso.get('filas_salida', 0) for paso in reporte['pasos'] if paso['paso'] in ('ETL HC / lectura_excel', 'ETL HC / lectura_csv'))
+    filas_exportadas_hc = _paso(reporte, 'ETL HC / exportacion').get('filas_entrada', 0)
+    constancias = _paso(reporte, 'ETL Constancias PDF / merge_hc').get('filas_entrada', 0)
+    return {
+        'fecha': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'parametros': {'empleados': n_empleados, 'constancias_individuales': n_individuales, 'agrupados': n_agrupados,
+                       'paginas_por_agrupado': paginas_por_agrupado, 'semilla': semilla},
+        'etapas': {
+            'run_hc_etl': {'tiempo_s': hc.get('tiempo_s'), 'cpu_s': hc.get('cpu_s'), 'rss_pico_proceso_mb': hc.get('rss_pico_proceso_mb'),
+                           'filas_leidas': filas_leidas_hc, 'filas_exportadas': filas_exportadas_hc,
+                           'filas_por_s': _por_segundo(filas_leidas_hc + filas_exportadas_hc, hc.get('tiempo_s'))},
+            'generador_lista_archivos_no_excluidos': {'tiempo_s': lista.get('tiempo_s'), 'cpu_s': lista.get('cpu_s'), 'rss_pico_proceso_mb': lista.get('rss_pico_proceso_mb'),
+                                                      'archivos': lista.get('archivos'), 'archivos_por_s': _por_segundo(lista.get('archivos'), lista.get('tiempo_s'))},
+            'run_pdf_etl': {'tiempo_s': pdf.get('tiempo_s'), 'cpu_s': pdf.get('cpu_s'), 'rss_pico_proceso_mb': pdf.get('rss_pico_proceso_mb'),
+                            'paginas': total_paginas, 'paginas_por_s': _por_segundo(total_paginas, pdf.get('tiempo_s')),
+                            'constancias_extraidas': constancias, 'filas_por_s': _por_segundo(constancias, pdf.get('tiempo_s'))},
+        },
+        'pasos': reporte['pasos'],
+        'rss_pico_proceso_mb': reporte['rss_pico_proceso_mb'],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline ETL sobre un corpus sintético.")
+    parser.add_argument('--empleados', type=int, default=500, help="Empleados en el maestro HC (máximo 8000).")
+    parser.add_argument('--constancias', type=int, default=300, help="Constancias PDF individuales.")
+    parser.add_argument('--agrupados', type=int, default=10, help="PDFs agrupados.")
+    parser.add_argument('--paginas-por-agrupado', type=int, default=25, help="Constancias (páginas) por PDF agrupado.")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--raiz', help="Carpeta donde generar el corpus (por defecto, una carpeta temporal que se elimina al terminar).")
+    parser.add_argument('--salida', help="Ruta del JSON de resultados.")
+    parser.add_argument('--verbose', action='store_true', help="Muestra la salida de los ETL.")
+    args = parser.parse_args()
+
+    raiz = args.raiz or tempfile.mkdtemp(prefix='benchmark_etl_')
+    try:
+        resultados = ejecutar_benchmark(raiz, min(args.empleados, 8000), args.constancias, args.agrupados, args.paginas_por_agrupado, args.semilla, args.verbose)
+    finally:
+        if not args.raiz:
+            shutil.rmtree(raiz, ignore_errors=True)
+
+    print(f"\n{'Etapa':<40}{'Tiempo (s)':>12}{'CPU (s)':>10}{'RSS pico proceso (MB)':>23}  Rendimiento")
+    for etapa, datos in resultados['etapas'].items():
+        rendimiento = ', '.join(f"{clave} {valor}" for clave, valor in datos.items() if clave.endswith('_por_s'))
+        print(f"{etapa:<40}{datos['tiempo_s'] or 0:>12.2f}{datos['cpu_s'] or 0:>10.2f}{datos['rss_pico_proceso_mb'] or 0:>23.1f}  {rendimiento}")
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados guardados en '{args.salida}'.")
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,9 @@ class Config:
     """
     Clase para centralizar y gestionar todas las configuraciones y rutas ETL.
     """
-    def __init__(self):
-        # Rutas base del usuario y OneDrive
-        self.user_home = os.path.expanduser("~")
+    def __init__(self, user_home: str = None):
+        # Rutas base del usuario y OneDrive ('user_home' permite ejecutar contra otra raíz, p. ej. el benchmark sintético)
+        self.user_home = user_home or os.path.expanduser("~")
         self.onedrive_org_name = 'OneDrive - Vivaaerobus'
         self.onedrive_shared_base_path = os.path.join(self.user_home, self.onedrive_org_name)
 
@@ -38,6 +38,9 @@ class Config:
             "FOLDER_RELOJ_CHECADOR": os.path.join(self.sharepoint_coordinator_folder, 'Faltas'),
             "FOLDER_ROSTER": os.path.join(self.sharepoint_training_folder, 'Roster'),
         }
+        # Codificación de los CSV de Roster y Faltas (exportados desde Excel en Windows con la página de códigos ANSI);
+        # 'ansi' solo existe en Windows, en otros sistemas se usa su equivalente cp1252.
+        self.hc_etl_csv_encoding = 'ansi' if os.name == 'nt' else 'cp1252'
         self.hc_etl_sheets_names = {
             "MAESTRO_HC": 'BASE DE DATOS',
             "DATOS_ADICIONALES_HC": 'Datos',
@@ -57,6 +60,13 @@ class Config:
             "AUSENTISMO_TABLE": 'ausentismo_table.csv',
             "COBERTURA_TABLE": 'cobertura_table.csv',
         }
+        # Exportación de las tablas del dashboard: el CSV se mantiene como formato de compatibilidad y,
+        # opcionalmente, se escribe también un Parquet tipado (misma ruta con extensión '.parquet').
+        self.dashboard_tables_export = {
+            "PARQUET": True,
+            "COMPRESION_PARQUET": 'snappy',
+            "MAX_WORKERS": 8,
+        }
         # Ruta a hc_table.csv (salida de etl_bd_hc, entrada para etl_pdf_entrenamiento)
         self.hc_table_path = os.path.join(self.dashboard_tables_folder, self.hc_etl_out_filenames['HC_TABLE'])
 
@@ -68,6 +78,10 @@ class Config:
             "LIST_NEW_NON_EXCLUDED_PDFS": 'lista_pdfs_nuevos_no_excluidos.txt',
             "XLSX_CONSTANCIAS_SIN_EMP": 'datos_constancias_sin_emp.xlsx',
             "CSV_CONSTANCIAS_SIN_EMP": 'datos_constancias_sin_emp.csv',
+            "CSV_CONSTANCIAS_PENDIENTES": 'constancias_pendientes_emp.csv',
+            "CSV_MANIFIESTO_PUBLICACION": 'manifiesto_publicacion_pdfs.csv',
+            "JSON_COLA_REINTENTOS": 'cola_reintentos_archivos.json',
+            "JSONL_CHECKPOINT_EXTRACCION": 'checkpoint_extraccion.jsonl',
         }
 
         # Rutas para salidas del ETL de PDF (carpeta local de datos procesados)
@@ -77,13 +91,70 @@ class Config:
         self.outpath_list_new_non_excluded_pdfs = os.path.join(self.data_processed_folder, self.pdf_etl_output_filenames['LIST_NEW_NON_EXCLUDED_PDFS'])
         self.outpath_xlsx_constancias_sin_emp = os.path.join(self.data_processed_folder, self.pdf_etl_output_filenames['XLSX_CONSTANCIAS_SIN_EMP'])
         self.outpath_csv_constancias_sin_emp = os.path.join(self.data_processed_folder, self.pdf_etl_output_filenames['CSV_CONSTANCIAS_SIN_EMP'])
+        # Cola persistente de constancias sin '#emp': se vuelven a asociar contra HC en cada ejecución (sin leer los PDFs).
+        # Sus PDFs (incluidas las páginas de agrupados) se conservan en 'pending_pdfs_folder' hasta que se asocian.
+        self.outpath_csv_constancias_pendientes = os.path.join(self.data_processed_folder, self.pdf_etl_output_filenames['CSV_CONSTANCIAS_PENDIENTES'])
+        self.pending_pdfs_folder = os.path.join(self.data_processed_folder, 'constancias_pendientes_emp')
+        # Manifiesto de PDFs publicados en la carpeta sincronizada (destino, hash de origen, tamaño y mtime):
+        # las copias cuyo origen no cambió se omiten para no provocar nuevas subidas de OneDrive.
+        self.outpath_csv_manifiesto_publicacion = os.path.join(self.data_processed_folder, self.pdf_etl_output_filenames['CSV_MANIFIESTO_PUBLICACION'])
+        # Cola persistente de operaciones de archivos bloqueadas; las páginas temporales que esperan copia se conservan en 'retry_pdfs_folder'
+        self.outpath_json_cola_reintentos = os.path.join(self.data_processed_folder, self.pdf_etl_output_filenames['JSON_COLA_REINTENTOS'])
+        self.retry_pdfs_folder = os.path.join(self.data_processed_folder, 'reintentos_pdfs')
+        # Checkpoint de extracción: los archivos fuente ya extraídos se confirman en lotes; si la ejecución falla, la
+        # siguiente reanuda desde el último lote (conserva 'temp_split_pdfs'). Se elimina al terminar la ejecución.
+        self.outpath_checkpoint_extraccion = os.path.join(self.data_processed_folder, self.pdf_etl_output_filenames['JSONL_CHECKPOINT_EXTRACCION'])
+        self.checkpoint_extraccion = {
+            "HABILITADO": True,
+            "REANUDAR": True, # False descarta el checkpoint y vuelve a extraer todo
+            "TAMANO_LOTE": 25, # Archivos fuente por lote confirmado (fsync)
+        }
+        # Historial canónico de constancias: Parquet particionado por año ('anio=AAAA.parquet'), se actualiza solo con
+        # los registros nuevos. 'datos_constancias.xlsx' y '.csv' se regeneran desde aquí como exportaciones derivadas.
+        self.historial_constancias_folder = os.path.join(self.data_processed_folder, 'historial_constancias')
+        # Exportación a Excel del historial (xlsxwriter en modo 'constant_memory')
+        self.historial_constancias_export = {
+            "FILAS_POR_BLOQUE": 10000, # Filas convertidas y escritas por bloque
+            "MUESTRA_ANCHOS": 5000, # Filas muestreadas para calcular el ancho de cada columna
+        }
         self.processed_files_set_in_memory = set()
+
+        # Emparejamiento aproximado de nombres (constancias sin coincidencia exacta contra HC)
+        self.emparejamiento_difuso = {
+            "HABILITADO": True,
+            "UMBRAL_AUTOACEPTAR": 0.92, # Score mínimo (0-1) para asignar '#emp' automáticamente
+            "MARGEN_MINIMO": 0.03, # Diferencia mínima de score contra el siguiente empleado candidato
+            "MAX_CANDIDATOS": 3, # Candidatos reportados por constancia en 'datos_constancias_sin_emp'
+            "TAMANO_BLOQUE": 25, # Empleados comparados por búsqueda (los que comparten más trigramas con el nombre)
+        }
+
+        # Archivo versionado de correcciones manuales de constancias (nombres, fechas y archivos excluidos)
+        self.reglas_correcciones_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reglas_correcciones.json')
         
         # Carpeta compartida de OneDrive para certificados (donde se organizan los PDFs finales)
         self.sharepoint_certs_base = os.path.join(self.sharepoint_training_folder, 'Constancias Entrenamiento - Certificados')
 
         self.sharepoint_certs_active = os.path.join(self.sharepoint_certs_base, '2.Constancias_actual')
         self.sharepoint_certs_bajas = os.path.join(self.sharepoint_certs_active, '1. BAJAS') # Subcarpeta dentro de '2.Constancias_actual'
+        # Publicación de PDFs a la carpeta sincronizada: copias en paralelo con un pool de hilos acotado
+        self.publicacion_pdfs = {
+            "MAX_WORKERS": 8,
+            # Modos intentados en orden hasta que uno funcione: 'reflink' (clon copy-on-write, mismo volumen con
+            # Btrfs/XFS), 'hardlink' (mismo volumen; el destino comparte el archivo con el origen) y 'copia'.
+            # 'hardlink' es opcional (agregarlo como ['reflink', 'hardlink', 'copia']): los destinos viven en OneDrive, que
+            # no sincroniza de forma confiable archivos con varios enlaces al mismo inodo, y un cambio en el origen
+            # (p. ej. una constancia individual en las carpetas fuente) modificaría también la copia publicada.
+            "MODOS": ['reflink', 'copia'],
+        }
+        # Cola de reintentos de operaciones de archivos bloqueadas (copias, movimientos y borrados): se reintentan al final
+        # de la ejecución en rondas con espera exponencial, y las que sigan bloqueadas se guardan para la siguiente ejecución.
+        self.reintentos_archivos = {
+            "MAX_RONDAS_POR_EJECUCION": 4,
+            "ESPERA_INICIAL": 0.5, # Segundos antes de la segunda ronda
+            "FACTOR_ESPERA": 2, # La espera se multiplica por este factor en cada ronda
+            "ESPERA_MAXIMA": 8,
+            "MAX_INTENTOS_TOTALES": 50, # Entre ejecuciones; después la operación se descarta con un error
+        }
 
         # Patrones de texto para extracción de PDF (de etl_pdf_entrenamiento.py)
         self.nombres_archivos_sat = ['instructor sat', '2025-T', 'apoyo en tierra', 'sat.']
@@ -105,6 +176,38 @@ class Config:
             '03at': 't1', '12at': 't2', '21at': 't3'
         }
 
+        # Reglas de homologación de cursos, evaluadas en orden (la primera que coincide gana; si ninguna, 'OTRO').
+        # Cada regla es (categoria, grupos): el curso en minúsculas debe contener al menos un texto de CADA grupo.
+        _sat = ['servicio de apoyo en tierra', 'servicios de apoyo en tierra']
+        _personal = ['personal perteneciente', 'personal permaneciente']
+        self.reglas_homologacion_cursos = [
+            ('Cabin Search', [['cabin search']]),
+            ('P.P(Trafico)', [['prescreening of passengers (trafico)']]),
+            ('SAT(Rampa)', [_sat, ['rampa', 'agente de rampa']]),
+            ('SAT(Operador Autoprestacion)', [_sat, ['operador autoprestacion']]),
+            ('SAT(Operador)', [_sat, ['operador']]),
+            ('SAT(ASC)', [_sat, ['asesor de servicio al cliente', 'asesor de servicio a cliente', 'asc']]),
+            ('SAT(General)', [_sat]),
+            ('AVSEC', [['avsec', 'seguridad de la aviacion']]),
+            ('SMS', [['safety management system', 'sms']]),
+            ('SAT(Rampa Autoprestacion)', [_personal, ['rampa autoprestacion']]),
+            ('SAT(Rampa)', [_personal, ['rampa']]),
+            ('SAT(Trafico)', [_personal, ['trafico']]),
+            ('SAT(CSA Autoprestacion)', [_personal, ['csa autoprestacion']]),
+        ]
+
+        # Cursos obligatorios por empleado (matriz de cobertura empleado × curso en ambos ETL)
+        self.cursos_obligatorios = ['SAT', 'AVSEC', 'SMS']
+
+        # --- Política de tipos de datos (dtypes) para ambos ETL ---
+        # 'TEXTO': dtype de las columnas de texto ('string[pyarrow]'; 'object' conserva el comportamiento anterior).
+        # 'CATEGORICAS': columnas de baja cardinalidad que se cargan como 'category' (merges, orden y dedups sobre códigos enteros).
+        self.dtype_policy = {
+            "HABILITADA": True,
+            "TEXTO": 'string[pyarrow]',
+            "CATEGORICAS": ['estatus', 'curso', 'curso_homologado', 'estatus_vigencia', 'puesto', 'clave', 'concepto'],
+        }
+
         # --- Configuraciones específicas de generador_lista_no_excluidos.py ---
         # Estas son las carpetas fuente donde se encuentran los PDFs a procesar.
         self.source_folders_pdfs = [
@@ -123,6 +226,24 @@ class Config:
         # self.ruta_registro_archivos_procesados = self.outpath_processed_files_log
         # self.ruta_nuevo_archivo_no_excluidos = self.outpath_list_new_non_excluded_pdfs
 
+        # --- Configuraciones del orquestador (main.py) ---
+        # Las etapas independientes se ejecutan en paralelo; una etapa cuyas entradas no cambiaron desde su última
+        # ejecución exitosa (huellas guardadas en 'estado_etapas.json') se omite.
+        self.ejecucion_etapas = {
+            "OMITIR_SIN_CAMBIOS": True, # False ejecuta siempre todas las etapas
+            "MAX_WORKERS": 2,
+        }
+        self.outpath_json_estado_etapas = os.path.join(self.data_processed_folder, 'estado_etapas.json')
+        # Métricas por etapa y sub-paso (tiempo, CPU, pico de memoria, filas y archivos): reporte de la última ejecución
+        # e historial acumulado (una ejecución por línea) para detectar regresiones entre ejecuciones.
+        self.metricas_ejecucion = {
+            "HABILITADO": True,
+            "MAX_EJECUCIONES_HISTORIAL": 200,
+            "UMBRAL_REGRESION": 1.5, # Se advierte si un paso tarda más que este múltiplo de su mediana histórica
+        }
+        self.outpath_json_metricas = os.path.join(self.data_processed_folder, 'metricas_ejecucion.json')
+        self.outpath_jsonl_historial_metricas = os.path.join(self.data_processed_folder, 'historial_metricas.jsonl')
+
         self._create_output_folders()
 
     def _create_output_folders(self):
@@ -132,6 +253,9 @@ class Config:
         os.makedirs(self.data_processed_folder, exist_ok=True)
         os.makedirs(self.dashboard_tables_folder, exist_ok=True)
         os.makedirs(self.temp_split_pdfs_folder, exist_ok=True)
+        os.makedirs(self.pending_pdfs_folder, exist_ok=True)
+        os.makedirs(self.historial_constancias_folder, exist_ok=True)
+        os.makedirs(self.retry_pdfs_folder, exist_ok=True)
         # Asegurar que existan los directorios padre para los archivos de log/lista
         os.makedirs(os.path.dirname(self.outpath_processed_files_log), exist_ok=True)
         os.makedirs(os.path.dirname(self.outpath_list_new_non_excluded_pdfs), exist_ok=True)
@@ -0,0 +1,158 @@
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from .metricas import medir
+
+# --- 1. HUELLAS DE ENTRADAS ---
+def huella_ruta(ruta: str):
+    """
+    Huella de una entrada de etapa. Archivos: SHA-256 del contenido (un archivo reescrito con el mismo contenido
+    no cuenta como cambio). Carpetas: SHA-256 de (ruta relativa, tamaño, mtime) de todos sus archivos, sin leerlos.
+    Retorna None si la ruta no existe.
+    """
+    if os.path.isfile(ruta):
+        with open(ruta, 'rb') as f:
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+    if not os.path.isdir(ruta):
+        return None
+    entradas = []
+    for root, dirs, files in os.walk(ruta):
+        for file_name in files:
+            full_path = os.path.join(root, file_name)
+            try:
+                estado = os.stat(full_path)
+            except OSError:
+                continue
+            entradas.append(f"{os.path.relpath(full_path, ruta)}|{estado.st_size}|{estado.st_mtime_ns}")
+    return hashlib.sha256('\n'.join(sorted(entradas)).encode('utf-8')).hexdigest()
+
+def _huellas(rutas: list) -> dict:
+    return {ruta: huella_ruta(ruta) for ruta in rutas}
+
+# --- 2. ESTADO DE LA ÚLTIMA EJECUCIÓN EXITOSA ---
+def cargar_estado_etapas(path_estado: str) -> dict:
+    """Carga el estado de las etapas ({nombre: {'entradas', 'salidas', 'fin'}}). Retorna {} si no existe o no se puede leer."""
+    if not os.path.exists(path_estado):
+        return {}
+    try:
+        with open(path_estado, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"ADVERTENCIA: No se pudo leer el estado de etapas '{path_estado}'. Se ejecutarán todas las etapas. Error: {e}")
+        return {}
+
+def guardar_estado_etapas(estado: dict, path_estado: str):
+    """Escribe el estado de las etapas en un temporal y lo reemplaza de forma atómica."""
+    path_temporal = path_estado + '.tmp'
+    with open(path_temporal, 'w', encoding='utf-8') as f:
+        json.dump(estado, f, ensure_ascii=False, indent=2)
+    os.replace(path_temporal, path_estado)
+
+# --- 3. DEFINICIÓN Y EJECUCIÓN DE ETAPAS ---
+def crear_etapa(nombre: str, funcion, entradas: list, salidas: list, forzar=None) -> dict:
+    """
+    Define una etapa del proceso.
+    'funcion' recibe un dict {nombre de etapa: resultado} con los resultados de las etapas ya terminadas
+    (None si la etapa se omitió). 'entradas' y 'salidas' son rutas de archivos o carpetas. 'forzar' es una función
+    opcional sin argumentos: si retorna True la etapa se ejecuta aunque sus entradas no hayan cambiado.
+    """
+    return {'nombre': nombre, 'funcion': funcion, 'entradas': list(entradas), 'salidas': list(salidas), 'forzar': forzar}
+
+def _dependencias_etapas(etapas: list) -> dict:
+    """
+    Una etapa depende de las etapas declaradas ANTES que ella que escriben alguna de sus entradas.
+    Las salidas de etapas posteriores (p. ej. el log de procesados, que el ETL de PDFs escribe y el generador de la lista lee)
+    son entradas de la siguiente ejecución, no dependencias de ésta; así el grafo nunca tiene ciclos.
+    """
+    dependencias = {}
+    for i, etapa in enumerate(etapas):
+        entradas = set(etapa['entradas'])
+        dependencias[etapa['nombre']] = {previa['nombre'] for previa in etapas[:i] if entradas & set(previa['salidas'])}
+    return dependencias
+
+def _ejecutar_etapa(etapa: dict, resultados: dict, estado: dict, path_estado: str, candado, omitir_sin_cambios: bool):
+    """
+    Ejecuta una etapa u omite su ejecución si sus entradas coinciden con las de la última ejecución exitosa y las salidas que
+    dejó siguen en disco. Retorna (resultado, omitida).
+    """
+    nombre = etapa['nombre']
+    with medir(nombre, omitida=False) as metricas:
+        with medir('huellas_entradas', archivos=len(etapa['entradas'])):
+            huellas_entradas = _huellas(etapa['entradas'])
+        with candado:
+            previo = estado.get(nombre)
+        if (omitir_sin_cambios and previo is not None and previo.get('entradas') == huellas_entradas
+                and all(os.path.exists(ruta) for ruta in previo.get('salidas', []))
+                and not (etapa['forzar'] is not None and etapa['forzar']())):
+            print(f"\n[Orquestador] Etapa '{nombre}' omitida: sus entradas no cambiaron desde la última ejecución exitosa ({previo.get('fin')}).")
+            metricas['omitida'] = True
+            return None, True
+
+        # Invalidar el estado antes de ejecutar: si la etapa falla a medias, la siguiente ejecución no debe omitirla
+        if previo is not None:
+            with candado:
+                estado.pop(nombre, None)
+                guardar_estado_etapas(estado, path_estado)
+
+        print(f"\n[Orquestador] Ejecutando etapa '{nombre}'...")
+        resultado = etapa['funcion'](resultados)
+        print(f"[Orquestador] Etapa '{nombre}' completada exitosamente.")
+
+        # Las entradas que la propia etapa reescribe se registran con su huella final, para no volver a ejecutarla por sus propios cambios
+        propias = set(etapa['entradas']) & set(etapa['salidas'])
+        huellas_entradas.update(_huellas([ruta for ruta in etapa['entradas'] if ruta in propias]))
+        with candado:
+            estado[nombre] = {
+                'entradas': huellas_entradas,
+                'salidas': [ruta for ruta in etapa['salidas'] if os.path.exists(ruta)],
+                'fin': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            guardar_estado_etapas(estado, path_estado)
+        return resultado, False
+
+def ejecutar_etapas(etapas: list, path_estado: str, max_workers: int = 2, omitir_sin_cambios: bool = True) -> dict:
+    """
+    Ejecuta las etapas respetando sus dependencias (ver '_dependencias_etapas'): las independientes corren en paralelo
+    en un pool de hilos acotado. Si una etapa falla, no se inician más etapas, se espera a las que están en curso
+    y se relanza el primer error. Retorna {nombre de etapa: resultado} (None para las omitidas).
+    """
+    dependencias = _dependencias_etapas(etapas)
+    estado = cargar_estado_etapas(path_estado)
+    candado = threading.Lock()
+    resultados = {}
+    omitidas = []
+    terminadas = set()
+    pendientes = list(etapas)
+    en_curso = {}
+    error = None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pendientes or en_curso:
+            if error is None:
+                for etapa in [etapa for etapa in pendientes if dependencias[etapa['nombre']] <= terminadas]:
+                    pendientes.remove(etapa)
+                    en_curso[executor.submit(_ejecutar_etapa, etapa, dict(resultados), estado, path_estado, candado, omitir_sin_cambios)] = etapa
+            if not en_curso:
+                break
+            hechas, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in hechas:
+                etapa = en_curso.pop(futuro)
+                try:
+                    resultados[etapa['nombre']], omitida = futuro.result()
+                except Exception as e:
+                    print(f"ERROR: La etapa '{etapa['nombre']}' falló: {e}")
+                    error = error or e
+                    continue
+                terminadas.add(etapa['nombre'])
+                if omitida:
+                    omitidas.append(etapa['nombre'])
+
+    if error is not None:
+        raise error
+    if omitidas:
+        print(f"\n[Orquestador] Etapas omitidas por no tener cambios: {', '.join(omitidas)}")
+    return resultados
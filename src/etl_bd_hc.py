@@ -1,9 +1,12 @@
 import pandas as pd
 import os
+import re
 import unicodedata
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 
 from .config import Config
+from .metricas import medir, anotar
 
 warnings.filterwarnings('ignore', category=UserWarning)
 
@@ -30,7 +33,9 @@ def cargar_transformar_excel(file_path, config: Config, sheet_name=None, engine=
     """
     Cargar un archivo de excel, convierte nombres de columnas en minusculas, elimina espacios al inicio/final y elimina columnas con nombres NaN.
     """
-    df = pd.read_excel(file_path, sheet_name=sheet_name, engine=engine, header=header)
+    with medir('lectura_excel', archivos=1) as metricas:
+        df = pd.read_excel(file_path, sheet_name=sheet_name, engine=engine, header=header)
+        metricas['filas_salida'] = len(df)
     df.columns = [normalizar_acentos(col, config.vocales_acentos) for col in df.columns] # Usa config.vocales_acentos
     df.columns = df.columns.astype(str).str.lower().str.strip().str.replace(r'\s+', ' ', regex=True).str.replace(' ', '_', regex=False)
     df = df.loc[:, df.columns.notna()]
@@ -44,7 +49,9 @@ def cargar_transformar_csv(file_path, config: Config, header=0, encoding=None):
     """
     Cargar un archivo csv, convierte nombres de columnas en minusculas, elimina espacios al inicio/final y elimina columnas con nombres NaN.
     """
-    df = pd.read_csv(file_path, header=header, encoding=encoding)
+    with medir('lectura_csv', archivos=1) as metricas:
+        df = pd.read_csv(file_path, header=header, encoding=encoding)
+        metricas['filas_salida'] = len(df)
     df.columns = [normalizar_acentos(col, config.vocales_acentos) for col in df.columns] # Usa config.vocales_acentos
     df.columns = df.columns.astype(str).str.lower().str.strip().str.replace(r'\s+', ' ', regex=True).str.replace(' ', '_', regex=False)
     df = df.loc[:, df.columns.notna()]
@@ -53,35 +60,177 @@ def cargar_transformar_csv(file_path, config: Config, header=0, encoding=None):
         df = df.dropna(subset=['#emp'], how='any')
     return df
 
+# Clase de espacios en blanco equivalente a '\s' de Python (incluye NBSP y espacios Unicode).
+# Se construye con caracteres literales para que el mismo patrón funcione igual en 're' y en
+# el motor de regex de Arrow (RE2), donde '\s' solo cubre espacios ASCII.
+_CLASE_ESPACIOS = '[' + ''.join(c for c in map(chr, range(0x3001)) if c.isspace()) + ']'
+_PATRON_ESPACIOS = _CLASE_ESPACIOS + '+'
+# Un '.0' (con posibles espacios intermedios) o cualquier caracter que no sea dígito.
+_PATRON_ID_NO_DIGITOS = r'\.' + _CLASE_ESPACIOS + r'*0|[^0-9]'
+
+def _a_texto_arrow(series):
+    """
+    Convierte una serie a texto respaldado por Arrow. Los nulos se convierten primero con 'astype(str)'
+    para conservar el texto 'nan' que esperan los pasos posteriores.
+    """
+    return series.astype(str).astype('string[pyarrow]')
+
+def _patron_caracteres(caracteres_a_eliminar):
+    """Construye una sola regex (alternancia) con los caracteres/cadenas a eliminar."""
+    if isinstance(caracteres_a_eliminar, str):
+        caracteres_a_eliminar = list(caracteres_a_eliminar)
+    return '|'.join(re.escape(c) for c in caracteres_a_eliminar if c)
+
 def limpiar_columna_texto(series, caracteres_a_eliminar=None):
     """
     Limpia una serie(columna) de tipo 'string': convierte a string, elimina caracteres especificos, normaliza espacios, quita espacios al inicio/final, rellena NaNs con string vacio.
+    Todas las pasadas se ejecutan vectorizadas sobre texto Arrow: una regex combinada para los caracteres a eliminar y otra para los espacios.
     """
-    s = series.astype(str).str.strip()
+    s = _a_texto_arrow(series)
     if caracteres_a_eliminar:
-        for c in caracteres_a_eliminar:
-            s = s.str.replace(c, '', regex=False)
+        patron = _patron_caracteres(caracteres_a_eliminar)
+        if patron:
+            s = s.str.replace(patron, '', regex=True)
 
-    return s.str.replace(r'\s+', ' ', regex=True).str.strip().fillna('')
+    s = s.str.replace(_PATRON_ESPACIOS, ' ', regex=True).str.strip()
+    return s.fillna('').astype(object)
 
 def limpiar_columna_id(series, caracteres_a_eliminar=None):
     """
     Limpia una serie(columna) de ID que pueden contener caracteres no numericos. Convierte a string, quita espacios al inicio/final, elimina caracteres especificos, luego a numerico y finalmente a 'int64', rellanando NaNs con 0.
+    Si la columna ya es numerica se evita la conversion a texto; en otro caso se usa una sola regex sobre texto Arrow.
     """
-    s = series.astype(str).str.strip().str.replace(r'\s+', '', regex=True).str.replace('.0', '', regex=False)
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        valores = pd.to_numeric(series, errors='coerce').abs()
+        enteros = valores.dropna()
+        # Solo enteros "seguros": los flotantes grandes se representan con notación científica como texto.
+        if enteros.empty or ((enteros % 1 == 0) & (enteros < 1e15)).all():
+            return valores.fillna(0).astype('int64')
+
+    patron = _PATRON_ID_NO_DIGITOS
     if caracteres_a_eliminar:
-        for c in caracteres_a_eliminar:
-            s = s.str.replace(c, '', regex=False)
+        patron_caracteres = _patron_caracteres(caracteres_a_eliminar)
+        if patron_caracteres:
+            patron = r'\.' + _CLASE_ESPACIOS + r'*0|' + patron_caracteres + r'|[^0-9]'
 
-    s = s.str.replace(r'[^\d]', '', regex=True) # Generaliza para eliminar no dígitos
+    s = _a_texto_arrow(series).str.replace(patron, '', regex=True)
     return pd.to_numeric(s, errors='coerce').fillna(0).astype('int64')
 
+def aplicar_politica_dtypes(df, dtype_policy: dict):
+    """
+    Aplica la política de dtypes de Config a un DataFrame: las columnas de baja cardinalidad pasan a 'category'
+    y el resto de columnas de texto al dtype de texto configurado (Arrow). Las columnas con tipos mezclados se dejan igual.
+    """
+    if not dtype_policy or not dtype_policy.get('HABILITADA'):
+        return df
+
+    df = df.copy()
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            continue
+        if not (pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype)):
+            continue
+        if pd.api.types.infer_dtype(df[col], skipna=True) not in ('string', 'empty'):
+            continue
+        if col in dtype_policy.get('CATEGORICAS', []):
+            df[col] = df[col].astype('category')
+        elif dtype_policy.get('TEXTO'):
+            df[col] = df[col].astype(dtype_policy['TEXTO'])
+    return df
+
+def rellenar_nulos(series, valor):
+    """
+    'fillna' compatible con columnas categóricas: añade a las categorías los valores de relleno que falten
+    (manteniéndolas ordenadas) antes de rellenar. 'valor' puede ser un escalar o una serie.
+    """
+    if isinstance(valor, pd.Series):
+        valor = valor.astype(object)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        nuevos = pd.Index(valor.dropna().unique() if isinstance(valor, pd.Series) else [valor])
+        faltantes = nuevos.difference(series.cat.categories)
+        if len(faltantes):
+            series = series.cat.set_categories(series.cat.categories.union(faltantes))
+    return series.fillna(valor)
+
+def construir_matriz_cobertura(emps, cursos_requeridos, df_registros, col_curso='curso', col_curso_registros=None, dtype_emp=None, suffixes=('_x', '_y')):
+    """
+    Construye la matriz de cobertura empleado × curso requerido y la completa con los registros existentes.
+    El esqueleto se genera como producto cartesiano vectorizado (MultiIndex.from_product) en el mismo orden
+    que el doble ciclo (empleado, curso), y se une con 'df_registros' en un solo left join por ('#emp', curso).
+    Las combinaciones sin registro quedan con nulos para que el llamador las marque como faltantes.
+    Si el curso de 'df_registros' es categórico (política de dtypes), ambas llaves comparten las mismas categorías
+    (ordenadas, incluidos los cursos requeridos) para que el join se haga sobre los códigos y no sobre texto.
+    """
+    esqueleto = pd.MultiIndex.from_product(
+        [pd.unique(pd.Series(emps)), list(cursos_requeridos)], names=['#emp', col_curso]
+    ).to_frame(index=False)
+    if dtype_emp is not None:
+        esqueleto['#emp'] = esqueleto['#emp'].astype(dtype_emp)
+
+    col_curso_registros = col_curso_registros or col_curso
+    if isinstance(df_registros[col_curso_registros].dtype, pd.CategoricalDtype):
+        dtype_curso = pd.CategoricalDtype(df_registros[col_curso_registros].cat.categories.union(pd.Index(list(cursos_requeridos))))
+        df_registros = df_registros.assign(**{col_curso_registros: df_registros[col_curso_registros].astype(dtype_curso)})
+        esqueleto[col_curso] = esqueleto[col_curso].astype(dtype_curso)
+    return pd.merge(
+        esqueleto,
+        df_registros,
+        left_on=['#emp', col_curso],
+        right_on=['#emp', col_curso_registros],
+        how='left',
+        suffixes=suffixes
+    )
+
 def limpiar_columna_fecha(series, formato_fecha='%d/%m/%Y', errors='coerce'):
     """
     Convierte una serie de fecha: convierte a datetime, maneja errores y rellena NaNs con NaTs
     """
     return pd.to_datetime(series, errors=errors, format=formato_fecha)
 
+def _tabla_para_parquet(df):
+    """
+    Prepara una tabla para Parquet: Arrow requiere un solo tipo por columna, así que las columnas 'object'
+    con tipos mezclados (ej. texto y 0) se convierten a numérico cuando es posible, o a texto en otro caso.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if not pd.api.types.is_object_dtype(df[col].dtype):
+            continue
+        if pd.api.types.infer_dtype(df[col], skipna=True) in ('string', 'empty'):
+            continue
+        numerico = pd.to_numeric(df[col], errors='coerce')
+        if numerico.notna().sum() == df[col].notna().sum():
+            df[col] = numerico
+        else:
+            df[col] = df[col].astype('string')
+    return df
+
+def _escribir_parquet(df, ruta_parquet, compresion):
+    """Escribe una tabla en Parquet tipado, con codificación por diccionario y la compresión indicada."""
+    _tabla_para_parquet(df).to_parquet(ruta_parquet, engine='pyarrow', index=False, compression=compresion, use_dictionary=True)
+
+def exportar_tablas_dashboard(tablas: dict, config: Config):
+    """
+    Exporta las tablas del dashboard a 'dashboard_tables_folder'. Siempre escribe el CSV (formato de compatibilidad) y,
+    si 'dashboard_tables_export["PARQUET"]' está habilitado, un Parquet tipado con codificación por diccionario y compresión.
+    Todas las escrituras se ejecutan en paralelo; cualquier error se propaga igual que antes.
+    """
+    opciones = config.dashboard_tables_export
+    tareas = []
+    with ThreadPoolExecutor(max_workers=opciones.get('MAX_WORKERS', 8)) as executor:
+        for clave, df in tablas.items():
+            ruta_csv = os.path.join(config.dashboard_tables_folder, config.hc_etl_out_filenames[clave])
+            if opciones.get('PARQUET'):
+                ruta_parquet = os.path.splitext(ruta_csv)[0] + '.parquet'
+                tareas.append(executor.submit(_escribir_parquet, df, ruta_parquet, opciones.get('COMPRESION_PARQUET', 'snappy')))
+            tareas.append(executor.submit(df.to_csv, ruta_csv, index=False, encoding='utf-8'))
+
+    for tarea in tareas:
+        tarea.result()
+    anotar(archivos=len(tareas))
+    print(f"[ETL HC] {len(tareas)} archivos de tablas exportados a: {config.dashboard_tables_folder}")
+
 def run_hc_etl(config: Config): # La función ahora acepta el objeto Config
     """
     Función principal para ejecutar el proceso ETL de la Base de Datos de Capital Humano.
@@ -138,6 +287,7 @@ def run_hc_etl(config: Config): # La función ahora acepta el objeto Config
 
     # Definir orden de columnas
     df_hc = df_hc[['#emp', 'nombre_completo', 'paterno','materno', 'nombre', 'rfc', 'curp', 'telefono', 'estatus','puesto', 'fecha_alta', 'fecha_antiguedad', 'fecha_baja', 'fecha_nacimiento', 'novedades_comentarios']]
+    df_hc = aplicar_politica_dtypes(df_hc, config.dtype_policy)
 
     # --- Dashboar 'Ausentismo'
     # ---- Tabla 'hc_bajas_table'
@@ -161,6 +311,7 @@ def run_hc_etl(config: Config): # La función ahora acepta el objeto Config
 
     df_bajas['#emp'] = limpiar_columna_id(df_bajas['id'], caracteres_a_eliminar=['H', 'P'])
     df_bajas = df_bajas[['#emp', 'fecha_de_baja', 'motivo', 'causa']]
+    df_bajas = aplicar_politica_dtypes(df_bajas, config.dtype_policy)
     df_bajas = df_bajas.drop_duplicates().sort_values(by='#emp', ascending=False)
 
     # Datos Adicionales HC
@@ -171,6 +322,7 @@ def run_hc_etl(config: Config): # La función ahora acepta el objeto Config
         if col in df_datos_adicionales_hc.columns:
          df_datos_adicionales_hc[col] = limpiar_columna_texto(df_datos_adicionales_hc[col], caracteres_a_eliminar= ' ')
     df_datos_adicionales_hc['#emp'] = limpiar_columna_id(df_datos_adicionales_hc['#emp'])
+    df_datos_adicionales_hc = aplicar_politica_dtypes(df_datos_adicionales_hc, config.dtype_policy)
 
     # --- Nexos
     # ---- Base 'Entrenamiento'
@@ -194,31 +346,18 @@ def run_hc_etl(config: Config): # La función ahora acepta el objeto Config
     else:
         df_entrenamiento['#emp'] = 0
     df_entrenamiento = df_entrenamiento[['#emp', 'curso', 'fecha_constancia', 'fecha_vigencia', 'estatus_vigencia', 'fecha_programada']]
+    df_entrenamiento = aplicar_politica_dtypes(df_entrenamiento, config.dtype_policy)
     df_entrenamiento = df_entrenamiento.drop_duplicates().sort_values(['#emp', 'curso'])
 
     # --- INICIO DE LA NUEVA LÓGICA PARA IDENTIFICAR CURSOS FALTANTES ---
     print("\n[ETL HC] Identificando y añadiendo cursos faltantes para cada empleado...")
 
-    unique_emps_from_hc = df_hc['#emp'].unique()
-    # Definir los cursos obligatorios (asegúrate de que estos nombres coincidan con los cursos limpios)
-    required_courses = ['SAT', 'AVSEC', 'SMS']
-
-    all_expected_combinations = pd.DataFrame(
-        [(emp, course) for emp in unique_emps_from_hc for course in required_courses],
-        columns=['#emp', 'curso']
-    )
-
-    # Realizar un left merge para añadir los cursos existentes y dejar NaN/NaT para los faltantes.
-    #    'all_expected_combinations' es el DataFrame izquierdo, manteniendo todas sus filas.
-    df_entrenamiento_expanded = pd.merge(
-        all_expected_combinations,
-        df_entrenamiento,
-        on=['#emp', 'curso'],
-        how='left'
-    )
+    # Matriz empleado × curso obligatorio (config.cursos_obligatorios, deben coincidir con los cursos limpios)
+    # unida con los cursos existentes; los faltantes quedan con NaN/NaT.
+    df_entrenamiento_expanded = construir_matriz_cobertura(df_hc['#emp'], config.cursos_obligatorios, df_entrenamiento)
 
     # Rellenar 'estatus_vigencia' con 'Faltante' para los cursos que no se encontraron
-    df_entrenamiento_expanded['estatus_vigencia'] = df_entrenamiento_expanded['estatus_vigencia'].fillna('FALTANTE')
+    df_entrenamiento_expanded['estatus_vigencia'] = rellenar_nulos(df_entrenamiento_expanded['estatus_vigencia'], 'FALTANTE')
 
     # Reemplazar el df_entrenamiento original con el expandido para el resto del ETL
     df_entrenamiento = df_entrenamiento_expanded
@@ -250,6 +389,7 @@ def run_hc_etl(config: Config): # La función ahora acepta el objeto Config
         if isinstance(col, str):
             df_puestos[col] = limpiar_columna_texto(df_puestos[col])
     df_puestos['posicion_vh'] = df_puestos['posicion_vh'].str.upper()
+    df_puestos = aplicar_politica_dtypes(df_puestos, config.dtype_policy)
 
     # Generar 'id_puesto'
     df_puestos_homologados = df_puestos[['cargo_homologado', 'area', 'horas_diarias']]
@@ -277,7 +417,7 @@ def run_hc_etl(config: Config): # La función ahora acepta el objeto Config
         año_archivo = nombre_archivo.split('_')[2]
         fecha_archivo = '01/' + mes_archivo + '/' + año_archivo
         fecha_limpia = limpiar_columna_fecha(fecha_archivo)
-        df = cargar_transformar_csv(ruta, config, header=3, encoding='ansi').copy() # Pasa el objeto config a la función
+        df = cargar_transformar_csv(ruta, config, header=3, encoding=config.hc_etl_csv_encoding).copy() # Pasa el objeto config a la función
         # df['mes'] = mes_archivo # Esta línea estaba comentada en tu original
         dfs.append(df)
     df_roster = pd.concat(dfs, ignore_index= True)
@@ -338,11 +478,12 @@ def run_hc_etl(config: Config): # La función ahora acepta el objeto Config
             df_asistencia[col] = limpiar_columna_texto(df_asistencia[col])
     df_asistencia['#emp'] = limpiar_columna_id(df_asistencia['#emp'])
     df_asistencia['fecha_programada'] = limpiar_columna_fecha(df_asistencia['fecha_programada'])
-    df_asistencia = df_asistencia.drop_duplicates().dropna(how='all').sort_values(by='#emp', ascending=False)
-    df_asistencia = df_asistencia[df_asistencia['#emp'] != 0]
     df_asistencia.loc[
-        (df_asistencia['asistencia'] == 'FALTA')
+        (df_asistencia['asistencia'] == 'FALTA'), 'asistencia'
     ] = 'FALTO'
+    df_asistencia = aplicar_politica_dtypes(df_asistencia, config.dtype_policy)
+    df_asistencia = df_asistencia.drop_duplicates().dropna(how='all').sort_values(by='#emp', ascending=False)
+    df_asistencia = df_asistencia[df_asistencia['#emp'] != 0]
 
     # Merge: 'df_entrenamiento', 'df_asistencia'
     df_entrenamiento_asistencia = pd.merge(
@@ -388,7 +529,7 @@ def run_hc_etl(config: Config): # La función ahora acepta el objeto Config
     dfs = []
     for a in archivos:
         ruta = os.path.join(config.hc_etl_folders['FOLDER_RELOJ_CHECADOR'], a) # Usa config.hc_etl_folders
-        df = cargar_transformar_csv(ruta, config, header=3, encoding='ansi').copy() # Pasa el objeto config a la función
+        df = cargar_transformar_csv(ruta, config, header=3, encoding=config.hc_etl_csv_encoding).copy() # Pasa el objeto config a la función
         dfs.append(df)
     df_ausentismo = pd.concat(dfs, ignore_index=True)
     text_cols = ['trabajador', 'clave', 'concepto']
@@ -406,6 +547,7 @@ def run_hc_etl(config: Config): # La función ahora acepta el objeto Config
     df_ausentismo['clave'] = df_ausentismo['clave'].fillna('FIJ')
     df_ausentismo['concepto'] = df_ausentismo['concepto'].fillna('Falta Injustificada')
     df_ausentismo['concepto'] = df_ausentismo['concepto'].str.title()
+    df_ausentismo = aplicar_politica_dtypes(df_ausentismo, config.dtype_policy)
 
     # --- Dashboard: 'Cobertura'
     df_cobertura = cargar_transformar_excel(config.hc_etl_files['FILE_COBERTURA'], config, sheet_name=config.hc_etl_sheets_names['COBERTURA_REQUERIDO'], header=0).copy()
@@ -428,24 +570,18 @@ def run_hc_etl(config: Config): # La función ahora acepta el objeto Config
     df_cobertura = df_cobertura.rename(columns={'cargo': 'puesto'})
 
     # ---- Exportar archivos
-    # Actualiza las rutas usando la nueva estructura de config
-    ruta_csv_hechos = os.path.join(config.dashboard_tables_folder, config.hc_etl_out_filenames['FACT_TABLE'])
-    ruta_csv_hc = os.path.join(config.dashboard_tables_folder, config.hc_etl_out_filenames['HC_TABLE'])
-    ruta_csv_hc_bajas = os.path.join(config.dashboard_tables_folder, config.hc_etl_out_filenames['HC_BAJAS_TABLE'])
-    ruta_csv_puestos = os.path.join(config.dashboard_tables_folder, config.hc_etl_out_filenames['PUESTOS_TABLE'])
-    ruta_csv_cursos = os.path.join(config.dashboard_tables_folder, config.hc_etl_out_filenames['CURSOS_TABLE'])
-    ruta_csv_asistencia = os.path.join(config.dashboard_tables_folder, config.hc_etl_out_filenames['ASISTENCIA_TABLE'])
-    ruta_csv_ausentismo = os.path.join(config.dashboard_tables_folder, config.hc_etl_out_filenames['AUSENTISMO_TABLE'])
-    ruta_csv_cobertura = os.path.join(config.dashboard_tables_folder, config.hc_etl_out_filenames['COBERTURA_TABLE'])
-
-    df_hechos.to_csv(ruta_csv_hechos, index=False, encoding='utf-8')
-    df_hc.to_csv(ruta_csv_hc, index=False, encoding='utf-8')
-    df_bajas.to_csv(ruta_csv_hc_bajas, index=False, encoding='utf-8')
-    df_puestos_homologados.to_csv(ruta_csv_puestos, index=False, encoding='utf-8')
-    df_cursos.to_csv(ruta_csv_cursos, index=False, encoding='utf-8')
-    df_asistencia.to_csv(ruta_csv_asistencia, index=False, encoding='utf-8')
-    df_ausentismo.to_csv(ruta_csv_ausentismo, index=False, encoding='utf-8')
-    df_cobertura.to_csv(ruta_csv_cobertura, index=False, encoding='utf-8')
+    tablas_dashboard = {
+        'FACT_TABLE': df_hechos,
+        'HC_TABLE': df_hc,
+        'HC_BAJAS_TABLE': df_bajas,
+        'PUESTOS_TABLE': df_puestos_homologados,
+        'CURSOS_TABLE': df_cursos,
+        'ASISTENCIA_TABLE': df_asistencia,
+        'AUSENTISMO_TABLE': df_ausentismo,
+        'COBERTURA_TABLE': df_cobertura,
+    }
+    with medir('exportacion', filas_entrada=sum(len(df) for df in tablas_dashboard.values())):
+        exportar_tablas_dashboard(tablas_dashboard, config)
 
     print("ETL de Base de Datos HC completado.")
     # No es necesario retornar los DataFrames aquí si el `master_etl.py` no los necesita directamente.
@@ -1,4 +1,7 @@
 import os
+import json
+import errno
+import hashlib
 import stat
 import time
 import fitz
@@ -7,10 +10,20 @@ import pandas as pd
 import shutil
 import unicodedata
 import numpy as np
+import xlsxwriter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from difflib import SequenceMatcher
+try:
+    import fcntl # No existe en Windows; habilita el modo de publicación 'reflink' (ioctl FICLONE de Linux)
+    _FICLONE = 0x40049409
+except ImportError:
+    fcntl = None
 
 from .config import Config
+from .metricas import medir, anotar, buscar_regex
 from .generador_lista_no_excluidos import _cargar_set_registros_procesados
+from .etl_bd_hc import aplicar_politica_dtypes, rellenar_nulos, construir_matriz_cobertura
 
 def _añadir_set_procesado_en_memoria(file_path: str, config: Config):
     """
@@ -32,46 +45,87 @@ def _guardar_registro_procesado_a_disco(config: Config):
     except Exception as e:
         print(f"ERROR: No se pudo guardar el registro de archivos procesados en: '{config.outpath_processed_files_log}'. Error: {e}")
 
-def rmtree_onerror_retry(func, path, exc_info):
+def _renombrar_entrada(origen: str, destino: str):
     """
-    Función de manejo de errores para shutil.rmtree.
-    Si el error es por PermissionError, intenta cambiar los permisos del archivo
-    a escribible y reintenta la operación. Si no es PermissionError, propaga la excepción.
+    Renombra un archivo o carpeta con 'os.replace' (atómico en el mismo volumen; reemplaza un archivo existente).
+    Si el destino es de solo lectura (típico en Windows) se le quita el atributo y se reintenta una vez;
+    entre volúmenes distintos se recurre a 'shutil.move'.
     """
-    ex_type, ex_value, ex_traceback = exc_info
-    if ex_type is PermissionError:
-        print(f"  - DEBUG: Permiso denegado para '{path}'. Intentando cambiar permisos...")
-        try:
-            os.chmod(path, stat.S_IWUSR)
-            func(path)
-            print(f"  - DEBUG: Permisos cambiados y operación reintentada en '{path}'.")
-        except Exception as retry_e:
-            print(f"  - ADVERTENCIA: Falló el reintento después de cambiar permisos en '{path}': {retry_e}")
+    try:
+        os.replace(origen, destino)
+    except PermissionError:
+        if not os.path.isfile(destino) or os.access(destino, os.W_OK):
             raise
-    else:
-        raise
+        os.chmod(destino, stat.S_IWUSR)
+        os.replace(origen, destino)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(origen, destino)
 
-def mover_carpetas_bajas(config: Config): # Acepta el objeto Config
+def _fusionar_carpeta(origen: str, destino: str):
+    """
+    Mueve el contenido de 'origen' dentro de la carpeta existente 'destino' (lo de 'origen' reemplaza archivos con el
+    mismo nombre; lo que solo existe en 'destino' se conserva) y elimina 'origen' ya vacía. Es reanudable: si una
+    entrada está bloqueada, las ya movidas no se repiten en el siguiente intento.
+    """
+    with os.scandir(origen) as it:
+        entradas = list(it)
+    for entrada in entradas:
+        ruta_destino = os.path.join(destino, entrada.name)
+        if entrada.is_dir(follow_symlinks=False) and os.path.isdir(ruta_destino):
+            _fusionar_carpeta(entrada.path, ruta_destino)
+        else:
+            _renombrar_entrada(entrada.path, ruta_destino)
+    os.rmdir(origen)
+
+def _reubicar_carpeta(origen: str, destino: str) -> str:
+    """Reubica la carpeta de un empleado: renombre directo si 'destino' no existe o fusión si ya existe."""
+    if os.path.isdir(destino):
+        _fusionar_carpeta(origen, destino)
+        return 'FUSIONO'
+    _renombrar_entrada(origen, destino)
+    return 'MOVIO'
+
+def _reubicar_manifiesto(config: Config, carpetas_movidas: list):
+    """Actualiza en el manifiesto de publicación los destinos de las carpetas reubicadas (el rename conserva tamaño y mtime)."""
+    manifiesto = cargar_manifiesto_publicacion(config.outpath_csv_manifiesto_publicacion)
+    if not manifiesto or not carpetas_movidas:
+        return
+    raiz_activos = config.sharepoint_certs_active + os.sep
+    movidas = set(carpetas_movidas)
+    manifiesto_actualizado = {}
+    for destino, entrada in manifiesto.items():
+        if destino.startswith(raiz_activos):
+            carpeta, _, resto = destino[len(raiz_activos):].partition(os.sep)
+            if carpeta in movidas and resto:
+                destino = os.path.join(config.sharepoint_certs_bajas, carpeta, resto)
+        manifiesto_actualizado[destino] = entrada
+    guardar_manifiesto_publicacion(manifiesto_actualizado, config.outpath_csv_manifiesto_publicacion)
+
+def mover_carpetas_bajas(config: Config, baja_emp_set: set = None, cola_reintentos: list = None): # Acepta el objeto Config
     """
     Identifica las carpetas de empleados en la ruta de activos que corresponden a
     empleados con estatus 'BAJA' según hc_table.csv, y las mueve a la carpeta de bajas.
+    Si se recibe 'baja_emp_set' (construido en memoria), no se vuelve a leer 'hc_table.csv'.
     Esta función debe ejecutarse antes de procesar nuevas constancias para evitar duplicados.
+    El plan (carpetas a mover) se calcula de una vez cruzando el índice de carpetas con el set de BAJAS; cada carpeta se
+    renombra (o se fusiona con la existente en BAJAS, sin borrarla). Las bloqueadas se difieren a 'cola_reintentos'
+    sin detener el resto (si no se recibe cola, se usa la persistida y se procesa al terminar esta función).
     """
     print("\n[SCRIPT NO DIARIO] Iniciando la verificación y movimiento de carpetas de empleados BAJA...")
 
-    df_hc = pd.DataFrame()
-    try:
-        df_hc = pd.read_csv(config.hc_table_path, encoding='utf-8') # Usa config.hc_table_path
-        df_hc['#emp'] = df_hc['#emp'].astype('string').str.strip()
-        df_hc['estatus'] = df_hc['estatus'].astype('string').str.upper().str.strip()
-    except FileNotFoundError:
-        print(f"Advertencia: No se encontró 'hc_table.csv' en '{config.hc_table_path}'. No se moverán carpetas de bajas.")
-        return
-    except Exception as e:
-        print(f"Error al cargar 'hc_table.csv' para mover carpetas de bajas: {e}. No se moverán carpetas.")
-        return
+    if baja_emp_set is None:
+        try:
+            df_hc = pd.read_csv(config.hc_table_path, encoding='utf-8') # Usa config.hc_table_path
+            baja_emp_set = construir_set_bajas(df_hc)
+        except FileNotFoundError:
+            print(f"Advertencia: No se encontró 'hc_table.csv' en '{config.hc_table_path}'. No se moverán carpetas de bajas.")
+            return
+        except Exception as e:
+            print(f"Error al cargar 'hc_table.csv' para mover carpetas de bajas: {e}. No se moverán carpetas.")
+            return
 
-    baja_emp_set = set(df_hc[df_hc['estatus'] == 'BAJA']['#emp'].unique())
     if not baja_emp_set:
         print("No se encontraron empleados con estatus 'BAJA' en 'hc_table.csv'. Saltando movimiento de carpetas.")
         return
@@ -82,81 +136,56 @@ def mover_carpetas_bajas(config: Config): # Acepta el objeto Config
     os.makedirs(destination_root_bajas, exist_ok=True)
 
     moved_count = 0
-    skipped_count = 0
     error_count = 0
 
     if not os.path.exists(source_root_active):
         print(f"Advertencia: La carpeta de certificados activos '{source_root_active}' no existe. No hay carpetas para mover.")
         return
 
-    for folder_name in os.listdir(source_root_active):
+    # --- Plan: índice de carpetas de activos (una sola lectura) cruzado con el set de BAJAS ---
+    with os.scandir(source_root_active) as it:
+        carpetas_activos = {entrada.name for entrada in it if entrada.is_dir() and entrada.path != destination_root_bajas}
+    carpetas_empleado = {nombre for nombre in carpetas_activos if nombre.isdigit() and int(nombre) != 0}
+    pendientes = sorted(carpetas_empleado & baja_emp_set)
+    skipped_count = len(carpetas_activos) - len(pendientes)
+
+    # --- Ejecución: renombres atómicos; las carpetas bloqueadas se difieren a la cola de reintentos ---
+    cola_propia = cola_reintentos is None
+    if cola_propia:
+        cola_reintentos = cargar_cola_reintentos(config.outpath_json_cola_reintentos)
+    deferred_count = 0
+    carpetas_movidas = []
+    for folder_name in pendientes:
         current_folder_path = os.path.join(source_root_active, folder_name)
-
-        if not os.path.isdir(current_folder_path):
-            continue
-
-        if current_folder_path == destination_root_bajas:
-            continue
-
-        emp_id_str = None
+        target_folder_path = os.path.join(destination_root_bajas, folder_name)
         try:
-            if folder_name.isdigit() and int(folder_name) != 0:
-                emp_id_str = folder_name.strip()
-            else:
-                skipped_count += 1
-                continue
-        except ValueError:
-            skipped_count += 1
-            continue
-
-        if emp_id_str in baja_emp_set:
-            target_folder_path = os.path.join(destination_root_bajas, folder_name)
-
-            # --- Fase 1: Intentar eliminar la carpeta existente en BAJAS con reintentos ---
-            max_retries = 5
-            current_retry = 0
-            deletion_succeeded = False
-
-            if os.path.exists(target_folder_path):
-                print(f"  - INFO: Carpeta '{folder_name}' ya existe en destino de BAJAS. Intentando eliminarla para reemplazarla.")
-                while current_retry < max_retries and not deletion_succeeded:
-                    try:
-                        shutil.rmtree(target_folder_path, onerror=rmtree_onerror_retry)
-                        print(f"  - INFO: Carpeta '{folder_name}' eliminada exitosamente del destino de BAJAS.")
-                        deletion_succeeded = True
-                    except PermissionError as e_perm:
-                        current_retry += 1
-                        print(f"  - ADVERTENCIA: Permiso denegado al eliminar '{target_folder_path}' (Intento {current_retry}/{max_retries}). Reintentando en 0.5 segundos...")
-                        time.sleep(0.5)
-                    except Exception as e_rmtree:
-                        print(f"  - ERROR: Falló la eliminación de la carpeta existente en BAJAS '{target_folder_path}': {e_rmtree}. Este error probablemente impide el movimiento.")
-                        error_count += 1
-                        break
-
-                if not deletion_succeeded:
-                    print(f"  - ERROR: No se pudo eliminar la carpeta '{target_folder_path}' después de {max_retries} intentos. Saltando el movimiento para este empleado.")
-                    error_count += 1
-                    continue
+            accion = _reubicar_carpeta(current_folder_path, target_folder_path)
+            print(f"  - {accion}: Carpeta de empleado '{folder_name}' a '{destination_root_bajas}'.")
+            carpetas_movidas.append(folder_name)
+            moved_count += 1
+        except PermissionError as e_lock:
+            print(f"  - ADVERTENCIA: Carpeta '{folder_name}' bloqueada; el movimiento se reintentará al final. ({e_lock})")
+            encolar_reintento(cola_reintentos, 'mover', current_folder_path, target_folder_path, e_lock)
+            deferred_count += 1
+        except FileNotFoundError:
+            print(f"  - ERROR: Carpeta de origen no encontrada para mover: '{current_folder_path}'. Saltando.")
+            error_count += 1
+        except Exception as e_move:
+            print(f"  - ERROR: Falló el movimiento de la carpeta activa '{current_folder_path}' a '{destination_root_bajas}': {e_move}.")
+            error_count += 1
 
-            # --- Fase 2: Intentar mover la carpeta del activo a Bajas ---
-            try:
-                shutil.move(current_folder_path, destination_root_bajas)
-                print(f"  - MOVIO: Carpeta de empleado '{folder_name}' a '{destination_root_bajas}'.")
-                moved_count += 1
-            except FileNotFoundError:
-                print(f"  - ERROR: Carpeta de origen no encontrada para mover: '{current_folder_path}'. Saltando.")
-                error_count += 1
-            except Exception as e_move:
-                print(f"  - ERROR: Falló el movimiento de la carpeta activa '{current_folder_path}' a '{destination_root_bajas}': {e_move}. Esto podría ocurrir si la carpeta de origen también está bloqueada.")
-                error_count += 1
-        else:
-            skipped_count += 1
+    _reubicar_manifiesto(config, carpetas_movidas)
 
+    anotar(archivos=moved_count)
     print(f"\n[SCRIPT NO DIARIO] Verificación y movimiento de carpetas BAJA completado:")
     print(f"  - Total de carpetas movidas: {moved_count}")
     print(f"  - Total de carpetas saltadas (no BAJA o no numéricas): {skipped_count}")
+    print(f"  - Total de carpetas bloqueadas (diferidas a la cola de reintentos): {deferred_count}")
     print(f"  - Total de errores durante el movimiento: {error_count}\n")
 
+    if cola_propia:
+        finalizar_cola_reintentos(cola_reintentos, config)
+
 def cargar_rutas_archivos_desde_archivo(file_name):
     """
     Cargar una lista de rutas de archivos desde un archivo de texto,
@@ -239,27 +268,27 @@ def extraer_datos_constancia(ruta_pdf, config: Config, original_source_path: str
         datos['Curso'] = 'SAT'
 
         patron_nombre = r"(?:Otorga la presente constancia a:|Otorga el presente reconocimiento a:)\s*\n*(.*?)\s*\n*(?:Por haber concluido satisfactoriamente el curso|POR HABER CONCLUIDO SATISFACTORIAMENTE EL CURSO)"
-        coincidencia_nombre = re.search(patron_nombre, texto_extraido, re.DOTALL | re.IGNORECASE)
+        coincidencia_nombre = buscar_regex('SAT.nombre', re.search, patron_nombre, texto_extraido, re.DOTALL | re.IGNORECASE)
         if coincidencia_nombre:
             datos['Nombre'] = coincidencia_nombre.group(1).strip()
 
         patron_curso = r"Por haber concluido satisfactoriamente el curso\s*\n*(.*?)(?=\s*[\s•]*CONTENIDO TEMÁTICO:?|\s*\n*Impartido en)"
-        coincidencia_curso = re.search(patron_curso, texto_extraido, re.DOTALL | re.IGNORECASE)
+        coincidencia_curso = buscar_regex('SAT.curso', re.search, patron_curso, texto_extraido, re.DOTALL | re.IGNORECASE)
         if coincidencia_curso:
             datos['Curso'] = coincidencia_curso.group(1).strip()
 
         patron_fecha = r"Impartido en .*?(?:el;?|del)\s*(.*?)(?=\n(?:[A-Z][a-zA-ZáéíóúÁÉÍÓÚüÜñÑ\s]+)?(?:Duración|Modalidad)|$)"
-        coincidencia_fecha = re.search(patron_fecha, texto_extraido, re.DOTALL | re.IGNORECASE)
+        coincidencia_fecha = buscar_regex('SAT.fecha[1]', re.search, patron_fecha, texto_extraido, re.DOTALL | re.IGNORECASE)
         if coincidencia_fecha:
             datos['Fecha'] = coincidencia_fecha.group(1).strip()
         if 'contenido' in datos['Fecha'].lower():
             patron_fecha_alt = r"Impartido en.*?el\s*(\d{1,2}\s*de\s*[a-zñáéíóúü]+\s*\d{4})(?=\s*CONTENIDO TEMATICO)"
-            coincidencia_fecha_alt = re.search(patron_fecha_alt, texto_extraido, re.IGNORECASE)
+            coincidencia_fecha_alt = buscar_regex('SAT.fecha[2]', re.search, patron_fecha_alt, texto_extraido, re.IGNORECASE)
             if coincidencia_fecha_alt:
                 datos['Fecha'] = coincidencia_fecha_alt.group(1).strip()
 
         patron_instructor = r"(.+?)\s*\n*Instructor"
-        coincidencia_instructor = re.findall(patron_instructor, texto_extraido, re.DOTALL | re.IGNORECASE)
+        coincidencia_instructor = buscar_regex('SAT.instructor', re.findall, patron_instructor, texto_extraido, re.DOTALL | re.IGNORECASE)
         if coincidencia_instructor:
             last_candidate = coincidencia_instructor[-1].strip()
             lines = [line.strip() for line in last_candidate.split('\n') if line.strip()]
@@ -267,12 +296,12 @@ def extraer_datos_constancia(ruta_pdf, config: Config, original_source_path: str
                 datos["Instructor"] = lines[-1]
 
         patron_grupo = r"Grupo:\s*([A-Za-z0-9.]+(?:[\s-][A-Za-z0-9.]+)*[\s-]*\d{2})"
-        coincidencia_grupo = re.search(patron_grupo, texto_extraido, re.DOTALL | re.IGNORECASE)
+        coincidencia_grupo = buscar_regex('SAT.grupo[1]', re.search, patron_grupo, texto_extraido, re.DOTALL | re.IGNORECASE)
         if coincidencia_grupo:
             datos['Grupo'] = coincidencia_grupo.group(1).strip()
         else:
             patron_grupo_alt = r"\bAVSEC-\d{4}-\d{2}\b"
-            coincidencia_grupo_alt = re.search(patron_grupo_alt, texto_extraido)
+            coincidencia_grupo_alt = buscar_regex('SAT.grupo[2]', re.search, patron_grupo_alt, texto_extraido)
             if coincidencia_grupo_alt:
                 datos['Grupo'] = coincidencia_grupo_alt.group(0).strip()
 
@@ -280,36 +309,36 @@ def extraer_datos_constancia(ruta_pdf, config: Config, original_source_path: str
         datos['Curso'] = 'SMS'
 
         patron_nombre_grants = r"Grants\s+this\s+recognition\s+to:\s*\n*(.*?)(?:\n|$)"
-        coincidencia_nombre_grants = re.search(patron_nombre_grants, texto_extraido, re.IGNORECASE)
+        coincidencia_nombre_grants = buscar_regex('SMS.nombre[1]', re.search, patron_nombre_grants, texto_extraido, re.IGNORECASE)
         if coincidencia_nombre_grants and coincidencia_nombre_grants.group(1).strip():
             nombre_limpio = re.sub(r'\s+', ' ', coincidencia_nombre_grants.group(1))
             datos['Nombre'] = nombre_limpio.strip()
         else:
             patron_nombre_inicio = r"^\s*([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑa-záéíóúñ]+)+)\s*\n+Impartido\s+"
-            coincidencia_nombre_inicio = re.search(patron_nombre_inicio, texto_extraido, re.MULTILINE)
+            coincidencia_nombre_inicio = buscar_regex('SMS.nombre[2]', re.search, patron_nombre_inicio, texto_extraido, re.MULTILINE)
             if coincidencia_nombre_inicio and coincidencia_nombre_inicio.group(1).strip():
                 datos['Nombre'] = re.sub(r'\s+', ' ', coincidencia_nombre_inicio.group(1)).strip()
             else:
                 patron_nombre_sms = r"Seguridad\s+Aérea\s*\n+([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+)+)"
-                coincidencia_nombre_sms = re.search(patron_nombre_sms, texto_extraido, re.IGNORECASE)
+                coincidencia_nombre_sms = buscar_regex('SMS.nombre[3]', re.search, patron_nombre_sms, texto_extraido, re.IGNORECASE)
                 if coincidencia_nombre_sms:
                     datos['Nombre'] = coincidencia_nombre_sms.group(1).strip()
 
         if "(sms)" in datos['Nombre'].lower():
             patron_nombre_inicio = r"^\s*([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑa-záéíóúñ]+)+)\s*\n+Impartido\s+"
-            coincidencia_nombre_inicio = re.search(patron_nombre_inicio, texto_extraido, re.MULTILINE)
+            coincidencia_nombre_inicio = buscar_regex('SMS.nombre_corregido[1]', re.search, patron_nombre_inicio, texto_extraido, re.MULTILINE)
             if coincidencia_nombre_inicio and coincidencia_nombre_inicio.group(1).strip():
                 datos['Nombre'] = re.sub(r'\s+', ' ', coincidencia_nombre_inicio.group(1)).strip()
             else:
                 first_line_text = texto_extraido.split('\n')[0] if texto_extraido else ''
                 patron_nombre_primera_linea = r"^\s*([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+)+)\s*$"
-                coincidencia_nombre_primera_linea = re.search(patron_nombre_primera_linea, first_line_text)
+                coincidencia_nombre_primera_linea = buscar_regex('SMS.nombre_corregido[2]', re.search, patron_nombre_primera_linea, first_line_text)
                 if coincidencia_nombre_primera_linea:
                     nombre_limpio_3 = re.sub(r'\s+', ' ', coincidencia_nombre_primera_linea.group(1))
                     datos['Nombre'] = nombre_limpio_3.strip()
 
         patron_curso = r"(inicial\s+de\s+Safety\s+Management\s+System\s+\(SMS\)|recurrente\s+de\s+Safety\s+Management\s+System\s+\(SMS\)|Safety\s+Management\s+System\s+\(SMS\))"
-        coincidencia_curso = re.search(patron_curso, texto_extraido, re.IGNORECASE)
+        coincidencia_curso = buscar_regex('SMS.curso', re.search, patron_curso, texto_extraido, re.IGNORECASE)
         if coincidencia_curso:
             curso_limpio = re.sub(r'\s+', ' ', coincidencia_curso.group(0))
             datos['Curso'] = curso_limpio.replace('.', '').strip().capitalize()
@@ -318,7 +347,7 @@ def extraer_datos_constancia(ruta_pdf, config: Config, original_source_path: str
             r"Impartido\s+el\s+(\d{1,2}\s+(?:de|del)\s+[a-zñáéíóúü]+\s+(?:de|del)?\s*\d{4})",
             re.IGNORECASE
             )
-        coincidencia_fecha = patron_fecha_1.search(texto_extraido)
+        coincidencia_fecha = buscar_regex('SMS.fecha[1]', re.search, patron_fecha_1, texto_extraido)
 
         if coincidencia_fecha:
             datos['Fecha'] = re.sub(r'\s+', ' ', coincidencia_fecha.group(1)).replace('del', 'de').strip()
@@ -327,54 +356,54 @@ def extraer_datos_constancia(ruta_pdf, config: Config, original_source_path: str
                 r"Impartido\s+en.*?el\s+(\d{1,2}\s+(?:de|del)\s+[a-zñáéíóúü]+\s+(?:de|del)?\s*\d{4})",
                 re.IGNORECASE
             )
-            coincidencia_fecha = patron_fecha_2.search(texto_extraido)
+            coincidencia_fecha = buscar_regex('SMS.fecha[2]', re.search, patron_fecha_2, texto_extraido)
             if coincidencia_fecha:
                 fecha_limpia = re.sub(r'\s+', ' ', coincidencia_fecha.group(1)).replace('del', 'de').strip()
                 datos['Fecha'] = fecha_limpia
 
         patron_grupo_n = r"(SMS[\s-]N-\d{3,4}-\d{2})"
-        coincidencia_grupo = re.search(patron_grupo_n, texto_extraido)
+        coincidencia_grupo = buscar_regex('SMS.grupo[1]', re.search, patron_grupo_n, texto_extraido)
         if coincidencia_grupo:
             datos['Grupo'] = coincidencia_grupo.group(1).strip()
         else:
             patron_grupo_sac = r"(SMS-SAC-\d{3,4}-\d{2})"
-            coincidencia_grupo_sac = re.search(patron_grupo_sac, texto_extraido)
+            coincidencia_grupo_sac = buscar_regex('SMS.grupo[2]', re.search, patron_grupo_sac, texto_extraido)
             if coincidencia_grupo_sac:
                 datos['Grupo'] = coincidencia_grupo_sac.group(1).strip()
             else:
                 patron_grupo_sms_directo = r"(SMS-\d{3,4}-\d{2})"
-                coincidencia_grupo_sms_directo = re.search(patron_grupo_sms_directo, texto_extraido)
+                coincidencia_grupo_sms_directo = buscar_regex('SMS.grupo[3]', re.search, patron_grupo_sms_directo, texto_extraido)
                 if coincidencia_grupo_sms_directo:
                     datos['Grupo'] = coincidencia_grupo_sms_directo.group(1).strip()
                 else:
                     patron_grupo_general = r"(SMS\s*–\s*[A-Z]+\s*–\s*\d+\s*-\s*\d+|SMS[\s-]?N-\d+-\d+|SMS-SAC-\d+-\d+)"
-                    coincidencia_grupo_general = re.search(patron_grupo_general, texto_extraido)
+                    coincidencia_grupo_general = buscar_regex('SMS.grupo[4]', re.search, patron_grupo_general, texto_extraido)
                     if coincidencia_grupo_general:
                         datos['Grupo'] = coincidencia_grupo_general.group(1).strip()
                     else:
                         patron_sin_sms = r"Grupo:\s*(\d+-\d+|[A-Z]+-[A-Z]+-[A-Z]-\d+-\d+)"
-                        coincidencia_sin_sms = re.search(patron_sin_sms, texto_extraido)
+                        coincidencia_sin_sms = buscar_regex('SMS.grupo[5]', re.search, patron_sin_sms, texto_extraido)
                         if coincidencia_sin_sms:
                             datos['Grupo'] = coincidencia_sin_sms.group(1).strip()
                         else:
                             patron_grupo_avsec_fallback_1 = r"Grupo:\s*((?:VH-)?(?:PRO-)?AVSEC-\d{3,4}-\d{2}\b)"
-                            coincidencia_avsec_fallback = re.search(patron_grupo_avsec_fallback_1, texto_extraido, re.IGNORECASE)
+                            coincidencia_avsec_fallback = buscar_regex('SMS.grupo[6]', re.search, patron_grupo_avsec_fallback_1, texto_extraido, re.IGNORECASE)
                             if coincidencia_avsec_fallback:
                                 datos['Grupo'] = coincidencia_avsec_fallback.group(1).strip()
                             else:
                                 patron_grupo_avsec_fallback_2 = r"((?:VH-)?(?:PRO-)?AVSEC-\d{3,4}-\d{2}\b)"
-                                coincidencia_avsec_fallback = re.search(patron_grupo_avsec_fallback_2, texto_extraido, re.IGNORECASE)
+                                coincidencia_avsec_fallback = buscar_regex('SMS.grupo[7]', re.search, patron_grupo_avsec_fallback_2, texto_extraido, re.IGNORECASE)
                                 if coincidencia_avsec_fallback:
                                     datos['Grupo'] = coincidencia_avsec_fallback.group(1).strip()
 
         patron_instructor = r"([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+)+)\s*\n*Instructor"
-        coincidencia_instructor = re.search(patron_instructor, texto_extraido, re.DOTALL)
+        coincidencia_instructor = buscar_regex('SMS.instructor[1]', re.search, patron_instructor, texto_extraido, re.DOTALL)
         if coincidencia_instructor:
             instructor_limpio = coincidencia_instructor.group(1).strip()
             datos["Instructor"] = re.sub(r'\s*Instructor$', '', instructor_limpio, flags=re.IGNORECASE).strip()
         else:
             patron_coordinador = r"([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+)+)\s*\n*Coordinador de Entrenamiento"
-            coincidencia_coordinador = re.search(patron_coordinador, texto_extraido, re.DOTALL | re.IGNORECASE)
+            coincidencia_coordinador = buscar_regex('SMS.instructor[2]', re.search, patron_coordinador, texto_extraido, re.DOTALL | re.IGNORECASE)
             if coincidencia_coordinador:
                 datos["Instructor"] = coincidencia_coordinador.group(1).strip()
 
@@ -382,22 +411,22 @@ def extraer_datos_constancia(ruta_pdf, config: Config, original_source_path: str
         datos['Curso'] = 'AVSEC'
 
         patron_nombre_avsec = r"^(.*?)\s+(?:Impartido en (?:la )?Ciudad de|Por haber concluido satisfactoriamente el curso|CONTENIDO TEMATICO|Curso:|Folio:|Viva Aerobus|Duración de:)"
-        coincidencia_nombre = re.search(patron_nombre_avsec, texto_extraido, re.DOTALL | re.IGNORECASE)
+        coincidencia_nombre = buscar_regex('AVSEC.nombre', re.search, patron_nombre_avsec, texto_extraido, re.DOTALL | re.IGNORECASE)
         if coincidencia_nombre:
             datos['Nombre'] = coincidencia_nombre.group(1).strip()
 
         patron_curso_avsec = r"Por haber concluido satisfactoriamente el curso\s*\n*(.*?)(?:\s*Calificación obtenida:?|\s*Duración de:)"
-        coincidencia_curso = re.search(patron_curso_avsec, texto_extraido, re.DOTALL | re.IGNORECASE)
+        coincidencia_curso = buscar_regex('AVSEC.curso', re.search, patron_curso_avsec, texto_extraido, re.DOTALL | re.IGNORECASE)
         if coincidencia_curso:
             datos['Curso'] = coincidencia_curso.group(1).strip()
 
         patron_fecha_avsec = r"Impartido en .*?\s*el\s*(.*?)(?=\n|Duración|Modalidad)"
-        coincidencia_fecha = re.search(patron_fecha_avsec, texto_extraido, re.DOTALL | re.IGNORECASE)
+        coincidencia_fecha = buscar_regex('AVSEC.fecha', re.search, patron_fecha_avsec, texto_extraido, re.DOTALL | re.IGNORECASE)
         if coincidencia_fecha:
             datos['Fecha'] = coincidencia_fecha.group(1).strip()
 
         patron_instructor_avsec = r"(.+?)\s*\n*Instructor(?: Autorizado)?\.?"
-        coincidencia_instructor = re.findall(patron_instructor_avsec, texto_extraido, re.DOTALL | re.IGNORECASE)
+        coincidencia_instructor = buscar_regex('AVSEC.instructor', re.findall, patron_instructor_avsec, texto_extraido, re.DOTALL | re.IGNORECASE)
         if coincidencia_instructor:
             last_candidate = coincidencia_instructor[-1].strip()
             lines = [line.strip() for line in last_candidate.split('\n') if line.strip()]
@@ -410,7 +439,7 @@ def extraer_datos_constancia(ruta_pdf, config: Config, original_source_path: str
                     datos['Instructor'] = 'Oscar Monzalvo Martinez'
 
         patron_grupo_avsec = r"(?:Grupo:\s*|Curso:\s*\d{1,2}-\d{1,2}\s*\n*|\b)((?:PRO-)?AVSEC-\d{3,4}-\d{2}\b)"
-        coincidencia_grupo = re.search(patron_grupo_avsec, texto_extraido, re.DOTALL | re.IGNORECASE)
+        coincidencia_grupo = buscar_regex('AVSEC.grupo', re.search, patron_grupo_avsec, texto_extraido, re.DOTALL | re.IGNORECASE)
 
         if coincidencia_grupo:
             datos['Grupo'] = coincidencia_grupo.group(1).strip()
@@ -450,22 +479,19 @@ def procesar_archivos_constancias(lista_rutas_archivos, config: Config): # Acept
 
     return datos_cojunto_excluidos
 
-def limpiar_partes_archivo(text, vocales_acentos_map: dict):
+def limpiar_partes_archivo_columna(serie: pd.Series, vocales_acentos_map: dict):
     """
-    Limpia una cadena de texto para ser usada como parte de un nombre de archivo.
-    Elimina caracteres inválidos y reemplaza espacios con guiones bajos.
-    Normaliza acentos.
+    Limpia una columna de texto para usarla como parte de un nombre de archivo: normaliza acentos, elimina caracteres inválidos y
+    reemplaza espacios con guiones bajos usando operaciones vectorizadas de texto. Los valores no texto quedan como "".
     """
-    if not isinstance(text, str):
-        return ""
-
-    text_normalized_accents = normalizar_acentos(text, vocales_acentos_map)
+    valores = serie.astype(object)
+    texto = valores.where(valores.map(lambda v: isinstance(v, str)), '').str.normalize('NFC')
 
-    invalid_chars = r'[<>:"/\\|?*\']'
-    cleaned_text = re.sub(invalid_chars, '', text_normalized_accents)
-    cleaned_text = re.sub(r'\s+', '_', cleaned_text).strip('_')
+    for acento, sin_acento in vocales_acentos_map.items():
+        texto = texto.str.replace(acento, sin_acento, regex=False)
 
-    return cleaned_text
+    texto = texto.str.replace(r'[<>:"/\\|?*\']', '', regex=True)
+    return texto.str.replace(r'\s+', '_', regex=True).str.strip('_')
 
 def normalizar_acentos(texto, vocales_acentos_map: dict):
     """
@@ -481,49 +507,30 @@ def normalizar_acentos(texto, vocales_acentos_map: dict):
 
     return texto_procesado
 
-def homologar_curso(curso_raw: str):
-    """Homologa el nombre de un curso a una de las categorias predefinidas: 'SAT(Rampa)', 'SAT(Operador)', 'SAT(ASC)', 'AVSEC', 'SMS'
+def homologar_cursos(serie_cursos: pd.Series, reglas_homologacion: list):
+    """Homologa una columna de cursos a las categorias predefinidas ('SAT(Rampa)', 'SAT(Operador)', 'SAT(ASC)', 'AVSEC', 'SMS', etc.)
+    según la tabla ordenada de reglas 'reglas_homologacion' (ver Config). Las reglas se evalúan con 'np.select' solo sobre
+    los valores únicos y el resultado se mapea de vuelta; lo que no coincide con ninguna regla (o no es texto) queda como 'OTRO'.
     """
+    valores = serie_cursos.astype(object)
+    es_texto = valores.map(lambda v: isinstance(v, str))
+    unicos = pd.Series(pd.unique(valores[es_texto]), dtype=object)
+    curso_lower = unicos.str.lower()
+
+    condiciones = [
+        np.logical_and.reduce([
+            curso_lower.str.contains('|'.join(re.escape(texto) for texto in grupo), regex=True).to_numpy(dtype=bool)
+            for grupo in grupos
+        ])
+        for _, grupos in reglas_homologacion
+    ]
+    categorias = [categoria for categoria, _ in reglas_homologacion]
+    homologados = pd.Series(
+        np.select(condiciones, categorias, default='OTRO') if condiciones else 'OTRO',
+        index=unicos, dtype=object
+    )
 
-    if not isinstance(curso_raw, str):
-        return "OTRO"
-
-    curso_lower = curso_raw.lower()
-
-    if 'cabin search' in curso_lower:
-        return 'Cabin Search'
-
-    if 'prescreening of passengers (trafico)' in curso_lower:
-        return 'P.P(Trafico)'
-
-    if 'servicio de apoyo en tierra' in curso_lower or 'servicios de apoyo en tierra' in curso_lower:
-        if 'rampa' in curso_lower or 'agente de rampa' in curso_lower:
-            return 'SAT(Rampa)'
-        if 'operador autoprestacion' in curso_lower:
-            return 'SAT(Operador Autoprestacion)'
-        if 'operador' in curso_lower:
-            return 'SAT(Operador)'
-        if 'asesor de servicio al cliente' in curso_lower or 'asesor de servicio a cliente' in curso_lower or 'asc' in curso_lower:
-            return 'SAT(ASC)'
-        return 'SAT(General)'
-
-    if 'avsec' in curso_lower or 'seguridad de la aviacion' in curso_lower:
-        return 'AVSEC'
-
-    if 'safety management system' in curso_lower or 'sms' in curso_lower:
-        return 'SMS'
-
-    if 'personal perteneciente' in curso_lower or 'personal permaneciente' in curso_lower:
-        if 'rampa autoprestacion' in curso_lower:
-            return 'SAT(Rampa Autoprestacion)'
-        if 'rampa' in curso_lower:
-            return 'SAT(Rampa)'
-        if 'trafico' in curso_lower:
-            return 'SAT(Trafico)'
-        if 'csa autoprestacion' in curso_lower:
-            return 'SAT(CSA Autoprestacion)'
-
-    return 'OTRO'
+    return valores.where(es_texto).map(homologados).fillna('OTRO').astype(object)
 
 def dividir_pdf_constancia_agrupado(grouped_pdf_path: str, config: Config): # Acepta el objeto Config
     """
@@ -545,10 +552,10 @@ def dividir_pdf_constancia_agrupado(grouped_pdf_path: str, config: Config): # Ac
 
             is_certificate_page = False
 
-            if re.search(patron_otorgamiento_curso, text, re.DOTALL | re.IGNORECASE):
+            if buscar_regex('division.otorgamiento', re.search, patron_otorgamiento_curso, text, re.DOTALL | re.IGNORECASE):
                 is_certificate_page = True
 
-            if not is_certificate_page and re.search(patron_avsec_footer, text, re.IGNORECASE):
+            if not is_certificate_page and buscar_regex('division.pie_avsec', re.search, patron_avsec_footer, text, re.IGNORECASE):
                 is_certificate_page = True
 
             if not is_certificate_page:
@@ -661,41 +668,99 @@ def parse_fecha_inicio(fecha_texto, mapeo_meses_map: dict):
 
     return pd.NaT
 
-def cargar_data_hc(path_hc_table: str, vocales_acentos_map: dict):
+# --- Parser vectorizado de fechas ---
+# La cascada de patrones de 'parse_fecha_inicio' en una sola regex anclada: las alternativas se prueban en el
+# mismo orden de prioridad (la primera que coincide gana) y '.*?' reproduce la búsqueda en cualquier posición
+# de los patrones que no estaban anclados al inicio.
+_LETRAS_MES = r"[a-zñáéíóúü]"
+_PATRON_FECHA_CASCADA = re.compile(
+    r"^(?:"
+    r".*?(\d{1,2})\s*de\s*(" + _LETRAS_MES + r"+)(?:\s*de)?"                               # dd de mes (de)
+    r"|(\d{1,2})\s*(?:al|a)\s*\d{1,2}\s*(" + _LETRAS_MES + r"+)"                            # dd al dd mes
+    r"|(\d{1,2})(?:[-\s]?\d{1,2})?[-\s]?(" + _LETRAS_MES + r"+)"                              # dd-dd mes
+    r"|(?:" + _LETRAS_MES + r"{2,4}[-\s]?)?(\d{1,2})[-\s]?(" + _LETRAS_MES + r"{3,})"          # dia dd mes
+    r"|.*?(\d{1,2})\s*(" + _LETRAS_MES + r"+)"                                              # dd mes
+    r")",
+    re.IGNORECASE | re.DOTALL
+)
+# Último grupo de 4 dígitos tal como lo devuelve 're.findall(r"(\d{4})", texto)[-1]' (coincidencias sin traslape).
+_PATRON_FECHA_ANIO = re.compile(r"^.*(?<!\d)(?:\d{4})*(\d{4})\d{0,3}(?!\d)", re.DOTALL)
+
+def parse_fechas_vectorizado(serie_fechas: pd.Series, mapeo_meses_map: dict):
+    """
+    Versión vectorizada de 'parse_fecha_inicio' para una columna completa. Solo procesa los valores únicos:
+    extrae año, día y mes con dos pasadas de 'str.extract', mapea los meses con 'mapeo_meses' en una sola
+    búsqueda y construye las fechas en bloque. Retorna una serie datetime64 (NaT si no se pudo parsear),
+    equivalente a 'pd.to_datetime(serie.apply(parse_fecha_inicio), errors="coerce")'.
     """
-    Carga la tambla de empleado (HC), aplica normalizaciones y crea una columna
-    adicional con el nombre en formato "NOMBRE APELLIDO(P) APELLIDO(M)" para mejorar las coincidencias.
+    valores = serie_fechas.astype(object)
+    es_texto = valores.map(lambda v: isinstance(v, str))
+    unicos = pd.Series(pd.unique(valores[es_texto]), dtype=object)
+    if unicos.empty:
+        return pd.Series(pd.NaT, index=serie_fechas.index, dtype='datetime64[ns]')
+
+    # 'string[python]' mantiene el motor 're' de Python (la regex del año usa lookbehind, no soportado en Arrow)
+    texto = unicos.astype('string[python]').str.strip()
+    anio = texto.str.extract(_PATRON_FECHA_ANIO, expand=False)
+    partes = texto.str.lower().str.extract(_PATRON_FECHA_CASCADA)
+    dia = partes[0].fillna(partes[2]).fillna(partes[4]).fillna(partes[6]).fillna(partes[8])
+    mes_raw = partes[1].fillna(partes[3]).fillna(partes[5]).fillna(partes[7]).fillna(partes[9])
+    mes = mes_raw.str.lower().map(mapeo_meses_map)
+
+    # 'AAAAMMDD' con formato fijo: fechas imposibles (ej. 31 de febrero) o fuera de rango quedan como NaT
+    fecha_compacta = anio + mes.astype('Int64').astype('string').str.zfill(2) + dia.str.zfill(2)
+    fechas = pd.to_datetime(fecha_compacta, format='%Y%m%d', errors='coerce')
+    fechas.index = unicos
+    resultado = valores.where(es_texto).map(fechas)
+    return pd.to_datetime(resultado, errors='coerce')
+
+# Textos que 'pd.read_csv' interpreta como nulos por defecto. Se aplican a la tabla HC recibida en memoria
+# para que se normalice exactamente igual que cuando se lee desde 'hc_table.csv'.
+_TEXTOS_NULOS_CSV = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+}
+
+def _es_columna_texto(series):
+    """Indica si la columna es de texto (object, string de Python/Arrow o categórica)."""
+    return (pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype)
+            or isinstance(series.dtype, pd.CategoricalDtype))
+
+def normalizar_data_hc(df_hc: pd.DataFrame, vocales_acentos_map: dict, dtype_policy: dict = None):
+    """
+    Aplica a la tabla de empleados (HC) las normalizaciones para el merge de nombres y crea la columna
+    adicional con el nombre en formato "NOMBRE APELLIDO(P) APELLIDO(M)". Acepta la tabla leída desde
+    'hc_table.csv' o la que 'run_hc_etl' devuelve en memoria.
+    """
+    df_hc = df_hc.copy()
+    for col in ['nombre_completo', 'nombre', 'paterno', 'materno', 'estatus']:
+        if col in df_hc.columns and _es_columna_texto(df_hc[col]):
+            valores = df_hc[col].astype(object)
+            valores = valores.mask(valores.isin(_TEXTOS_NULOS_CSV))
+            df_hc[col] = valores.astype('string').fillna('').str.strip().str.upper().apply(lambda x: normalizar_acentos(x, vocales_acentos_map))
+        elif col not in df_hc.columns:
+            print(f"Advertencia: La columna '{col}' no se encuentra en el archivo HC. No se podra usar para el merge 'invertido'.")
+            df_hc[col] = ''
+
+    # Creamos la columna de nombre 'invertido' para que coincida con "NOMBRE, APELLIDO(P), APELLIDO(M)"
+    df_hc['nombre_completo_invertido'] = df_hc['nombre'] + ' ' + df_hc['paterno'] + ' ' + df_hc['materno']
+    df_hc['nombre_completo_invertido'] = df_hc['nombre_completo_invertido'].str.replace(r'\s+', ' ', regex=True).str.strip()
+
+    df_hc['#emp'] = df_hc['#emp'].astype('string').str.strip()
+
+    df_hc['nombre_completo'] = df_hc['nombre_completo'].str.replace('REYES nan ALEJANDRO', 'REYES ALEJANDRO', regex=False)
+    return aplicar_politica_dtypes(df_hc, dtype_policy)
+
+def cargar_data_hc(path_hc_table: str, vocales_acentos_map: dict, dtype_policy: dict = None):
+    """
+    Carga la tambla de empleado (HC) desde 'hc_table.csv' y aplica las normalizaciones de 'normalizar_data_hc'.
+    Solo se usa cuando el ETL de PDFs se ejecuta por separado; el orquestador entrega la tabla en memoria.
     """
     df_hc = pd.DataFrame(columns=['#emp', 'nombre_completo', 'nombre', 'paterno', 'materno', 'estatus'])
 
     try:
         df_hc = pd.read_csv(path_hc_table, encoding='utf-8')
-        df_hc = df_hc.apply(lambda col: normalizar_acentos(col, vocales_acentos_map)
-                            if col.dtype == 'object' else col)
-        for col in ['nombre_completo', 'nombre', 'paterno', 'materno', 'estatus']:
-            if col in df_hc.columns and df_hc[col].dtype == 'object':
-                df_hc[col] = df_hc[col].astype('string').fillna('').str.strip().str.upper().apply(lambda x: normalizar_acentos(x, vocales_acentos_map))
-            elif col not in df_hc.columns:
-                print(f"Advertencia: La columna '{col}' no se encuentra en el archivo HC. No se podra usar para el merge 'invertido'.")
-                df_hc[col] = ''
-
-        # Creamos la columna de nombre 'invertido' para que coincida con "NOMBRE, APELLIDO(P), APELLIDO(M)"
-        df_hc['nombre_completo_invertido'] = df_hc['nombre'] + ' ' + df_hc['paterno'] + ' ' + df_hc['materno']
-        df_hc['nombre_completo_invertido'] = df_hc['nombre_completo_invertido'].str.replace(r'\s+', ' ', regex=True).str.strip()
-
-        # Revisar que 'nombre_completo' (original) tambien este normalizada
-        if 'nombre_completo' in df_hc.columns:
-            df_hc['nombre_completo'] = df_hc['nombre_completo'].astype('string').fillna('').str.strip().str.upper().apply(lambda x: normalizar_acentos(x, vocales_acentos_map))
-        else:
-            print("Advertencia: La columna 'nombre_completo' no se encuentra en el archivo HC. Se utilizará el formato invertido como principal.")
-            # Si no hay 'nombre_completo' original, la columna 'nombre_completo_invertido' podría ser la principal
-            df_hc['nombre_completo'] = df_hc['nombre_completo_invertido']
-
-        df_hc['#emp'] = df_hc['#emp'].astype('string').str.strip()
-
-        df_hc['nombre_completo'] = df_hc['nombre_completo'].str.replace('REYES nan ALEJANDRO', 'REYES ALEJANDRO', regex=False)
-
-
+        df_hc = normalizar_data_hc(df_hc, vocales_acentos_map, dtype_policy)
         print(f"\nTabla de empleados cargada exitosamente desde: {path_hc_table}\n")
     except FileNotFoundError:
         print(f"\nAdverencia: El archivo de empleados '{path_hc_table}' no fue encontrado. El proceso continuara sin datos de empleados para merge.\n")
@@ -704,10 +769,249 @@ def cargar_data_hc(path_hc_table: str, vocales_acentos_map: dict):
         df_hc = pd.DataFrame(columns=['#emp', 'nombre_completo', 'estatus'])
     return df_hc
 
-def procesar_y_mergear_constancias(datos_conjunto_excluidos: list, df_hc: pd.DataFrame, vocales_acentos_map: dict):
+def construir_set_bajas(df_hc: pd.DataFrame):
+    """Retorna el set de '#emp' (como texto) de los empleados con estatus 'BAJA' en la tabla HC."""
+    if df_hc.empty or 'estatus' not in df_hc.columns:
+        return set()
+    estatus = df_hc['estatus'].astype('string').str.upper().str.strip()
+    return set(df_hc.loc[estatus == 'BAJA', '#emp'].astype('string').str.strip().unique())
+
+def clave_canonica_nombre(nombres: pd.Series):
+    """Clave canónica de un nombre: sus palabras ordenadas alfabéticamente (no depende del orden nombre/apellidos)."""
+    return nombres.astype(object).str.split().map(lambda palabras: ' '.join(sorted(palabras)), na_action='ignore')
+
+def construir_indice_nombres(df_hc: pd.DataFrame):
+    """
+    Construye el índice de nombres de HC: una sola tabla hash (indexada por 'clave') con '#emp' y 'estatus'.
+    Claves por prioridad: 1 = 'nombre_completo_invertido' (Nombre Apellidos), 2 = 'nombre_completo' (Apellidos Nombre),
+    3 = clave canónica (palabras ordenadas). Si una clave corresponde a más de un empleado en su nivel de mayor
+    prioridad (homónimos) se marca como 'ambigua', no asigna '#emp' y guarda los '#emp' posibles en 'candidatos'.
+    """
+    niveles = [
+        (1, df_hc['nombre_completo_invertido']),
+        (2, df_hc['nombre_completo']),
+        (3, clave_canonica_nombre(df_hc['nombre_completo'])),
+    ]
+    df_claves = pd.concat([
+        pd.DataFrame({
+            'clave': claves.astype(object).to_numpy(),
+            '#emp': df_hc['#emp'].astype(object).to_numpy(),
+            'estatus': df_hc['estatus'].astype(object).to_numpy(),
+            'prioridad': prioridad,
+        })
+        for prioridad, claves in niveles
+    ], ignore_index=True)
+    df_claves = df_claves[df_claves['clave'].notna() & (df_claves['clave'] != '')]
+
+    # Cada clave se queda con su nivel de mayor prioridad; un mismo empleado cuenta una sola vez
+    df_claves = df_claves.sort_values('prioridad', kind='stable').drop_duplicates(subset=['clave', '#emp'])
+    df_claves = df_claves[df_claves['prioridad'] == df_claves.groupby('clave')['prioridad'].transform('min')]
+
+    candidatos = df_claves.groupby('clave', sort=False)['#emp'].agg(lambda emps: ', '.join(map(str, emps)))
+    indice = df_claves.drop_duplicates(subset=['clave']).set_index('clave')
+    indice['ambigua'] = df_claves.groupby('clave', sort=False)['#emp'].size().reindex(indice.index) > 1
+    indice['candidatos'] = candidatos.reindex(indice.index).where(indice['ambigua'])
+    indice.loc[indice['ambigua'], ['#emp', 'estatus']] = np.nan
+
+    if indice['ambigua'].any():
+        print(f"  - Advertencia: {indice['ambigua'].sum()} claves de nombre en HC son ambiguas (homónimos); no se asignarán automáticamente.")
+    return indice
+
+def _trigramas(texto: str):
+    """Trigramas de caracteres de un texto (con espacios de relleno en los extremos)."""
+    texto = f"  {texto} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+def construir_indice_difuso(df_hc: pd.DataFrame):
+    """
+    Construye el índice para el emparejamiento aproximado de nombres: los empleados de HC (clave canónica y ambos
+    órdenes de nombre) y un índice invertido trigrama -> posiciones, usado como bloqueo para comparar cada nombre
+    solo contra los empleados con los que comparte más trigramas.
+    """
+    df_emps = pd.DataFrame({
+        '#emp': df_hc['#emp'].astype(object).to_numpy(),
+        'estatus': df_hc['estatus'].astype(object).to_numpy(),
+        'nombre_completo': df_hc['nombre_completo'].astype(object).fillna('').to_numpy(),
+        'nombre_completo_invertido': df_hc['nombre_completo_invertido'].astype(object).fillna('').to_numpy(),
+    })
+    df_emps['clave'] = clave_canonica_nombre(df_emps['nombre_completo'])
+    df_emps = df_emps[df_emps['clave'].notna() & (df_emps['clave'] != '')]
+    df_emps = df_emps.drop_duplicates(subset=['#emp', 'clave']).reset_index(drop=True)
+
+    posiciones_por_trigrama = {}
+    for posicion, clave in enumerate(df_emps['clave']):
+        for trigrama in _trigramas(clave):
+            posiciones_por_trigrama.setdefault(trigrama, []).append(posicion)
+
+    return {
+        'empleados': df_emps,
+        'trigramas': {trigrama: np.array(posiciones, dtype=np.int32) for trigrama, posiciones in posiciones_por_trigrama.items()},
+    }
+
+def buscar_candidatos_nombre(nombres: pd.Series, indice_difuso: dict, max_candidatos: int = 3, tamano_bloque: int = 25):
+    """
+    Busca los empleados de HC más parecidos a cada nombre único. Retorna un dict nombre -> lista de
+    (#emp, estatus, score) ordenada por score (un candidato por empleado, máximo 'max_candidatos').
+    El score (0-1) es el mayor 'SequenceMatcher.ratio' entre la clave canónica y ambos órdenes del nombre en HC,
+    calculado solo para los 'tamano_bloque' empleados que comparten más trigramas con el nombre.
+    """
+    df_emps = indice_difuso['empleados']
+    trigramas = indice_difuso['trigramas']
+    total_emps = len(df_emps)
+    emps, estatus = df_emps['#emp'].to_numpy(), df_emps['estatus'].to_numpy()
+    claves_hc = df_emps['clave'].to_numpy()
+    nombres_hc, nombres_invertidos_hc = df_emps['nombre_completo'].to_numpy(), df_emps['nombre_completo_invertido'].to_numpy()
+
+    candidatos_por_nombre = {}
+    for nombre in pd.Series(nombres, dtype=object).dropna().unique():
+        clave = ' '.join(sorted(nombre.split()))
+        posiciones = [trigramas[t] for t in _trigramas(clave) if t in trigramas] if clave else []
+        if not posiciones:
+            candidatos_por_nombre[nombre] = []
+            continue
+
+        # Bloqueo: empleados con más trigramas en común
+        comunes = np.bincount(np.concatenate(posiciones), minlength=total_emps)
+        bloque = np.argpartition(-comunes, min(tamano_bloque, total_emps) - 1)[:tamano_bloque]
+        bloque = bloque[comunes[bloque] > 0]
+
+        # SequenceMatcher guarda el análisis de 'b' (el nombre buscado); solo cambia 'a' por candidato
+        comparador_clave, comparador_nombre = SequenceMatcher(None, b=clave), SequenceMatcher(None, b=nombre)
+        mejor_por_emp = {}
+        for pos in bloque:
+            comparador_clave.set_seq1(claves_hc[pos])
+            score = comparador_clave.ratio()
+            for nombre_hc in (nombres_hc[pos], nombres_invertidos_hc[pos]):
+                comparador_nombre.set_seq1(nombre_hc)
+                score = max(score, comparador_nombre.ratio())
+            if score > mejor_por_emp.get(emps[pos], (None, -1.0))[1]:
+                mejor_por_emp[emps[pos]] = (estatus[pos], score)
+
+        ordenados = sorted(mejor_por_emp.items(), key=lambda item: item[1][1], reverse=True)[:max_candidatos]
+        candidatos_por_nombre[nombre] = [(emp, est, round(score, 4)) for emp, (est, score) in ordenados]
+    return candidatos_por_nombre
+
+def aceptar_candidato_difuso(candidatos: list, umbral: float, margen_minimo: float):
+    """Retorna el mejor candidato (#emp, estatus, score) si supera 'umbral' y aventaja al siguiente empleado por 'margen_minimo'; si no, None."""
+    if not candidatos or candidatos[0][2] < umbral:
+        return None
+    if len(candidatos) > 1 and candidatos[0][2] - candidatos[1][2] < margen_minimo:
+        return None
+    return candidatos[0]
+
+def formatear_candidatos(candidatos: list):
+    """Texto legible de una lista de candidatos: '#emp (score); ...'."""
+    return '; '.join(f"{emp} ({score:.2f})" for emp, _, score in candidatos)
+
+def preparar_contexto_hc(df_hc_tabla: pd.DataFrame, config: Config):
+    """
+    Construye, a partir de la tabla HC en memoria (salida de 'run_hc_etl'), los insumos que necesita el ETL de PDFs:
+    'df_hc' (tabla normalizada con ambos órdenes de nombre), 'indice_nombres' (ver 'construir_indice_nombres'),
+    'indice_difuso' (ver 'construir_indice_difuso'; None si el emparejamiento aproximado está deshabilitado)
+    y 'bajas_emp_set' ('#emp' con estatus 'BAJA').
+    Si no se recibe la tabla, se carga desde 'hc_table.csv'.
+    """
+    if df_hc_tabla is None:
+        df_hc = cargar_data_hc(config.hc_table_path, config.vocales_acentos, config.dtype_policy)
+    else:
+        df_hc = normalizar_data_hc(df_hc_tabla, config.vocales_acentos, config.dtype_policy)
+        print(f"\nTabla de empleados recibida en memoria desde el ETL de HC: {len(df_hc)} registros.\n")
+    indice_difuso = construir_indice_difuso(df_hc) if config.emparejamiento_difuso.get('HABILITADO') else None
+    return {
+        'df_hc': df_hc,
+        'indice_nombres': construir_indice_nombres(df_hc),
+        'indice_difuso': indice_difuso,
+        'bajas_emp_set': construir_set_bajas(df_hc),
+    }
+
+# --- Motor de correcciones manuales (reglas versionadas en 'reglas_correcciones.json') ---
+def cargar_reglas_correcciones(path_reglas: str):
+    """
+    Carga el archivo versionado de correcciones manuales (nombres, fechas y archivos excluidos).
+    Sin ruta (None) o si el archivo no existe o no se puede leer, retorna reglas vacías (no se aplica ninguna corrección).
+    """
+    reglas = {'version': None, 'nombres': {'subcadenas': {}, 'regex': []}, 'fechas': [], 'archivos_excluidos': []}
+    if path_reglas is None:
+        return reglas
+    if not os.path.exists(path_reglas):
+        print(f"ADVERTENCIA: No se encontró el archivo de correcciones '{path_reglas}'. No se aplicarán correcciones manuales.")
+        return reglas
+    try:
+        with open(path_reglas, 'r', encoding='utf-8') as f:
+            reglas.update(json.load(f))
+    except Exception as e:
+        print(f"ADVERTENCIA: No se pudo leer el archivo de correcciones '{path_reglas}'. Error: {e}")
+        return reglas
+    print(f"INFO: Reglas de correcciones (versión {reglas['version']}) cargadas desde '{path_reglas}'.")
+    return reglas
+
+def corregir_valores_texto(serie: pd.Series, subcadenas: dict, reglas_regex: list = None):
+    """
+    Corrige una columna de texto trabajando solo sobre sus valores únicos: primero los reemplazos literales de
+    'subcadenas' (también dentro de un valor más largo, como el 'str.replace' original) en una sola pasada con una
+    alternación de los textos escapados, y después todas las reglas regex [patron, reemplazo literal] en otra pasada
+    combinada. Los nulos se conservan y el dtype de la columna no cambia.
+    """
+    reglas_regex = reglas_regex or []
+    if not subcadenas and not reglas_regex:
+        return serie
+
+    unicos = pd.Series(serie.dropna().unique(), dtype=object)
+    corregidos = unicos.copy()
+
+    if subcadenas:
+        patron_literal = re.compile('|'.join(re.escape(texto) for texto in subcadenas))
+        corregidos = corregidos.map(lambda v: patron_literal.sub(lambda m: subcadenas[m.group(0)], v))
+
+    if reglas_regex:
+        patron_combinado = re.compile('|'.join(f'(?P<r{i}>{patron})' for i, (patron, _) in enumerate(reglas_regex)))
+        reemplazos = {f'r{i}': reemplazo for i, (_, reemplazo) in enumerate(reglas_regex)}
+        corregidos = corregidos.map(lambda v: patron_combinado.sub(lambda m: reemplazos[m.lastgroup], v))
+
+    cambia = (unicos != corregidos).to_numpy()
+    if not cambia.any():
+        return serie
+    return serie.replace(dict(zip(unicos[cambia], corregidos[cambia])))
+
+def corregir_fechas_constancias(df_constancias: pd.DataFrame, reglas_fechas: list):
+    """
+    Aplica las correcciones de fecha por archivo ('nombre_archivo' + 'fecha' original -> 'fecha_corregida')
+    con una sola búsqueda por clave sobre todo el DataFrame.
+    """
+    if not reglas_fechas or df_constancias.empty:
+        return df_constancias
+
+    df_reglas = pd.DataFrame(reglas_fechas).drop_duplicates(subset=['nombre_archivo', 'fecha'], keep='last')
+    fechas_corregidas = pd.Series(
+        df_reglas['fecha_corregida'].to_numpy(),
+        index=pd.MultiIndex.from_frame(df_reglas[['nombre_archivo', 'fecha']])
+    ).reindex(pd.MultiIndex.from_arrays([
+        df_constancias['nombre_archivo'].astype(object), df_constancias['fecha'].astype(object)
+    ]))
+
+    mask = fechas_corregidas.notna().to_numpy()
+    if mask.any():
+        df_constancias.loc[mask, 'fecha'] = fechas_corregidas.to_numpy()[mask]
+    return df_constancias
+
+def _texto_conservando_categoria(serie: pd.Series):
+    """Convierte una columna a texto ('string') salvo que ya sea categórica (política de dtypes), para no perder sus códigos."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie
+    return serie.astype('string')
+
+def procesar_y_mergear_constancias(datos_conjunto_excluidos: list, df_hc: pd.DataFrame, vocales_acentos_map: dict, dtype_policy: dict = None, reglas_correcciones: dict = None, indice_nombres: pd.DataFrame = None,
+                                   indice_difuso: dict = None, emparejamiento_difuso: dict = None):
     """
-    Convierte la lista de datos extraidos en un DataFrame, o limpia, aplica filtros y lo une con la tabla de empleados(HC) utilizando un doble merge para nombres 'invertidos'.
+    Convierte la lista de datos extraidos en un DataFrame, o limpia, aplica filtros y lo asocia con la tabla de empleados(HC) usando
+    el índice de nombres ('construir_indice_nombres'; se construye desde 'df_hc' si no se recibe). Las que no coinciden
+    se intentan con el emparejamiento aproximado según 'emparejamiento_difuso' (ver Config; deshabilitado si es None).
+    Las correcciones manuales (nombres, fechas y archivos excluidos) vienen de 'reglas_correcciones' (ver 'cargar_reglas_correcciones');
+    si no se reciben, se cargan del archivo versionado de 'Config.reglas_correcciones_path'.
     """
+    if reglas_correcciones is None:
+        reglas_correcciones = cargar_reglas_correcciones(Config().reglas_correcciones_path)
+
     if not datos_conjunto_excluidos:
         print("No hay datos de constancias para procesar.")
         return pd.DataFrame() # Retorna DataFrame vacio
@@ -760,23 +1064,8 @@ def procesar_y_mergear_constancias(datos_conjunto_excluidos: list, df_hc: pd.Dat
     df_constancias = df_filtrado
     recuento_filas_actuales = len(df_constancias)
 
-    # Nombres de archivo específicos excluidos
-    archivos_expecificos_a_excluir = [
-        'SAT 2024 MUÑOZ TEJERO ALEX ROMARIO.pdf',
-        'AVSEC 2025 BONILLA ESQUIVEL GERSON ALEXANDER.pdf',
-        'SAT 2024 BONILLA ESQUIVEL GERSON ALEXANDER.pdf',
-        'BITCORA 2025 OP B CASTILLO ORTEGA JOEL ALBERTO.PDF',
-        'RUIZ CARDONA MAYELA.pdf',
-        'NIÑO PLASCENCIA ALFREDO.pdf',
-        'CRUZ SANTIAGO SARA.pdf',
-        'OP 2024 PORTOS GAMEZ HECTOR ABRAHAM (1) (1).pdf',
-        'OP 2024 PORTOS GAMEZ HECTOR ABRAHAM (1).pdf',
-        'OP-0011-25.pdf',
-        'PRUDENCIO CAPACIDAD RTAR.pdf',
-        'TTT 2024 GUERRERO DE LA GARZA FRANCISCO.pdf',
-        'TTT 2024 GONZALEZ ESCALANTE EDUARDO SILVANO.pdf',
-        'AVSEC SALOMON CASTILLO ANA KAREN.pdf'
-    ]
+    # Nombres de archivo específicos excluidos (lista en el archivo de correcciones)
+    archivos_expecificos_a_excluir = set(reglas_correcciones['archivos_excluidos'])
     df_filtrado = df_constancias[~df_constancias['nombre_archivo'].isin(archivos_expecificos_a_excluir)]
     eliminados_por_nombres_especificos = recuento_filas_actuales - len(df_filtrado)
     if eliminados_por_nombres_especificos > 0:
@@ -819,126 +1108,98 @@ def procesar_y_mergear_constancias(datos_conjunto_excluidos: list, df_hc: pd.Dat
     df_constancias['grupo'] = df_constancias['grupo'].str.replace(" -25", "-25", regex=False).str.strip()
 
     # Modificacion de nombre manual por error en constancia.
-    df_constancias['nombre_completo'] = df_constancias['nombre_completo'].str.replace('RAUL LUNA UIZAR', 'RAUL LUNA HUIZAR', regex=False)
-    df_constancias['nombre_completo'] = df_constancias['nombre_completo'].str.replace('MENDOZA GAONA ROCIO YAMILETH', 'MENDOZA GAONA ROCIO YAMILET', regex=False)
-    df_constancias['nombre_completo'] = df_constancias['nombre_completo'].str.replace('DULCE MARTINEZ ORTIZ', 'DULCE AMADA MARTINEZ ORTIZ')
-    df_constancias['nombre_completo'] = df_constancias['nombre_completo'].str.replace('SOTO MORSLES JUANA MARIA', 'SOTO MORALES JUANA MARIA', regex=False)
-    df_constancias['nombre_completo'] = df_constancias['nombre_completo'].str.replace('OFELIA CLEMENTINA CORONADO CARRIZALEZ', 'OFELIA CLEMENTINA CORONADO CARRIZALES', regex=False)
-    df_constancias['nombre_completo'] = df_constancias['nombre_completo'].str.replace('SAGRARIO NUNEZ TOVAR', 'SAGRARIO NUÑEZ TOVAR', regex=False)
-    df_constancias['nombre_completo'] = df_constancias['nombre_completo'].str.replace('REYES O ALEJANDRO', 'REYES ALEJANDRO', regex=False)
-    df_constancias['nombre_completo'] = df_constancias['nombre_completo'].str.replace('MONTREAL SALAS HUGO HUMBERTO', 'MONRREAL SALAS HUGO HUMBERTO', regex=False)
-    df_constancias['nombre_completo'] = df_constancias['nombre_completo'].str.replace('ABELDAÑO LEAL REGINA SAORI', 'ALBELDAÑO LEAL REGINA SAORI', regex=False)
-    df_constancias['nombre_completo'] = df_constancias['nombre_completo'].str.replace('IBARRA TREVIÑO BRAYAN ARTURO', 'IBARRA TREVIO BRAYAN ARTURO', regex=False)
-    df_constancias['nombre_completo'] = df_constancias['nombre_completo'].str.replace('IBARRA TREVINO BRAYAN ARTURO', 'IBARRA TREVIO BRAYAN ARTURO', regex=False)
-    df_constancias['nombre_completo'] = df_constancias['nombre_completo'].str.replace('MICHELE ALFARO PALOMEQUE', 'MICHELLE ALFARO PALOMEQUE', regex=False)
-    df_constancias['nombre_completo'] = df_constancias['nombre_completo'].str.replace('KEVEIN ENRIQUE MAAS ANAYA', 'KEVIN ENRIQUE MAAS ANAYA', regex=False)
-    df_constancias['nombre_completo'] = df_constancias['nombre_completo'].str.replace('FLOR ALEXANDRA CRUZ PEREZ', 'FLOR ALEXSANDRA CRUZ PEREZ', regex=False)
-    df_constancias['nombre_completo'] = df_constancias['nombre_completo'].str.replace('JESUS YAIR ORTA SAUCEDA', 'JESUS YAHIR ORTA SAUCEDA', regex=False)
-    df_constancias['nombre_completo'] = df_constancias['nombre_completo'].str.replace('XIMENA MONSERRAT MORALES CONTRERAS', 'XIMENA MONSERRATH MORALES CONTRERAS', regex=False)
-    df_constancias['nombre_completo'] = df_constancias['nombre_completo'].str.replace(r'\bMORALES CONTRERAS XIMENA MONSERRAT\b', 'MORALES CONTRERAS XIMENA MONSERRATH', regex=True) # Coincidencia Exacta
-    df_constancias['nombre_completo'] = df_constancias['nombre_completo'].str.replace('JORGE ANGEL DAVID HERNADEZ AVILA', 'JORGE ANGEL DAVID HERNANDEZ AVILA', regex=False)
-    
+    df_constancias['nombre_completo'] = corregir_valores_texto(
+        df_constancias['nombre_completo'],
+        reglas_correcciones['nombres'].get('subcadenas', {}),
+        reglas_correcciones['nombres'].get('regex', [])
+    )
 
     # Modificacion de fecha manual por error en constancia.
-    df_constancias.loc[
-        (df_constancias['nombre_archivo'] == 'OP 2024 SERRATO VELAZQUEZ VANESSA ESMERALDA.pdf') & (df_constancias['fecha'] == '29 JUNIO-2029.'),
-        'fecha'
-        ] = '29 JUNIO-2024.'
-
-    df_constancias.loc[
-        (df_constancias['nombre_archivo'] == 'OP 2024 PORTOS GAMEZ HECTOR ABRAHAM.pdf') & (df_constancias['fecha'] == '26 JUNIO-2026.'),
-        'fecha'
-        ] = '26 JUNIO-2024.'
-
-    df_constancias.loc[
-        (df_constancias['nombre_archivo'] == 'OP 2024 AGUILAR CORONADO JOSE ANGEL DE JESUS.pdf') & (df_constancias['fecha'] == '27 JUNIO-2027.'),
-        'fecha'
-        ] = '27 JUNIO-2024.'
-
-    df_constancias.loc[
-        (df_constancias['nombre_archivo'] == 'OP 2025 MONTREAL SALAS HUGO HUMBERTO.pdf') & (df_constancias['fecha'] == 'MONTREAL SALAS Hugo Humberto Febrero-2025.'),
-        'fecha'
-        ] = '25 FEBRERO-2025.'
-    
-    # --- DOBLE MERGE PARA MEJORAR COINCIDENCIAS DE NOMBRES
-
-    # Primer merge con el formato "NOMBRE APELLIDO(P) APELLIDO(M)" en 'df_constancias' vs "NOMBRE APELLIDO(P) APELLIDO(M)" en 'df_hc'
-    print("\nRealizando primer merge (Constancias: Nombre Apellido(P) Apellido(M) contra HC: Nombre Apellido(P) Apellido(M))")
-
-    df_constancias_primer_merge = pd.merge(df_constancias,
-                                     df_hc[['nombre_completo_invertido', '#emp', 'estatus']],
-                                     left_on=['nombre_completo'], # Columna de constancias (Nombre Apellido),
-                                     right_on=['nombre_completo_invertido'], # Columna invertida de HC (Nombre Apellido)
-                                     how='left',
-                                     suffixes=('', '_hc_pass1')) # Sufijo para evitar colisiones si hubiera otras columnas '#emp'
-
-    # Renombrar '#emp_hc_pass1' a '#emp' para el primer pase y estatus
-    df_constancias_primer_merge = df_constancias_primer_merge.rename(columns={'#emp_hc_pass1': '#emp', 'estatus_hc_pass1': 'estatus'})
-    # Eliminar la columna de merge usada de df_hc
-    df_constancias_primer_merge = df_constancias_primer_merge.drop(columns=['nombre_completo_invertido'], errors='ignore')
-
-    # Identificar registros que no se encontraron en el primer merge (donde #emp es NaN)
-    registros_sin_coincidencia = df_constancias_primer_merge[df_constancias_primer_merge['#emp'].isnull()]
-    registros_coincidentes = df_constancias_primer_merge[df_constancias_primer_merge['#emp'].notnull()]
-
-    print(f"  - Registros encontrados en el primer merge: {len(registros_coincidentes)}")
-    print(f"  - Registros NO encontrados en el primer merge: {len(registros_sin_coincidencia)}")
-
-    # Paso 2: Segundo merge para los registros no encontrados en el primer pase
-    # Ahora intentamos con el formato "APELLIDOP APELLIDOM NOMBRE" (de df_constancias, si el nombre del PDF lo trae así)
-    # vs "APELLIDOP APELLIDOM NOMBRE" (df_hc['nombre_completo'])
-
-    if not registros_sin_coincidencia.empty:
-        print("\nRealizando segundo merge (Constancias: Apellido(P) Apellido(M) Nombre contra HC: Apellido(P) Apellido(M) Nombre)")
-        # Trabajar con una copia para evitar SettingWithCopyWarning
-        df_para_segundo_merge = registros_sin_coincidencia.copy()
-
-        df_constancias_segundo_merge = pd.merge(df_para_segundo_merge,
-                                                df_hc[['nombre_completo', '#emp', 'estatus']], # Usar la columna original 'nombre_completo' de 'df_hc'
-                                                left_on=['nombre_completo'], # Columna de Constancias (Apellidos-Nombre)
-                                                right_on=['nombre_completo'], # Columna original de 'df_hc'
-                                                how='left',
-                                                suffixes=('_pass1', '_pass2'))
-
-        # Ahora necesitamos consolidar los '#emp'
-        # Donde '#emp_pass1' es nulo (es decir, no se encontró en el primer merge), usamos '#emp_pass2'
-        df_constancias_segundo_merge['#emp'] = df_constancias_segundo_merge['#emp_pass1'].fillna(df_constancias_segundo_merge['#emp_pass2'])
-        df_constancias_segundo_merge['estatus'] = df_constancias_segundo_merge['estatus_pass1'].fillna(df_constancias_segundo_merge['estatus_pass2'])
-
-        # Eliminar las columnas temporales de los pases
-        df_constancias_segundo_merge = df_constancias_segundo_merge.drop(columns=['#emp_pass1', '#emp_pass2', 'estatus_pass1', 'estatus_pass2'])
-
-        registros_coincidentes_2 = df_constancias_segundo_merge[df_constancias_segundo_merge['#emp'].notnull()]
-        registros_sin_coincidencia_final = df_constancias_segundo_merge[df_constancias_segundo_merge['#emp'].isnull()]
-
-        print(f"\n  - Registros encontrados en el segundo merge: {len(registros_coincidentes_2)}")
-        print(f"\n  - Registros no encontrados despues del segundo merge: {len(registros_sin_coincidencia_final)}")
-
-        # Combinar todos los resultados
-        df_constancias_merged = pd.concat([registros_coincidentes, registros_coincidentes_2, registros_sin_coincidencia_final], ignore_index=True)
-    else:
-        df_constancias_merged = registros_coincidentes # Si no hubo nada sin coincidencia en el primer pase, este es el resultado final
+    df_constancias = corregir_fechas_constancias(df_constancias, reglas_correcciones['fechas'])
+
+    # Política de dtypes una vez terminada la limpieza de texto (los '.str' de arriba devolverían texto en lugar de categorías)
+    df_constancias = aplicar_politica_dtypes(df_constancias, dtype_policy)
+
+    # --- ASOCIACIÓN CON HC MEDIANTE EL ÍNDICE DE NOMBRES
+    # Una sola búsqueda por el nombre tal cual (Nombre Apellidos / Apellidos Nombre) y, si no existe, por su clave canónica.
+    print("\nAsociando constancias con HC (índice de nombres: Nombre Apellido(P) Apellido(M) / Apellido(P) Apellido(M) Nombre / clave canónica)")
+    if indice_nombres is None:
+        indice_nombres = construir_indice_nombres(df_hc)
+
+    nombres = df_constancias['nombre_completo'].astype(object)
+    claves = nombres.where(nombres.isin(indice_nombres.index), clave_canonica_nombre(nombres))
+    coincidencias = indice_nombres.reindex(claves.to_numpy())
+
+    df_constancias['#emp'] = coincidencias['#emp'].to_numpy()
+    df_constancias['estatus'] = coincidencias['estatus'].to_numpy()
+    es_ambigua = coincidencias['ambigua'].eq(True).to_numpy()
+    pase = coincidencias['prioridad'].where(df_constancias['#emp'].notna().to_numpy(), 5).to_numpy()
+
+    # Emparejamiento aproximado (bloqueado por trigramas): una sola búsqueda por nombre único no encontrado. Se acepta
+    # el mejor candidato de las no ambiguas; las que siguen sin '#emp' conservan sus candidatos en 'candidatos_emp'
+    # para el reporte de no coincidencias (ver 'identificar_y_reportar_constancias_sin_coincidencia').
+    emparejamiento_difuso = emparejamiento_difuso or {}
+    no_encontrada = pase == 5
+    if emparejamiento_difuso.get('HABILITADO') and no_encontrada.any():
+        if indice_difuso is None:
+            indice_difuso = construir_indice_difuso(df_hc)
+        candidatos = buscar_candidatos_nombre(
+            nombres[no_encontrada], indice_difuso,
+            emparejamiento_difuso.get('MAX_CANDIDATOS', 3), emparejamiento_difuso.get('TAMANO_BLOQUE', 25)
+        )
+        nombres_ambiguos = set(nombres[es_ambigua])
+        aceptados = {}
+        for nombre, candidatos_nombre in candidatos.items():
+            if nombre in nombres_ambiguos:
+                continue
+            mejor = aceptar_candidato_difuso(candidatos_nombre, emparejamiento_difuso.get('UMBRAL_AUTOACEPTAR', 0.92), emparejamiento_difuso.get('MARGEN_MINIMO', 0.03))
+            if mejor is not None:
+                aceptados[nombre] = mejor
+                print(f"  - Coincidencia aproximada aceptada: '{nombre}' -> #emp {mejor[0]} (score {mejor[2]:.2f})")
+
+        es_aceptado = no_encontrada & ~es_ambigua & nombres.isin(aceptados.keys()).to_numpy()
+        if es_aceptado.any():
+            df_constancias.loc[es_aceptado, '#emp'] = nombres[es_aceptado].map(lambda n: aceptados[n][0]).to_numpy()
+            df_constancias.loc[es_aceptado, 'estatus'] = nombres[es_aceptado].map(lambda n: aceptados[n][1]).to_numpy()
+            pase = np.where(es_aceptado, 4, pase)
+
+        candidatos_formateados = {nombre: formatear_candidatos(candidatos_nombre) for nombre, candidatos_nombre in candidatos.items()}
+        df_constancias['candidatos_emp'] = nombres.map(candidatos_formateados).where(pase == 5).astype('string')
+
+    print(f"  - Registros encontrados por 'Nombre Apellido(P) Apellido(M)': {(pase == 1).sum()}")
+    print(f"  - Registros encontrados por 'Apellido(P) Apellido(M) Nombre': {(pase == 2).sum()}")
+    print(f"  - Registros encontrados por clave canónica (palabras ordenadas): {(pase == 3).sum()}")
+    print(f"  - Registros encontrados por coincidencia aproximada: {(pase == 4).sum()}")
+    print(f"  - Registros no encontrados: {(pase == 5).sum()}")
+    if es_ambigua.any():
+        print(f"  - De ellos, {es_ambigua.sum()} con nombre ambiguo en HC (homónimos):")
+        ambiguos = pd.DataFrame({'nombre': nombres[es_ambigua].to_numpy(), 'candidatos': coincidencias['candidatos'][es_ambigua].to_numpy()})
+        for nombre, emps in ambiguos.drop_duplicates().itertuples(index=False):
+            print(f"      '{nombre}' -> #emp posibles: {emps}")
+
+    # Orden: coincidencias por prioridad de clave y al final las no encontradas
+    df_constancias_merged = df_constancias.iloc[np.argsort(pase, kind='stable')].reset_index(drop=True)
 
     df_constancias_merged['#emp'] = df_constancias_merged['#emp'].fillna(0).astype(int)
-    df_constancias_merged['estatus'] = df_constancias_merged['estatus'].fillna('DESCONOCIDO').astype('string')
+    df_constancias_merged['estatus'] = rellenar_nulos(df_constancias_merged['estatus'], 'DESCONOCIDO')
     column_emp = df_constancias_merged.pop('#emp')
     df_constancias_merged.insert(2, '#emp', column_emp)
     df_constancias_merged = df_constancias_merged.sort_values(['#emp', 'nombre_completo'])
 
     for c in columns_text: # Utiliza las columnas de texto definidas previamente
         if c in df_constancias_merged.columns: # Asegurarse de que la columna existe
-            df_constancias_merged[c] = df_constancias_merged[c].astype('string')
+            df_constancias_merged[c] = _texto_conservando_categoria(df_constancias_merged[c])
 
-    print("\nDataFrame de constancias después del doble merge con HC:\n")
+    print("\nDataFrame de constancias después de la asociación con HC:\n")
     df_constancias_merged.info()
-    print(f"Total de filas en df_constancias_merged después de doble merge: {len(df_constancias_merged)}")
-    print("\nConteo de empleados después del doble merge (0 = sin coincidencia):\n")
+    print(f"Total de filas en df_constancias_merged después de la asociación con HC: {len(df_constancias_merged)}")
+    print("\nConteo de empleados después de la asociación con HC (0 = sin coincidencia):\n")
     print(df_constancias_merged['#emp'].value_counts(dropna=False))
 
     final_text_columns = ['nombre_archivo', 'ruta_original', 'nombre_completo', 'curso', 'fecha', 'instructor', 'grupo']
     for c in final_text_columns:
         if c in df_constancias_merged.columns:
-            df_constancias_merged[c] = df_constancias_merged[c].astype('string')
+            df_constancias_merged[c] = _texto_conservando_categoria(df_constancias_merged[c])
 
     if 'ruta_original' in df_constancias_merged.columns:
         df_constancias_merged['ruta_original'] = df_constancias_merged['ruta_original'].astype('string').fillna('')
@@ -946,18 +1207,23 @@ def procesar_y_mergear_constancias(datos_conjunto_excluidos: list, df_hc: pd.Dat
         df_constancias_merged['ruta_original'] = pd.Series([''] * len(df_constancias_merged), dtype='string')
 
     df_constancias_merged = df_constancias_merged.sort_values(by=['fecha', 'nombre_completo']).reset_index(drop=True)
+    df_constancias_merged = aplicar_politica_dtypes(df_constancias_merged, dtype_policy)
 
     return df_constancias_merged
 
 def identificar_y_reportar_constancias_sin_coincidencia(df_constancias_merged: pd.DataFrame, config: Config):
     """
     Identifica constancias sin numero de empleado(#emp) asociado y las exporta a archivos.
+    Si el emparejamiento aproximado está habilitado, incluye la columna 'candidatos_emp' (empleados más parecidos y su
+    score) que 'procesar_y_mergear_constancias' calculó durante la asociación con HC.
     """
     constancias_sin_emp = df_constancias_merged[df_constancias_merged['#emp'] == 0]
     if not constancias_sin_emp.empty:
         print(f"\nAdvertencia: {len(constancias_sin_emp)} constancia(s) no pudieron ser asociadas a un numero de empleado '#emp'\n")
         for index, row in constancias_sin_emp.iterrows():
             print(f"Archivo: {row['nombre_archivo']} \nNombre empleado: {row['nombre_completo']}\n")
+            if pd.notna(row.get('candidatos_emp')) and row.get('candidatos_emp'):
+                print(f"Candidatos (#emp (score)): {row['candidatos_emp']}\n")
 
         # Outputs sin "#emp" - Usando rutas de config
         output_excel_path = config.outpath_xlsx_constancias_sin_emp
@@ -975,12 +1241,365 @@ def identificar_y_reportar_constancias_sin_coincidencia(df_constancias_merged: p
     else:
         print(f"\nTodas las constancias se asociaron correctamente\n")
 
-def organizar_archivos_pdf(df_constancias_merged: pd.DataFrame, config: Config): # Solo recibe config
+# --- Cola persistente de constancias pendientes (sin '#emp') ---
+# Campos con los mismos nombres que produce 'extraer_datos_constancia', para reingresarlas al flujo sin leer el PDF.
+_CAMPOS_PENDIENTES = {
+    'nombre_archivo': 'nombre_archivo', 'ruta_original': 'ruta_original', 'original_source_path': 'original_source_path',
+    'nombre_completo': 'Nombre', 'curso': 'Curso', 'fecha': 'Fecha', 'instructor': 'Instructor', 'grupo': 'Grupo',
+}
+
+def cargar_constancias_pendientes(path_pendientes: str):
+    """
+    Carga la cola de constancias que quedaron sin '#emp' en ejecuciones anteriores, como registros con los mismos
+    campos que 'extraer_datos_constancia' ('ruta_original' apunta a la copia del PDF en 'pending_pdfs_folder').
+    """
+    if not os.path.exists(path_pendientes):
+        return []
+    try:
+        df_pendientes = pd.read_csv(path_pendientes, dtype='string', encoding='utf-8').fillna('')
+    except Exception as e:
+        print(f"ADVERTENCIA: No se pudo leer la cola de constancias pendientes '{path_pendientes}'. Error: {e}")
+        return []
+    print(f"INFO: {len(df_pendientes)} constancias pendientes de '#emp' se volverán a asociar contra HC.")
+    return df_pendientes.reindex(columns=list(_CAMPOS_PENDIENTES.values()), fill_value='').to_dict('records')
+
+def guardar_constancias_pendientes(df_constancias_merged: pd.DataFrame, rutas_pendientes: set, config: Config, cola_reintentos: list = None):
+    """
+    Reescribe la cola con las constancias que siguen sin '#emp' (pendientes anteriores no resueltas y nuevas).
+    Los PDFs de las nuevas se copian a 'pending_pdfs_folder' (las páginas de agrupados viven en la carpeta temporal) y su
+    archivo fuente se registra como procesado: a partir de aquí la constancia vive en la cola y no se vuelve a extraer.
+    Se eliminan de la carpeta los PDFs que ya no están en la cola ni se van a organizar en esta ejecución.
+    """
+    es_sin_emp = (df_constancias_merged['#emp'] == 0).to_numpy()
+    df_pendientes = df_constancias_merged.loc[es_sin_emp, list(_CAMPOS_PENDIENTES)].astype(object)
+
+    rutas_cola = []
+    for ruta, fuente in zip(df_pendientes['ruta_original'], df_pendientes['original_source_path']):
+        if ruta in rutas_pendientes or not os.path.exists(ruta):
+            rutas_cola.append(ruta)
+            continue
+        ruta_copia = os.path.join(config.pending_pdfs_folder, os.path.basename(ruta))
+        base_copia, ext_copia = os.path.splitext(ruta_copia)
+        contador = 1
+        while os.path.exists(ruta_copia):
+            ruta_copia = f"{base_copia}_{contador}{ext_copia}"
+            contador += 1
+        try:
+            shutil.copy2(ruta, ruta_copia)
+            rutas_cola.append(ruta_copia)
+            _añadir_set_procesado_en_memoria(fuente, config)
+        except Exception as e:
+            print(f"ADVERTENCIA: No se pudo conservar el PDF pendiente '{ruta}': {e}")
+            rutas_cola.append(ruta)
+    df_pendientes['ruta_original'] = rutas_cola
+
+    try:
+        df_pendientes.rename(columns=_CAMPOS_PENDIENTES).to_csv(config.outpath_csv_constancias_pendientes, index=False, encoding='utf-8')
+        print(f"Cola de constancias pendientes de '#emp' actualizada ({len(df_pendientes)} registros): {config.outpath_csv_constancias_pendientes}")
+    except Exception as e:
+        print(f"Error al guardar la cola de constancias pendientes: {e}")
+        return
+
+    # PDFs que salieron de la cola sin asociarse (ej. por un filtro de negocio); las asociadas se mueven al organizar
+    rutas_en_uso = set(rutas_cola) | set(df_constancias_merged.loc[~es_sin_emp, 'ruta_original'].astype(object))
+    for nombre_archivo in os.listdir(config.pending_pdfs_folder):
+        ruta = os.path.join(config.pending_pdfs_folder, nombre_archivo)
+        if ruta not in rutas_en_uso and os.path.isfile(ruta):
+            try:
+                os.remove(ruta)
+            except PermissionError as e:
+                if cola_reintentos is not None:
+                    encolar_reintento(cola_reintentos, 'eliminar', ruta, error=e)
+                else:
+                    print(f"ADVERTENCIA: No se pudo eliminar el PDF pendiente '{ruta}': {e}")
+            except OSError as e:
+                print(f"ADVERTENCIA: No se pudo eliminar el PDF pendiente '{ruta}': {e}")
+
+# --- Manifiesto de publicación: PDFs ya copiados a la carpeta sincronizada ---
+_COLUMNAS_MANIFIESTO = ['destino', 'hash_origen', 'tamano', 'mtime_ns']
+
+def cargar_manifiesto_publicacion(path_manifiesto: str) -> dict:
+    """Carga el manifiesto como {destino: (hash_origen, tamano, mtime_ns)}; vacío si no existe o no se puede leer."""
+    if not os.path.exists(path_manifiesto):
+        return {}
+    try:
+        df_manifiesto = pd.read_csv(path_manifiesto, dtype={'destino': str, 'hash_origen': str, 'tamano': 'int64', 'mtime_ns': 'int64'}, encoding='utf-8')
+    except Exception as e:
+        print(f"ADVERTENCIA: No se pudo leer el manifiesto de publicación '{path_manifiesto}'; se copiarán todos los PDFs. Error: {e}")
+        return {}
+    return {destino: (hash_origen, tamano, mtime_ns) for destino, hash_origen, tamano, mtime_ns in df_manifiesto[_COLUMNAS_MANIFIESTO].itertuples(index=False)}
+
+def guardar_manifiesto_publicacion(manifiesto: dict, path_manifiesto: str):
+    """Escribe el manifiesto completo (archivo temporal + reemplazo atómico)."""
+    df_manifiesto = pd.DataFrame([(destino, *entrada) for destino, entrada in manifiesto.items()], columns=_COLUMNAS_MANIFIESTO)
+    ruta_tmp = path_manifiesto + '.tmp'
+    try:
+        df_manifiesto.to_csv(ruta_tmp, index=False, encoding='utf-8')
+        os.replace(ruta_tmp, path_manifiesto)
+    except Exception as e:
+        print(f"ADVERTENCIA: No se pudo guardar el manifiesto de publicación '{path_manifiesto}': {e}")
+
+def _hash_archivo(ruta: str) -> str:
+    """SHA-256 del contenido de un archivo."""
+    with open(ruta, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+def _reflink_archivo(origen: str, destino: str):
+    """Clon copy-on-write (ioctl FICLONE de Linux: Btrfs, XFS, ...); los bloques se comparten hasta que alguno cambie."""
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "Reflink no disponible en esta plataforma")
+    with open(origen, 'rb') as f_origen, open(destino, 'wb') as f_destino:
+        fcntl.ioctl(f_destino.fileno(), _FICLONE, f_origen.fileno())
+    shutil.copystat(origen, destino) # Igual que copy2: conserva fecha de modificación
+
+# Modos de publicación disponibles, en el orden en que se configuran en 'publicacion_pdfs["MODOS"]'
+_MODOS_PUBLICACION = {
+    'reflink': _reflink_archivo,
+    'hardlink': os.link,
+    'copia': shutil.copy2,
+}
+
+def _publicar_archivo(origen: str, destino: str, modos: list) -> str:
+    """
+    Publica 'origen' en 'destino' con el primer modo de 'modos' que funcione (ej. reflink -> hardlink -> copia) y
+    regresa el modo usado. Siempre se escribe un temporal junto al destino y se reemplaza con 'os.replace': sobrescribir
+    nunca escribe dentro del archivo existente, así que un destino que era hardlink de otro origen no lo modifica.
+    Si ningún modo funciona se propaga el error del último.
+    """
+    ruta_tmp = destino + '.tmp'
+    ultimo_error = None
+    for modo in modos:
+        try:
+            _MODOS_PUBLICACION[modo](origen, ruta_tmp)
+            os.replace(ruta_tmp, destino)
+            return modo
+        except OSError as e: # Ej. volumen distinto (hardlink), sistema de archivos sin reflink
+            ultimo_error = e
+            try:
+                os.remove(ruta_tmp)
+            except OSError:
+                pass
+    raise ultimo_error
+
+def _copiar_constancias_mismo_destino(tareas: list, manifiesto: dict, modos: list) -> list:
+    """
+    Publica las constancias que comparten destino con el mismo resultado que copiarlas en serie (la última sobrescribe):
+    se copia (o mueve, si es una constancia pendiente ya asociada a '#emp') la última y, solo si falla, la anterior. Las demás quedan
+    reemplazadas sin escribirse.
+    La copia se omite si el manifiesto registra el mismo hash de origen para ese destino y el archivo destino no ha
+    cambiado desde entonces (mismo tamaño y mtime): sobrescribirlo solo provocaría que OneDrive lo vuelva a subir.
+    Regresa (posicion, error o None, entrada nueva del manifiesto o None si no se escribió, modo usado) por constancia; si no
+    se escribió, el modo es 'sin_cambios' (omitida según el manifiesto) o 'reemplazada' (por otra con el mismo destino).
+    """
+    resultados = []
+    publicada = False
+    for posicion, origen, destino, mover in reversed(tareas):
+        try:
+            if publicada: # Reemplazada en esta ejecución por una constancia posterior con el mismo destino
+                if mover:
+                    os.remove(origen)
+                resultados.append((posicion, None, None, 'reemplazada'))
+                continue
+            hash_origen = _hash_archivo(origen)
+            entrada = manifiesto.get(destino)
+            if entrada is not None and entrada[0] == hash_origen:
+                try:
+                    estado_destino = os.stat(destino)
+                except FileNotFoundError:
+                    estado_destino = None
+                if estado_destino is not None and (estado_destino.st_size, estado_destino.st_mtime_ns) == tuple(entrada[1:]):
+                    if mover:
+                        os.remove(origen) # La constancia pendiente ya está publicada: solo sale de la cola
+                    resultados.append((posicion, None, None, 'sin_cambios'))
+                    publicada = True
+                    continue
+            if mover:
+                # Constancia pendiente ya asociada: sale de la cola moviéndose a la carpeta del empleado
+                shutil.move(origen, destino)
+                modo = 'movido'
+            else:
+                # Publicar el archivo (reflink, hardlink o copia con metadatos, según 'modos')
+                modo = _publicar_archivo(origen, destino, modos)
+            estado_destino = os.stat(destino)
+            resultados.append((posicion, None, (hash_origen, estado_destino.st_size, estado_destino.st_mtime_ns), modo))
+            publicada = True
+        except Exception as e:
+            resultados.append((posicion, e, None, None))
+    return resultados
+
+# --- Cola de reintentos de operaciones de archivos (archivos bloqueados por OneDrive) ---
+# Cada entrada es un dict serializable: operacion ('copiar', 'mover' o 'eliminar'), origen, destino, ruta_fuente
+# (archivo fuente a registrar como procesado cuando la copia se completa), intentos y ultimo_error.
+
+def cargar_cola_reintentos(path_cola: str) -> list:
+    """Carga las operaciones que quedaron pendientes en ejecuciones anteriores (lista vacía si no hay)."""
+    if not os.path.exists(path_cola):
+        return []
+    try:
+        with open(path_cola, 'r', encoding='utf-8') as f:
+            cola = json.load(f)
+    except Exception as e:
+        print(f"ADVERTENCIA: No se pudo leer la cola de reintentos '{path_cola}': {e}")
+        return []
+    if cola:
+        print(f"INFO: {len(cola)} operaciones de archivos pendientes de ejecuciones anteriores se reintentarán al final.")
+    return cola
+
+def encolar_reintento(cola_reintentos: list, operacion: str, origen: str, destino: str = None, error: Exception = None, ruta_fuente: str = None):
+    """Difiere una operación de archivo que falló por bloqueo; se reintenta al final de la ejecución ('procesar_cola_reintentos')."""
+    cola_reintentos.append({
+        'operacion': operacion, 'origen': origen, 'destino': destino, 'ruta_fuente': ruta_fuente,
+        'intentos': 1, 'ultimo_error': str(error) if error is not None else '',
+    })
+
+def _modos_publicacion(config: Config) -> list:
+    """Modos de publicación válidos de 'publicacion_pdfs["MODOS"]' (por defecto 'copia')."""
+    modos_configurados = config.publicacion_pdfs.get('MODOS', ['copia'])
+    modos_invalidos = set(modos_configurados) - set(_MODOS_PUBLICACION)
+    if modos_invalidos:
+        print(f"ADVERTENCIA: Modos de publicación desconocidos ignorados: {sorted(modos_invalidos)}. Válidos: {list(_MODOS_PUBLICACION)}")
+    return [modo for modo in modos_configurados if modo in _MODOS_PUBLICACION] or ['copia']
+
+def _ejecutar_operacion_archivo(entrada: dict, modos: list):
+    """Ejecuta una operación de la cola; regresa la entrada del manifiesto si fue una copia publicada."""
+    operacion, origen, destino = entrada['operacion'], entrada['origen'], entrada['destino']
+    if operacion == 'copiar':
+        _publicar_archivo(origen, destino, modos)
+        estado_destino = os.stat(destino)
+        return (_hash_archivo(destino), estado_destino.st_size, estado_destino.st_mtime_ns)
+    if operacion == 'mover':
+        if os.path.isdir(origen):
+            _reubicar_carpeta(origen, destino)
+        else:
+            _renombrar_entrada(origen, destino)
+    elif operacion == 'eliminar':
+        if os.path.isdir(origen):
+            shutil.rmtree(origen)
+        else:
+            os.remove(origen)
+    else:
+        raise ValueError(f"Operación desconocida en la cola de reintentos: '{operacion}'")
+    return None
+
+def procesar_cola_reintentos(cola_reintentos: list, config: Config) -> list:
+    """
+    Reintenta las operaciones diferidas en rondas con espera exponencial entre rondas ('reintentos_archivos'): solo se
+    espera si quedaron operaciones bloqueadas, y cada ronda reintenta únicamente esas. Las que fallan por otra causa, o
+    superan 'MAX_INTENTOS_TOTALES' entre ejecuciones, se descartan con un error. Regresa las que siguen bloqueadas.
+    """
+    if not cola_reintentos:
+        return []
+    opciones = config.reintentos_archivos
+    modos = _modos_publicacion(config)
+    espera = opciones.get('ESPERA_INICIAL', 0.5)
+    max_rondas = opciones.get('MAX_RONDAS_POR_EJECUCION', 4)
+    max_intentos_totales = opciones.get('MAX_INTENTOS_TOTALES', 50)
+    manifiesto_actualizado = {}
+    carpetas_bajas_movidas = []
+    completadas = 0
+
+    pendientes = list(cola_reintentos)
+    print(f"\nReintentando {len(pendientes)} operaciones de archivos diferidas...")
+    for ronda in range(1, max_rondas + 1):
+        if ronda > 1:
+            print(f"  - {len(pendientes)} operaciones siguen bloqueadas (ronda {ronda - 1}/{max_rondas}). Reintentando en {espera} segundos...")
+            time.sleep(espera)
+            espera = min(espera * opciones.get('FACTOR_ESPERA', 2), opciones.get('ESPERA_MAXIMA', 8))
+        bloqueadas = []
+        for entrada in pendientes:
+            try:
+                entrada_manifiesto = _ejecutar_operacion_archivo(entrada, modos)
+            except PermissionError as e:
+                entrada['intentos'] += 1
+                entrada['ultimo_error'] = str(e)
+                bloqueadas.append(entrada)
+                continue
+            except Exception as e:
+                print(f"  - ERROR: Se descarta la operación '{entrada['operacion']}' de '{entrada['origen']}': {e}")
+                continue
+            completadas += 1
+            if entrada_manifiesto is not None:
+                manifiesto_actualizado[entrada['destino']] = entrada_manifiesto
+            if entrada['operacion'] == 'mover' and os.path.dirname(entrada['destino']) == config.sharepoint_certs_bajas:
+                carpetas_bajas_movidas.append(os.path.basename(entrada['destino']))
+            if entrada.get('ruta_fuente'):
+                _añadir_set_procesado_en_memoria(entrada['ruta_fuente'], config)
+        pendientes = bloqueadas
+        if not pendientes:
+            break
+
+    if manifiesto_actualizado:
+        manifiesto = cargar_manifiesto_publicacion(config.outpath_csv_manifiesto_publicacion)
+        manifiesto.update(manifiesto_actualizado)
+        guardar_manifiesto_publicacion(manifiesto, config.outpath_csv_manifiesto_publicacion)
+    _reubicar_manifiesto(config, carpetas_bajas_movidas)
+
+    agotadas = [entrada for entrada in pendientes if entrada['intentos'] >= max_intentos_totales]
+    for entrada in agotadas:
+        print(f"  - ERROR: Se descarta la operación '{entrada['operacion']}' de '{entrada['origen']}' tras {entrada['intentos']} intentos: {entrada['ultimo_error']}")
+    pendientes = [entrada for entrada in pendientes if entrada['intentos'] < max_intentos_totales]
+    print(f"Operaciones diferidas completadas: {completadas}. Siguen bloqueadas (se reintentarán en la próxima ejecución): {len(pendientes)}.")
+    return pendientes
+
+def guardar_cola_reintentos(cola_reintentos: list, config: Config):
+    """
+    Persiste las operaciones aún bloqueadas para la próxima ejecución. Las copias cuyo origen es una página temporal
+    (se elimina al terminar) se conservan antes en 'retry_pdfs_folder'; los archivos de esa carpeta que ya no están en
+    la cola se eliminan. Debe llamarse antes de guardar el registro de archivos procesados y de limpiar la carpeta temporal.
+    """
+    for entrada in cola_reintentos:
+        origen = entrada['origen']
+        if entrada['operacion'] == 'copiar' and os.path.dirname(origen) == config.temp_split_pdfs_folder:
+            ruta_conservada = os.path.join(config.retry_pdfs_folder, os.path.basename(origen))
+            base_conservada, ext_conservada = os.path.splitext(ruta_conservada)
+            contador = 1
+            while os.path.exists(ruta_conservada): # Las páginas temporales repiten nombre entre ejecuciones
+                ruta_conservada = f"{base_conservada}_{contador}{ext_conservada}"
+                contador += 1
+            try:
+                shutil.copy2(origen, ruta_conservada)
+                entrada['origen'] = ruta_conservada
+            except OSError as e:
+                print(f"ADVERTENCIA: No se pudo conservar la página temporal '{origen}' para reintentar su copia: {e}")
+        # La constancia queda a cargo de la cola: su archivo fuente no se vuelve a extraer
+        if entrada.get('ruta_fuente') and os.path.dirname(entrada['origen']) != config.temp_split_pdfs_folder:
+            _añadir_set_procesado_en_memoria(entrada['ruta_fuente'], config)
+
+    rutas_en_cola = {entrada['origen'] for entrada in cola_reintentos}
+    for nombre_archivo in os.listdir(config.retry_pdfs_folder):
+        ruta = os.path.join(config.retry_pdfs_folder, nombre_archivo)
+        if ruta not in rutas_en_cola and os.path.isfile(ruta):
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass # Se intentará de nuevo en la próxima ejecución
+
+    try:
+        with open(config.outpath_json_cola_reintentos, 'w', encoding='utf-8') as f:
+            json.dump(cola_reintentos, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        print(f"ERROR: No se pudo guardar la cola de reintentos '{config.outpath_json_cola_reintentos}': {e}")
+
+def finalizar_cola_reintentos(cola_reintentos: list, config: Config):
+    """Reintenta las operaciones diferidas y persiste las que siguen bloqueadas (ver 'procesar_cola_reintentos')."""
+    guardar_cola_reintentos(procesar_cola_reintentos(cola_reintentos, config), config)
+
+def organizar_archivos_pdf(df_constancias_merged: pd.DataFrame, config: Config, rutas_pendientes: set = None, cola_reintentos: list = None): # Solo recibe config
     """
     Organiza los archivos PDF copiándolos a carpetas individuales por número de empleado(#emp).
     Los empleados 'BAJA' van a una subcarpeta 'BAJAS'.
     Sobrescribe archivos existentes (no crea duplicados con sufijos).
+    Las constancias de la cola de pendientes ('rutas_pendientes') que ya tienen '#emp' se mueven desde 'pending_pdfs_folder';
+    las que siguen sin '#emp' solo se copian a la carpeta '0', para que el archivo de la cola siga disponible.
+    El plan de destinos se resuelve por columnas, cada carpeta se crea una sola vez y las copias corren en un pool de
+    hilos acotado ('publicacion_pdfs["MAX_WORKERS"]'); solo las copias exitosas se registran como procesadas.
+    Las copias que fallan por bloqueo (PermissionError) se difieren a 'cola_reintentos'; si no se recibe cola, se usa
+    la persistida y se procesa al terminar esta función.
     """
+    rutas_pendientes = rutas_pendientes or set()
+    cola_propia = cola_reintentos is None
+    if cola_propia:
+        cola_reintentos = cargar_cola_reintentos(config.outpath_json_cola_reintentos)
     outpath_base_activos = config.sharepoint_certs_active # Obtiene de config
     outpath_base_bajas = config.sharepoint_certs_bajas # Obtiene de config
 
@@ -988,10 +1607,10 @@ def organizar_archivos_pdf(df_constancias_merged: pd.DataFrame, config: Config):
     print(f"Destino para BAJAS: {outpath_base_bajas}")
 
     pdfs_organizados = 0
+    pdfs_copias_omitidas = 0 # Sin cambios según el manifiesto de publicación
+    pdfs_copias_reemplazadas = 0 # Reemplazadas en esta ejecución por otra constancia con el mismo destino
+    pdfs_copias_diferidas = 0
     pdfs_no_organizados_error_copia = 0
-    pdfs_sin_num_emp_count = 0
-    pdfs_bajas_organizados = 0
-    pdfs_activos_organizados = 0
 
     if df_constancias_merged.empty:
         print("No hay constancias para organizar (DataFrame vacío).")
@@ -1000,73 +1619,103 @@ def organizar_archivos_pdf(df_constancias_merged: pd.DataFrame, config: Config):
         print("Total de archivos que fallaron al copiar: 0\n")
         return
 
-    # Contar los PDFs que no tienen un número de empleado asignado (== 0)
-    # y que no tienen estatus 'BAJA' para el reporte de carpeta '0'
-    pdfs_sin_num_emp_count = len(df_constancias_merged[(df_constancias_merged['#emp'] == 0) & (df_constancias_merged['estatus'].str.upper() != 'BAJA')])
-
-    for index, row in df_constancias_merged.iterrows():
-        num_emp = str(row['#emp']) # Sera '0' si no hay coincidencia de '#emp'
-        original_pdf_to_copy_path = row['ruta_original'] # Esta es la ruta del archivo a COPIAR (temporal o standalone)
-        base_new_file_name_with_ext = row['nombre_archivo_nuevo'] # Este es el nombre base, sin sufijo aún
-        estatus_empleado = row['estatus'].upper()
-
-        # --- Ruta para el registro de archivos procesados (siempre el archivo fuente original) ---
-        original_source_file_for_log = row['original_source_path']
-
-        # Determinar la carpeta de destino basada en el estatus
-        if estatus_empleado == 'BAJA':
-            target_base_folder = outpath_base_bajas
-            # Si es BAJA, incrementa este contador, independientemente de si tiene #emp=0
-            pdfs_bajas_organizados += 1
-        else: # Incluye 'ALTA' y 'DESCONOCIDO'. Los '#emp == 0' también caen aquí, a menos que sean 'BAJA'.
-            target_base_folder = outpath_base_activos
-            if num_emp != '0': # Solo contar activos si tienen un #emp válido
-                pdfs_activos_organizados += 1
-            # else: pdfs_sin_num_emp_count ya se cuenta arriba de forma más precisa.
-
+    # --- Plan de destinos (por columnas) ---
+    num_emp = df_constancias_merged['#emp'].astype(str).reset_index(drop=True) # Sera '0' si no hay coincidencia de '#emp'
+    es_baja = df_constancias_merged['estatus'].astype('string').str.upper().eq('BAJA').fillna(False).to_numpy()
+    rutas_origen = df_constancias_merged['ruta_original'].astype(object).tolist() # Archivo a COPIAR (temporal, standalone o pendiente)
+    # Ruta para el registro de archivos procesados (siempre el archivo fuente original, agrupado o standalone)
+    rutas_fuente = df_constancias_merged['original_source_path'].astype(object).tolist()
+    # Carpeta por empleado dentro de BAJAS o de Activos (incluye 'ALTA', 'DESCONOCIDO' y la carpeta '0' sin '#emp')
+    carpetas = pd.Series(np.where(es_baja, outpath_base_bajas, outpath_base_activos)) + os.sep + num_emp
+    # El nombre del archivo final es simplemente el 'nombre_archivo_nuevo'
+    destinos = (carpetas + os.sep + df_constancias_merged['nombre_archivo_nuevo'].astype('string').reset_index(drop=True)).tolist()
+
+    # Contadores por estatus (sobre todas las constancias, igual que el reporte anterior)
+    pdfs_bajas_organizados = int(es_baja.sum())
+    pdfs_activos_organizados = int((~es_baja & (num_emp != '0').to_numpy()).sum())
+    # PDFs que no tienen un número de empleado asignado (== 0) y que no tienen estatus 'BAJA' (carpeta '0')
+    pdfs_sin_num_emp_count = int((~es_baja & (num_emp == '0').to_numpy()).sum())
+    # Solo salen de la cola (se mueven) las constancias pendientes que ya tienen '#emp'
+    mover_pendiente = [ruta in rutas_pendientes and emp != '0' for ruta, emp in zip(rutas_origen, num_emp)]
+
+    max_workers = config.publicacion_pdfs.get('MAX_WORKERS', 8)
+    modos = _modos_publicacion(config)
+    pdfs_por_modo = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
         # Verificar si la 'ruta_original' existe antes de intentar crear la carpeta y copiar
-        if not os.path.exists(original_pdf_to_copy_path):
-            print(f"ADVERTENCIA: Archivo de origen no encontrado en '{original_pdf_to_copy_path}'. Se salta.")
-            pdfs_no_organizados_error_copia += 1
-            continue
-
-        # Crear la carpeta de destino (ej. 'Certificados Entrenamiento Viva Handling/12345' o 'BAJAS/54321')
-        # folder_emp = os.path.join(target_base_folder, num_emp)
-        # os.makedirs(folder_emp, exist_ok=True)
-        # Si num_emp es '0', usa la carpeta '0', sino usa el valor de num_emp
-        folder_emp = os.path.join(target_base_folder, '0' if num_emp == '0' else num_emp)
-        os.makedirs(folder_emp, exist_ok=True)
-
-
-        # El nombre del archivo final es simplemente el 'nombre_archivo_nuevo'
-        destino_pdf_path = os.path.join(folder_emp, base_new_file_name_with_ext)
-
-        try:
-            # Copiar el archivo. shutil.copy2 copia también metadatos como la fecha de modificación.
-            shutil.copy2(original_pdf_to_copy_path, destino_pdf_path)
+        existe_origen = list(executor.map(lambda ruta: bool(ruta) and os.path.exists(ruta), rutas_origen))
+        for ruta, existe in zip(rutas_origen, existe_origen):
+            if not existe:
+                print(f"ADVERTENCIA: Archivo de origen no encontrado en '{ruta}'. Se salta.")
+                pdfs_no_organizados_error_copia += 1
+
+        # Crear cada carpeta de destino una sola vez (ej. '2.Constancias_actual/12345' o 'BAJAS/54321')
+        carpetas_necesarias = carpetas[existe_origen].unique().tolist()
+        list(executor.map(lambda carpeta: os.makedirs(carpeta, exist_ok=True), carpetas_necesarias))
+
+        # Agrupar por destino: constancias con el mismo destino se copian en orden dentro de una misma tarea
+        tareas_por_destino = {}
+        for posicion, existe in enumerate(existe_origen):
+            if existe:
+                origen = rutas_origen[posicion]
+                tareas_por_destino.setdefault(destinos[posicion], []).append((posicion, origen, destinos[posicion], mover_pendiente[posicion]))
+        manifiesto = cargar_manifiesto_publicacion(config.outpath_csv_manifiesto_publicacion)
+        resultados = [resultado for grupo in executor.map(lambda tareas: _copiar_constancias_mismo_destino(tareas, manifiesto, modos), tareas_por_destino.values()) for resultado in grupo]
+
+    resultados.sort(key=lambda resultado: resultado[0])
+    for posicion, error, entrada_manifiesto, modo in resultados:
+        origen, destino = rutas_origen[posicion], destinos[posicion]
+        if error is None:
             pdfs_organizados += 1
-            # IMPORTANTE: Añadir PATH ORIGINAL del documento FUENTE (agrupado o standalone) al log.
-            _añadir_set_procesado_en_memoria(original_source_file_for_log, config)
-        except FileNotFoundError:
-            print(f"\nERROR: Archivo no encontrado en origen para copiar: '{original_pdf_to_copy_path}'\n")
+            if modo == 'sin_cambios':
+                pdfs_copias_omitidas += 1
+            elif modo == 'reemplazada':
+                pdfs_copias_reemplazadas += 1
+            else:
+                manifiesto[destino] = entrada_manifiesto
+                pdfs_por_modo[modo] = pdfs_por_modo.get(modo, 0) + 1
+            # IMPORTANTE: Añadir PATH ORIGINAL del documento FUENTE (agrupado o standalone) al log, solo si la copia fue exitosa.
+            _añadir_set_procesado_en_memoria(rutas_fuente[posicion], config)
+        elif isinstance(error, PermissionError):
+            # Destino u origen bloqueado (ej. por el cliente de sincronización): se reintenta al final sin detener el resto
+            operacion = 'mover' if mover_pendiente[posicion] else 'copiar'
+            encolar_reintento(cola_reintentos, operacion, origen, destino, error, rutas_fuente[posicion])
+            pdfs_copias_diferidas += 1
+        elif isinstance(error, FileNotFoundError):
+            print(f"\nERROR: Archivo no encontrado en origen para copiar: '{origen}'\n")
             pdfs_no_organizados_error_copia += 1
-        except Exception as e:
-            print(f"\nERROR al copiar: '{original_pdf_to_copy_path}' a '{destino_pdf_path}': {e}\n")
+        else:
+            print(f"\nERROR al copiar: '{origen}' a '{destino}': {error}\n")
             pdfs_no_organizados_error_copia += 1
 
+    if pdfs_por_modo:
+        guardar_manifiesto_publicacion(manifiesto, config.outpath_csv_manifiesto_publicacion)
+
+    anotar(archivos=pdfs_organizados - pdfs_copias_omitidas)
     print(f"\nOrganización de archivos terminada.\n")
     print(f"Total de PDFs organizados (incluye Activos, Bajas y sin #emp): {pdfs_organizados}")
+    print(f"  - Copias omitidas (sin cambios según el manifiesto de publicación): {pdfs_copias_omitidas}")
+    print(f"  - Copias reemplazadas por otra constancia con el mismo destino: {pdfs_copias_reemplazadas}")
+    print(f"  - Publicados por modo (reflink/hardlink/copia/movido): {pdfs_por_modo}")
     print(f"  - PDFs de empleados ACTIVOS organizados: {pdfs_activos_organizados}")
     print(f"  - PDFs de empleados BAJAS organizados: {pdfs_bajas_organizados}")
     print(f"  - PDFs sin número de empleado (en carpeta '0' de Activos): {pdfs_sin_num_emp_count}")
+    print(f"Total de copias bloqueadas (diferidas a la cola de reintentos): {pdfs_copias_diferidas}")
     print(f"Total de archivos que fallaron al copiar (errores FileNotFoundError/Otros): {pdfs_no_organizados_error_copia}\n")
 
-def normalizar_y_categorizar_fechas(df_constancias_merged: pd.DataFrame, mapeo_meses_map: dict, vocales_acentos_map: dict, df_hc: pd.DataFrame):
+    if cola_propia:
+        finalizar_cola_reintentos(cola_reintentos, config)
+
+def normalizar_y_categorizar_fechas(df_constancias_merged: pd.DataFrame, mapeo_meses_map: dict, vocales_acentos_map: dict, df_hc: pd.DataFrame, dtype_policy: dict = None, *, cursos_obligatorios: list, reglas_homologacion_cursos: list = None):
     """
     Normaliza las fechas de las constancias, calcula la fecha de vigencia y asigna un estatus(Vigente/Vencido).
-    Tambien crea la columna 'nombre_archivo_nuevo' con el formato "CURSO_DD-MM-YYYY_NOMBRE COMPLETO" y la columna 'curso_homologado'.
-    Además, asegura que cada empleado tenga un registro para los cursos 'SAT', 'AVSEC', 'SMS', rellenando los faltantes.
+    Tambien crea la columna 'nombre_archivo_nuevo' con el formato "CURSO_DD-MM-YYYY_NOMBRE COMPLETO" y la columna 'curso_homologado'
+    (según 'reglas_homologacion_cursos'; si no se reciben, la tabla de Config.reglas_homologacion_cursos).
+    Además, asegura que cada empleado tenga un registro para cada curso de 'cursos_obligatorios' (Config.cursos_obligatorios), rellenando los faltantes.
     """
+    if reglas_homologacion_cursos is None:
+        reglas_homologacion_cursos = Config().reglas_homologacion_cursos
+
     # 1. Procesar el DataFrame de constancias_merged (que contiene los datos reales de los PDFs)
     df_temp = df_constancias_merged.copy()
 
@@ -1081,9 +1730,7 @@ def normalizar_y_categorizar_fechas(df_constancias_merged: pd.DataFrame, mapeo_m
         df_temp['#emp'] = df_temp['#emp'].astype(int)
 
     # Parsear 'fecha' (fecha de la constancia)
-    df_temp['fecha_constancia'] = df_temp['fecha'].apply(
-        lambda x: parse_fecha_inicio(x, mapeo_meses_map))
-    df_temp['fecha_constancia'] = pd.to_datetime(df_temp['fecha_constancia'], errors='coerce').dt.normalize()
+    df_temp['fecha_constancia'] = parse_fechas_vectorizado(df_temp['fecha'], mapeo_meses_map).dt.normalize()
 
     # Calcular 'fecha_vigencia' (un año posterior a 'fecha_constancia')
     df_temp['fecha_vigencia'] = df_temp['fecha_constancia'] + pd.DateOffset(years=1)
@@ -1099,43 +1746,29 @@ def normalizar_y_categorizar_fechas(df_constancias_merged: pd.DataFrame, mapeo_m
     )
 
     # Crear columna 'curso_homologado' (con las categorías específicas como SAT(Rampa))
-    df_temp['curso_homologado'] = df_temp['curso'].apply(homologar_curso)
-    df_temp['curso_homologado'] = df_temp['curso_homologado'].fillna('OTRO')
-
-    # Crear columna 'nombre_archivo_nuevo' para las constancias existentes
-    def generate_new_filename(row, vocales_acentos_map):
-        if pd.isna(row['fecha_constancia']) or pd.isna(row['curso_homologado']) or pd.isna(row['nombre_completo']):
-            return pd.NA
-        curso_parte = limpiar_partes_archivo(row['curso_homologado'], vocales_acentos_map)
-        nombre_completo_parte = limpiar_partes_archivo(row['nombre_completo'], vocales_acentos_map)
-        fecha_parte = row['fecha_constancia'].strftime('%d-%m-%Y')
-        new_name = f"{curso_parte}_{fecha_parte}_{nombre_completo_parte}.pdf"
-        return re.sub(r'_{2,}', '_', new_name).strip('_')
-
-    df_temp['nombre_archivo_nuevo'] = df_temp.apply(lambda row: generate_new_filename(row, vocales_acentos_map), axis=1)
+    df_temp['curso_homologado'] = homologar_cursos(df_temp['curso'], reglas_homologacion_cursos)
+
+    # Crear columna 'nombre_archivo_nuevo' para las constancias existentes ("CURSO_DD-MM-YYYY_NOMBRE COMPLETO.pdf")
+    # NA si falta la fecha, el curso o el nombre
+    tiene_datos = df_temp['fecha_constancia'].notna() & df_temp['curso_homologado'].notna() & df_temp['nombre_completo'].notna()
+    nombre_archivo_nuevo = (
+        limpiar_partes_archivo_columna(df_temp['curso_homologado'], vocales_acentos_map) + '_'
+        + df_temp['fecha_constancia'].dt.strftime('%d-%m-%Y').astype(object).fillna('') + '_'
+        + limpiar_partes_archivo_columna(df_temp['nombre_completo'], vocales_acentos_map) + '.pdf'
+    )
+    nombre_archivo_nuevo = nombre_archivo_nuevo.str.replace(r'_{2,}', '_', regex=True).str.strip('_')
+    df_temp['nombre_archivo_nuevo'] = nombre_archivo_nuevo.where(tiene_datos, pd.NA)
 
     # Asegurar que #emp sea int para df_temp antes del merge
     df_temp['#emp'] = pd.to_numeric(df_temp['#emp'], errors='coerce').fillna(0).astype(int)
 
 
     # ASEGURAR TODOS LOS CURSOS POR EMPLEADO ---
-    print("\n[ETL PDF - Fechas] Consolidando datos con cursos esperados (SAT, AVSEC, SMS)...")
+    print(f"\n[ETL PDF - Fechas] Consolidando datos con cursos esperados ({', '.join(cursos_obligatorios)})...")
 
     # Filtrar Bajas de df_hc
     # df_hc = df_hc[df_hc['estatus'].str.upper() != 'BAJA']
 
-    # Obtener todos los empleados únicos de la tabla HC
-    unique_emps = df_hc['#emp'].unique()
-    required_courses_list_general = ['SAT', 'AVSEC', 'SMS'] # Cursos obligatorios genéricos
-
-    # Crear el esqueleto de todas las combinaciones esperadas de empleado y curso genérico
-    all_expected_combinations = pd.DataFrame(
-        [(emp, course) for emp in unique_emps for course in required_courses_list_general],
-        columns=['#emp', 'curso_generico_requerido'] # Usar un nombre distinto y claro
-    )
-    all_expected_combinations['#emp'] = all_expected_combinations['#emp'].astype(int) # Asegurar el tipo
-
-
     # Crear una versión genérica de 'curso_homologado' en df_temp para el merge ***
     # Esto mapea todos los SAT(Rampa), SAT(Operador) a un solo 'SAT' para la clave de merge.
     df_temp['curso_homologado_para_merge'] = df_temp['curso_homologado'].copy()
@@ -1145,14 +1778,13 @@ def normalizar_y_categorizar_fechas(df_constancias_merged: pd.DataFrame, mapeo_m
     if not df_emp_ceros.empty: 
         print(f"  - Nota: Hay {len(df_emp_ceros)} registros en constancias con '#emp' = 0 que no se podrán mapear a cursos obligatorios.")
 
-    # Realizar un left merge del esqueleto con el df_temp (constancias reales procesadas).
-    # Se usa 'curso_generico_requerido' del esqueleto y 'curso_homologado_para_merge' de df_temp.
-    df_final_expanded = pd.merge(
-        all_expected_combinations,
-        df_temp,
-        left_on=['#emp', 'curso_generico_requerido'],
-        right_on=['#emp', 'curso_homologado_para_merge'], # Usar la columna genérica para el merge
-        how='left',
+    # Matriz de todos los empleados de HC × curso genérico requerido, unida en un solo left join con df_temp
+    # (constancias reales procesadas) por 'curso_generico_requerido' vs 'curso_homologado_para_merge'.
+    df_final_expanded = construir_matriz_cobertura(
+        df_hc['#emp'], cursos_obligatorios, df_temp,
+        col_curso='curso_generico_requerido', # Usar un nombre distinto y claro
+        col_curso_registros='curso_homologado_para_merge', # Usar la columna genérica para el merge
+        dtype_emp=int, # Asegurar el tipo
         suffixes=('_expected', '_actual') # Sufijos para identificar columnas del lado derecho
     )
 
@@ -1178,15 +1810,15 @@ def normalizar_y_categorizar_fechas(df_constancias_merged: pd.DataFrame, mapeo_m
     )
     
     # Usar el nombre_completo de la constancia si existe, si no, el de HC
-    df_final_expanded['nombre_completo'] = df_final_expanded['nombre_completo'].fillna(df_final_expanded['nombre_completo_hc'])
-    df_final_expanded['estatus'] = df_final_expanded['estatus'].fillna(df_final_expanded['estatus_hc'])
+    df_final_expanded['nombre_completo'] = rellenar_nulos(df_final_expanded['nombre_completo'], df_final_expanded['nombre_completo_hc'])
+    df_final_expanded['estatus'] = rellenar_nulos(df_final_expanded['estatus'], df_final_expanded['estatus_hc'])
 
 
     # 2. Consolidar la información del curso
     # 'curso_homologado' debe ser el específico si existe (e.g., SAT(Rampa)), si no, el genérico (SAT)
     df_final_expanded['curso_homologado'] = df_final_expanded['curso_homologado'].fillna(df_final_expanded['curso_generico_requerido'])
     # 'curso' (el nombre raw del PDF) debe ser el raw si existe, si no, el genérico
-    df_final_expanded['curso'] = df_final_expanded['curso'].fillna(df_final_expanded['curso_generico_requerido'])
+    df_final_expanded['curso'] = rellenar_nulos(df_final_expanded['curso'], df_final_expanded['curso_generico_requerido'])
 
 
     # 3. Consolidar Fechas y Estatus de Vigencia
@@ -1243,15 +1875,183 @@ def normalizar_y_categorizar_fechas(df_constancias_merged: pd.DataFrame, mapeo_m
 
 
     df_final = df_final.reset_index(drop=True)
+    df_final = aplicar_politica_dtypes(df_final, dtype_policy)
 
     print(f"[ETL PDF - Fechas] DataFrame final con cursos esperados: {len(df_final)} registros.")
 
     return df_final
 
+# --- Historial canónico de constancias (Parquet particionado por año de 'fecha_constancia') ---
+# Campos que identifican una constancia; de ellos se deriva la llave 'id_constancia' (deduplicación del historial)
+_COLUMNAS_LLAVE_HISTORIAL = ['nombre_archivo_nuevo', '#emp', 'nombre_completo', 'curso_homologado', 'fecha_constancia']
+_COLUMNAS_FECHA_HISTORIAL = ['fecha_constancia', 'fecha_vigencia']
+_COLUMNA_ID_CONSTANCIA = 'id_constancia'
+_PARTICION_SIN_FECHA = 'sin_fecha'
+_MARCA_NULO_LLAVE = '\x1f' # Distingue texto nulo de texto vacío al calcular la llave
+
+def calcular_id_constancia(df: pd.DataFrame) -> pd.Series:
+    """
+    Llave estable de 64 bits (uint64) por constancia: hash determinista de pandas sobre los campos de
+    '_COLUMNAS_LLAVE_HISTORIAL' ya normalizados ('_normalizar_historial'). La misma constancia produce el mismo id
+    en cualquier ejecución, por lo que sirve para deduplicar y para rastrearla entre corridas.
+    """
+    campos = {}
+    for col in _COLUMNAS_LLAVE_HISTORIAL:
+        if col == '#emp':
+            campos[col] = df[col].to_numpy(dtype='int64')
+        elif col in _COLUMNAS_FECHA_HISTORIAL:
+            campos[col] = df[col].to_numpy(dtype='datetime64[ns]').view('int64') # NaT conserva un valor fijo
+        else:
+            campos[col] = df[col].fillna(_MARCA_NULO_LLAVE).to_numpy(dtype=object)
+    return pd.util.hash_pandas_object(pd.DataFrame(campos, index=df.index), index=False).rename(_COLUMNA_ID_CONSTANCIA)
+
+def _normalizar_historial(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Unifica tipos para que todas las particiones (y el CSV/XLSX legado) sean comparables:
+    '#emp' entero (no numérico -> 0), fechas datetime y el resto de columnas como texto.
+    Calcula 'id_constancia' para los registros que aún no la tienen (nuevos o legados).
+    """
+    df = df.copy()
+    for col in df.columns:
+        if col == _COLUMNA_ID_CONSTANCIA:
+            continue
+        if col == '#emp':
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype('int64')
+        elif col in _COLUMNAS_FECHA_HISTORIAL:
+            df[col] = pd.to_datetime(df[col], errors='coerce').astype('datetime64[ns]')
+        else:
+            df[col] = df[col].astype('string')
+    if _COLUMNA_ID_CONSTANCIA not in df.columns:
+        df[_COLUMNA_ID_CONSTANCIA] = calcular_id_constancia(df)
+    return df
+
+def _particiones_historial(df: pd.DataFrame) -> pd.Series:
+    """Nombre de partición de cada fila: año de 'fecha_constancia' o 'sin_fecha'."""
+    anios = df['fecha_constancia'].dt.year.astype('Int64').astype('string')
+    return anios.fillna(_PARTICION_SIN_FECHA)
+
+def _ruta_particion_historial(folder: str, particion: str) -> str:
+    return os.path.join(folder, f"anio={particion}.parquet")
+
+def _escribir_particion_historial(df: pd.DataFrame, ruta: str):
+    """Escribe la partición en un archivo temporal y lo reemplaza de forma atómica (no deja particiones a medias)."""
+    ruta_tmp = ruta + '.tmp'
+    df.to_parquet(ruta_tmp, engine='pyarrow', index=False, compression='snappy')
+    os.replace(ruta_tmp, ruta)
+
+def leer_historial_constancias(folder: str) -> pd.DataFrame:
+    """Lee todas las particiones del historial canónico; DataFrame vacío si aún no existe."""
+    if not os.path.isdir(folder):
+        return pd.DataFrame()
+    rutas = sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.startswith('anio=') and f.endswith('.parquet'))
+    if not rutas:
+        return pd.DataFrame()
+    return _normalizar_historial(pd.concat([pd.read_parquet(ruta) for ruta in rutas], ignore_index=True))
+
+def upsert_historial_constancias(df_nuevos: pd.DataFrame, folder: str) -> int:
+    """
+    Inserta en el historial las constancias cuya 'id_constancia' no existe todavía. Solo se leen y reescriben las
+    particiones (años) que tocan los datos nuevos; ante llaves repetidas se conserva el registro existente.
+    Regresa el número de registros añadidos.
+    """
+    os.makedirs(folder, exist_ok=True)
+    df_nuevos = _normalizar_historial(df_nuevos)
+    df_nuevos = df_nuevos[~df_nuevos[_COLUMNA_ID_CONSTANCIA].duplicated()]
+    añadidos = 0
+    for particion, df_particion in df_nuevos.groupby(_particiones_historial(df_nuevos), sort=True):
+        ruta = _ruta_particion_historial(folder, particion)
+        if os.path.exists(ruta):
+            df_existente = _normalizar_historial(pd.read_parquet(ruta))
+            df_particion = df_particion[~df_particion[_COLUMNA_ID_CONSTANCIA].isin(df_existente[_COLUMNA_ID_CONSTANCIA])]
+        else:
+            df_existente = df_particion.iloc[:0]
+        if not df_particion.empty:
+            _escribir_particion_historial(pd.concat([df_existente, df_particion], ignore_index=True), ruta)
+            añadidos += len(df_particion)
+    return añadidos
+
+def _migrar_historial_legado(config: Config):
+    """
+    Si el historial canónico aún no existe, lo inicializa una sola vez desde 'datos_constancias.csv'
+    (o 'datos_constancias.xlsx' si no hay CSV), que pasan a ser exportaciones derivadas.
+    """
+    folder = config.historial_constancias_folder
+    if not leer_historial_constancias(folder).empty:
+        return
+    for ruta, es_excel in ((config.outpath_csv_constancias, False), (config.outpath_xlsx_constancias, True)):
+        if not os.path.exists(ruta):
+            continue
+        try:
+            df_legado = pd.read_excel(ruta, dtype='string') if es_excel else pd.read_csv(ruta, dtype='string', encoding='utf-8')
+        except Exception as e:
+            print(f"ADVERTENCIA: No se pudo leer el historial existente '{ruta}' para migrarlo: {e}")
+            continue
+        # 'id_constancia' se recalcula desde los campos (en CSV/XLSX no conserva el tipo uint64)
+        añadidos = upsert_historial_constancias(df_legado.drop(columns=[_COLUMNA_ID_CONSTANCIA], errors='ignore'), folder)
+        print(f"INFO: Historial canónico inicializado con {añadidos} registros desde '{ruta}'.")
+        return
+
+def _anchos_columnas_muestra(df: pd.DataFrame, tamano_muestra: int) -> list:
+    """
+    Ancho de cada columna para Excel: el mayor entre el encabezado y el texto más largo de una muestra acotada de filas
+    (determinista), más un margen. Evita convertir todo el historial a texto solo para medirlo.
+    """
+    muestra = df.sample(n=tamano_muestra, random_state=0) if len(df) > tamano_muestra else df
+    anchos = []
+    for col in df.columns:
+        max_data_len = muestra[col].astype('string').str.len().max() if not muestra.empty else 0
+        anchos.append(max(len(col), 0 if pd.isna(max_data_len) else int(max_data_len)) + 5)
+    return anchos
+
+def _escribir_xlsx_historial(df: pd.DataFrame, file_path: str, date_cols: list, opciones: dict):
+    """
+    Escribe el historial en Excel con xlsxwriter en modo 'constant_memory': las filas se escriben en orden y en bloques,
+    y cada fila se vacía a disco al pasar a la siguiente, así que la memoria no crece con el tamaño del historial.
+    Los formatos se aplican por columna ('set_column'), que xlsxwriter usa en las celdas sin formato propio.
+    """
+    workbook = xlsxwriter.Workbook(file_path, {'constant_memory': True})
+    worksheet = workbook.add_worksheet('Historial Constancias')
+
+    # Definir formatos de celda
+    header_format = workbook.add_format({
+        'bold': True, 'font_size': 11, 'text_wrap': True,
+        'valign': 'vcenter', 'border': 1, 'align' : 'center',
+        'bg_color': '#9CEF00'
+    })
+    data_format = workbook.add_format({
+        'font_size': 11, 'text_wrap': True, 'valign': 'top'
+    })
+    date_format = workbook.add_format({
+        'font_size': 11, 'text_wrap': True, 'valign': 'top',
+        'num_format': 'dd/mm/yyyy' # Formato de fecha
+    })
+
+    # Aplicar formatos y ancho de columnas (antes de escribir filas, requisito de 'constant_memory')
+    anchos = _anchos_columnas_muestra(df, opciones.get('MUESTRA_ANCHOS', 5000))
+    for i, col in enumerate(df.columns):
+        current_data_format = date_format if col in date_cols else data_format
+        worksheet.set_column(i, i, anchos[i], current_data_format)
+    worksheet.write_row(0, 0, list(df.columns), header_format)
+
+    # Filas en bloques: nulos -> None (celda vacía) y fechas como datetime
+    filas_bloque = opciones.get('FILAS_POR_BLOQUE', 10000)
+    fila_excel = 1
+    for inicio in range(0, len(df), filas_bloque):
+        bloque = df.iloc[inicio:inicio + filas_bloque]
+        bloque = bloque.astype(object).where(bloque.notna(), None)
+        for fila in bloque.itertuples(index=False, name=None):
+            worksheet.write_row(fila_excel, 0, fila)
+            fila_excel += 1
+
+    # Aplicar autofiltros
+    worksheet.autofilter(0, 0, 0, len(df.columns) - 1)
+    workbook.close()
+
 def exportar_resultados(df_final: pd.DataFrame, config: Config): # Solo recibe config
     """
-    Exporta el DataFrame final a archivos Excel y CSV. Si los archivos existen,
-    concatena los nuevos datos, elimina duplicados y luego guarda el DataFrame combinado.
+    Inserta las constancias nuevas en el historial canónico (Parquet particionado por año, ver 'upsert_historial_constancias')
+    y regenera desde él 'datos_constancias.xlsx' y 'datos_constancias.csv' como exportaciones derivadas.
+    Si no hay registros nuevos y ambas exportaciones existen, no se reescriben.
     """
     outpath_xlsx = config.outpath_xlsx_constancias # Obtiene de config
     outpath_csv = config.outpath_csv_constancias # Obtiene de config
@@ -1260,130 +2060,37 @@ def exportar_resultados(df_final: pd.DataFrame, config: Config): # Solo recibe c
         print("Data Frame vacío, no hay resultados para exportar.")
         return
 
-    # Columnas a considerar para la deduplicación (identificador único de una constancia)
-    deduplication_subset_cols = [
-        'nombre_archivo_nuevo', '#emp', 'nombre_completo', 'curso_homologado', 'fecha_constancia'
-    ]
-
-    # Definir tipos de datos comunes para asegurar consistencia al leer archivos existentes.
-    # Leer '#emp' como string para evitar problemas con valores mixtos o nulos durante la concatenación,
-    # luego se convertirá a int al final.
-    common_dtypes = {
-        '#emp': 'string',
-        'nombre_archivo': 'string',
-        'nombre_archivo_nuevo': 'string',
-        'nombre_completo': 'string',
-        'estatus': 'string',
-        'curso_homologado': 'string',
-        'curso': 'string',
-        'instructor': 'string',
-        'grupo': 'string',
-        'fecha': 'string',
-        'estatus_vigencia': 'string',
-        'ruta_original': 'string',
-        'original_source_path': 'string'
-    }
-    date_cols = ['fecha_constancia', 'fecha_vigencia']
-
-    # Función auxiliar para procesar y guardar datos en Excel o CSV
-    def _process_and_save(df_new_data: pd.DataFrame, file_path: str, is_excel: bool):
-        df_combined = df_new_data.copy()
-        file_type = "Excel" if is_excel else "CSV"
-
-        if os.path.exists(file_path):
-            print(f"Cargando datos existentes de {file_type}: {file_path}")
-            try:
-                if is_excel:
-                    df_existing = pd.read_excel(file_path, dtype=common_dtypes, parse_dates=date_cols)
-                else: # CSV
-                    df_existing = pd.read_csv(file_path, dtype=common_dtypes, parse_dates=date_cols, encoding='utf-8')
-
-                # Asegurar que las columnas de fecha en los datos existentes estén en formato datetime
-                for col in date_cols:
-                    if col in df_existing.columns:
-                        df_existing[col] = pd.to_datetime(df_existing[col], errors='coerce')
-
-                # Convertir '#emp' a string en df_new_data para una concatenación consistente
-                if '#emp' in df_new_data.columns:
-                    df_new_data['#emp'] = df_new_data['#emp'].astype('string')
-
-                # Alinear columnas y concatenar
-                # Asegurar que todas las columnas de df_new_data estén presentes en df_existing,
-                # añadiendo las que falten con valores NaN para evitar errores de concatenación.
-                missing_cols_in_existing = set(df_new_data.columns) - set(df_existing.columns)
-                for col in missing_cols_in_existing:
-                    df_existing[col] = pd.NA # O un valor predeterminado adecuado
-
-                df_combined = pd.concat([df_existing, df_new_data], ignore_index=True)
+    _migrar_historial_legado(config)
+    añadidos = upsert_historial_constancias(df_final, config.historial_constancias_folder)
+    anotar(filas_salida=añadidos)
+    print(f"Historial canónico actualizado: {añadidos} registros nuevos de {len(df_final)} ({len(df_final) - añadidos} duplicados omitidos).")
 
-                print(f"Combinando con {len(df_existing)} registros existentes.")
-
-                # Eliminar duplicados del DataFrame combinado
-                initial_rows = len(df_combined)
-                df_combined_deduplicated = df_combined.drop_duplicates(subset=deduplication_subset_cols, keep='first')
-                rows_removed = initial_rows - len(df_combined_deduplicated)
-                print(f"Eliminados {rows_removed} registros duplicados de {file_type}.")
+    if añadidos == 0 and os.path.exists(outpath_xlsx) and os.path.exists(outpath_csv):
+        print("Sin registros nuevos; las exportaciones XLSX/CSV existentes siguen vigentes.")
+        return
 
-                df_combined = df_combined_deduplicated
+    df_combined = leer_historial_constancias(config.historial_constancias_folder)
+    date_cols = _COLUMNAS_FECHA_HISTORIAL
+    opciones_export = config.historial_constancias_export
 
-            except Exception as e:
-                print(f"ADVERTENCIA: Error al cargar y combinar el archivo {file_type} existente '{file_path}': {e}. Se exportarán solo los nuevos datos.")
-                # En caso de error, se procede solo con los nuevos datos
-                df_combined = df_new_data.copy()
-
-        # Asegurar que la columna '#emp' sea de tipo entero antes de la exportación final
-        if '#emp' in df_combined.columns:
-            # Primero, limpiar cualquier valor no numérico que pueda haber, reemplazándolos con NaN
-            df_combined['#emp'] = pd.to_numeric(df_combined['#emp'], errors='coerce')
-            # Luego, llenar NaN con 0 y convertir a entero
-            df_combined['#emp'] = df_combined['#emp'].fillna(0).astype(int)
-
-        # Ordenar el DataFrame final para una salida consistente
-        try:
-            sort_cols = [col for col in ['#emp', 'fecha_constancia', 'nombre_completo'] if col in df_combined.columns]
-            if sort_cols:
-                df_combined = df_combined.sort_values(by=sort_cols, ascending=[True, False, True], ignore_index=True)
-        except Exception as sort_e:
-            print(f"Advertencia: No se pudo ordenar el DataFrame antes de guardar: {sort_e}")
+    # Ordenar el DataFrame final para una salida consistente
+    try:
+        sort_cols = [col for col in ['#emp', 'fecha_constancia', 'nombre_completo'] if col in df_combined.columns]
+        if sort_cols:
+            df_combined = df_combined.sort_values(by=sort_cols, ascending=[True, False, True], ignore_index=True)
+    except Exception as sort_e:
+        print(f"Advertencia: No se pudo ordenar el DataFrame antes de guardar: {sort_e}")
+
+    # Función auxiliar para guardar la exportación en Excel o CSV
+    def _process_and_save(file_path: str, is_excel: bool):
+        file_type = "Excel" if is_excel else "CSV"
 
         # Exportar a Excel o CSV
         try:
             if is_excel:
-                writer = pd.ExcelWriter(file_path, engine='xlsxwriter')
-                df_combined.to_excel(writer, sheet_name='Historial Constancias', index=False)
-
-                workbook = writer.book
-                worksheet = writer.sheets['Historial Constancias']
-
-                # Definir formatos de celda
-                header_format = workbook.add_format({
-                    'bold': True, 'font_size': 11, 'text_wrap': True,
-                    'valign': 'vcenter', 'border': 1, 'align' : 'center',
-                    'bg_color': '#9CEF00'
-                })
-                data_format = workbook.add_format({
-                    'font_size': 11, 'text_wrap': True, 'valign': 'top'
-                })
-                date_format = workbook.add_format({
-                    'font_size': 11, 'text_wrap': True, 'valign': 'top',
-                    'num_format': 'dd/mm/yyyy' # Formato de fecha
-                })
-
-                # Aplicar formatos y ancho de columnas
-                for i, col in enumerate(df_combined.columns):
-                    header_len = len(col)
-                    col_series_str = df_combined[col].astype(str)
-                    max_data_len = col_series_str.map(len).max() if not col_series_str.empty else 0
-                    max_len = max(header_len, max_data_len) + 5
-
-                    current_data_format = date_format if col in date_cols else data_format
-                    worksheet.set_column(i, i, max_len, current_data_format)
-                    worksheet.write(0, i, col, header_format)
-
-                # Aplicar autofiltros
-                num_columns = len(df_combined.columns)
-                worksheet.autofilter(0, 0, 0, num_columns - 1)
-                writer.close()
+                # 'id_constancia' (uint64) no se exporta a Excel: sus números pierden precisión más allá de 15 dígitos
+                df_excel = df_combined.drop(columns=[_COLUMNA_ID_CONSTANCIA], errors='ignore')
+                _escribir_xlsx_historial(df_excel, file_path, date_cols, opciones_export)
                 print(f"\nListo, datos consolidados a {file_type}: {file_path}\n")
 
                 # Intentar abrir el archivo (solo en sistemas Windows)
@@ -1398,21 +2105,88 @@ def exportar_resultados(df_final: pd.DataFrame, config: Config): # Solo recibe c
         except Exception as e:
             print(f"\nError al exportar a {file_type}: {e}\n")
 
-    # Exportación a Excel
-    _process_and_save(df_final, outpath_xlsx, is_excel=True)
+    # Exportación a Excel y CSV en paralelo (ambas solo leen 'df_combined')
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        executor.submit(_process_and_save, outpath_xlsx, True)
+        executor.submit(_process_and_save, outpath_csv, False)
 
-    # Exportación a CSV
-    _process_and_save(df_final, outpath_csv, is_excel=False)
+# --- Checkpoint de extracción (reanudar 'run_pdf_etl' tras una falla) ---
+# Archivo JSONL con una línea por archivo fuente ya extraído: su firma (tamaño, mtime) y los registros de sus constancias.
 
-def run_pdf_etl(config: Config):
+def _firma_archivo(ruta: str) -> list:
+    estado = os.stat(ruta)
+    return [estado.st_size, estado.st_mtime_ns]
+
+def cargar_checkpoint_extraccion(path_checkpoint: str) -> dict:
+    """
+    Carga los archivos fuente extraídos en una ejecución que no terminó: {ruta_fuente: {'firma', 'agrupado', 'registros'}}.
+    Una última línea incompleta (falla a mitad de escritura) se ignora.
+    """
+    checkpoint = {}
+    if not os.path.exists(path_checkpoint):
+        return checkpoint
+    with open(path_checkpoint, 'r', encoding='utf-8') as f:
+        for linea in f:
+            try:
+                entrada = json.loads(linea)
+            except json.JSONDecodeError:
+                continue
+            checkpoint[entrada['fuente']] = entrada
+    return checkpoint
+
+def _registros_reanudables(entrada: dict, source_pdf_path: str) -> bool:
+    """El checkpoint de un archivo fuente es válido si el archivo no cambió y sus páginas temporales siguen en disco."""
+    if entrada is None or entrada['firma'] != _firma_archivo(source_pdf_path):
+        return False
+    return all(os.path.exists(registro['ruta_original']) for registro in entrada['registros'])
+
+def _confirmar_lote_checkpoint(archivo_checkpoint, lote: list):
+    """Escribe un lote de archivos fuente extraídos y lo fuerza a disco (fsync): lo confirmado sobrevive a una falla."""
+    if not lote:
+        return
+    archivo_checkpoint.write(''.join(json.dumps(entrada, ensure_ascii=False) + '\n' for entrada in lote))
+    archivo_checkpoint.flush()
+    os.fsync(archivo_checkpoint.fileno())
+    lote.clear()
+
+def _limpiar_fin_ejecucion_pdf(config: Config):
+    """
+    Cierre de una ejecución de 'run_pdf_etl' que terminó normalmente (también las que terminan antes por no tener datos):
+    elimina la carpeta temporal de páginas divididas y el checkpoint de extracción, para que la siguiente ejecución no
+    reanude desde un checkpoint obsoleto. Si la ejecución falla con una excepción, ambos se conservan para reanudar.
+    """
+    if os.path.exists(config.temp_split_pdfs_folder):
+        try:
+            shutil.rmtree(config.temp_split_pdfs_folder)
+            print(f"INFO: Carpeta temporal de PDFs divididos '{config.temp_split_pdfs_folder}' eliminada.")
+        except Exception as e:
+            print(f"ADVERTENCIA: No se pudo eliminar la carpeta temporal '{config.temp_split_pdfs_folder}' al final. Error: {e}")
+
+    # Ejecución completa: el checkpoint de extracción ya no es necesario
+    if os.path.exists(config.outpath_checkpoint_extraccion):
+        os.remove(config.outpath_checkpoint_extraccion)
+
+def run_pdf_etl(config: Config, contexto_hc: dict = None):
     """
     Función principal que orquesta el proceso de ETL de las constancias.
+    `contexto_hc` es el resultado de 'preparar_contexto_hc' con la tabla HC en memoria; si no se recibe
+    (ejecución independiente), la tabla se carga una sola vez desde 'hc_table.csv'.
     """
     print("\n--- INICIANDO ETL DE CONSTANCIAS PDF ---")
     config.processed_files_set_in_memory = _cargar_set_registros_procesados(config.outpath_processed_files_log) # Carga el log de archivos procesados en memoria
 
-    # Limpiar la carpeta temporal al inicio de la ejecución
-    if os.path.exists(config.temp_split_pdfs_folder):
+    # Checkpoint de una ejecución anterior que no terminó: se reanuda desde el último lote confirmado
+    opciones_checkpoint = config.checkpoint_extraccion
+    checkpoint = {}
+    if opciones_checkpoint.get('HABILITADO', True) and opciones_checkpoint.get('REANUDAR', True):
+        checkpoint = cargar_checkpoint_extraccion(config.outpath_checkpoint_extraccion)
+        if checkpoint:
+            print(f"INFO: Reanudando ejecución anterior: {len(checkpoint)} archivos fuente ya extraídos en el checkpoint.")
+    if not checkpoint and os.path.exists(config.outpath_checkpoint_extraccion):
+        os.remove(config.outpath_checkpoint_extraccion)
+
+    # Limpiar la carpeta temporal al inicio de la ejecución (al reanudar se conservan las páginas ya divididas)
+    if not checkpoint and os.path.exists(config.temp_split_pdfs_folder):
         try:
             shutil.rmtree(config.temp_split_pdfs_folder)
             print(f"INFO: Carpeta temporal de PDFs divididos '{config.temp_split_pdfs_folder}' limpiada.")
@@ -1420,8 +2194,17 @@ def run_pdf_etl(config: Config):
             print(f"ADVERTENCIA: No se pudo limpiar la carpeta temporal '{config.temp_split_pdfs_folder}' al inicio. Error: {e}")
     os.makedirs(config.temp_split_pdfs_folder, exist_ok=True) # Asegurarse de que exista después de limpiar o si no existía
 
+    # Datos de empleados (HC): en memoria desde el orquestador o, si se ejecuta solo, desde 'hc_table.csv'
+    if contexto_hc is None:
+        contexto_hc = preparar_contexto_hc(None, config)
+    df_hc = contexto_hc['df_hc']
+
+    # Operaciones de archivos bloqueadas (de ejecuciones anteriores y de esta): se reintentan al final sin detener el flujo
+    cola_reintentos = cargar_cola_reintentos(config.outpath_json_cola_reintentos)
+
     # Mover carpetas de empleados 'BAJA' ANTES de procesar nuevas constancias ---
-    mover_carpetas_bajas(config)
+    with medir('mover_bajas'):
+        mover_carpetas_bajas(config, contexto_hc['bajas_emp_set'], cola_reintentos)
 
     # 1. Cargar la lista de archivos (path, is_grouped_flag) desde el generador
     list_of_source_files_with_flags = cargar_rutas_archivos_desde_archivo(config.outpath_list_new_non_excluded_pdfs)
@@ -1433,51 +2216,94 @@ def run_pdf_etl(config: Config):
     total_grouped_pdfs_split = 0
     total_extracted_certificates = 0 # Cuenta las constancias individuales (páginas) extraídas
 
-    for source_pdf_path, is_grouped in list_of_source_files_with_flags:
-        if not os.path.exists(source_pdf_path):
-            print(f"Advertencia: Archivo fuente no encontrado '{source_pdf_path}'. Saltando.")
-            continue
+    archivo_checkpoint = open(config.outpath_checkpoint_extraccion, 'a', encoding='utf-8') if opciones_checkpoint.get('HABILITADO', True) else None
+    lote_checkpoint = []
+    reanudados = 0
+    try:
+        for source_pdf_path, is_grouped in list_of_source_files_with_flags:
+            if not os.path.exists(source_pdf_path):
+                print(f"Advertencia: Archivo fuente no encontrado '{source_pdf_path}'. Saltando.")
+                continue
+
+            entrada_checkpoint = checkpoint.get(source_pdf_path)
+            if _registros_reanudables(entrada_checkpoint, source_pdf_path):
+                # Ya extraído en la ejecución anterior: no se vuelve a dividir ni a leer
+                all_extracted_data.extend(entrada_checkpoint['registros'])
+                total_extracted_certificates += len(entrada_checkpoint['registros'])
+                total_grouped_pdfs_split += int(is_grouped)
+                total_files_processed_for_data_extraction += 1
+                reanudados += 1
+                continue
 
-        if is_grouped:
-            print(f"Procesando PDF agrupado: {os.path.basename(source_pdf_path)}. Dividiendo...")
-            temp_split_certs_paths = dividir_pdf_constancia_agrupado(source_pdf_path, config)
-            total_grouped_pdfs_split += 1
-            if temp_split_certs_paths:
-                print(f"Extraídas {len(temp_split_certs_paths)} páginas de '{os.path.basename(source_pdf_path)}'.")
-                for temp_path in temp_split_certs_paths:
+            registros_fuente = []
+            if is_grouped:
+                print(f"Procesando PDF agrupado: {os.path.basename(source_pdf_path)}. Dividiendo...")
+                with medir('division', archivos=1) as metricas:
+                    temp_split_certs_paths = dividir_pdf_constancia_agrupado(source_pdf_path, config)
+                    metricas['filas_salida'] = len(temp_split_certs_paths or [])
+                total_grouped_pdfs_split += 1
+                if temp_split_certs_paths:
+                    print(f"Extraídas {len(temp_split_certs_paths)} páginas de '{os.path.basename(source_pdf_path)}'.")
+                    with medir('extraccion', archivos=len(temp_split_certs_paths)):
+                        for temp_path in temp_split_certs_paths:
+                            try:
+                                # Pasa el `source_pdf_path` original al extraer datos de las páginas temporales
+                                extracted_datum = extraer_datos_constancia(temp_path, config, original_source_path=source_pdf_path)
+                                registros_fuente.append(extracted_datum)
+                                total_extracted_certificates += 1
+                            except Exception as e:
+                                print(f"Error al extraer datos de la página temporal '{os.path.basename(temp_path)}': {e}")
+                        anotar(filas_salida=len(registros_fuente))
+                else:
+                    print(f"ADVERTENCIA: No se pudieron extraer constancias válidas de '{os.path.basename(source_pdf_path)}'.")
+            else: # PDF Standalone
+                print(f"Procesando PDF standalone: {os.path.basename(source_pdf_path)}")
+                with medir('extraccion', archivos=1) as metricas:
                     try:
-                        # Pasa el `source_pdf_path` original al extraer datos de las páginas temporales
-                        extracted_datum = extraer_datos_constancia(temp_path, config, original_source_path=source_pdf_path)
-                        all_extracted_data.append(extracted_datum)
+                        # Para archivos standalone, el `original_source_path` es el mismo `source_pdf_path`
+                        extracted_datum = extraer_datos_constancia(source_pdf_path, config, original_source_path=source_pdf_path)
+                        registros_fuente.append(extracted_datum)
                         total_extracted_certificates += 1
                     except Exception as e:
-                        print(f"Error al extraer datos de la página temporal '{os.path.basename(temp_path)}': {e}")
-            else:
-                print(f"ADVERTENCIA: No se pudieron extraer constancias válidas de '{os.path.basename(source_pdf_path)}'.")
-        else: # PDF Standalone
-            print(f"Procesando PDF standalone: {os.path.basename(source_pdf_path)}")
-            try:
-                # Para archivos standalone, el `original_source_path` es el mismo `source_pdf_path`
-                extracted_datum = extraer_datos_constancia(source_pdf_path, config, original_source_path=source_pdf_path)
-                all_extracted_data.append(extracted_datum)
-                total_extracted_certificates += 1
-            except Exception as e:
-                print(f"Error al extraer datos de '{os.path.basename(source_pdf_path)}': {e}")
-
-        total_files_processed_for_data_extraction += 1
+                        print(f"Error al extraer datos de '{os.path.basename(source_pdf_path)}': {e}")
+                    metricas['filas_salida'] = len(registros_fuente)
+
+            all_extracted_data.extend(registros_fuente)
+            total_files_processed_for_data_extraction += 1
+
+            # Confirmar la extracción en lotes para poder reanudar si algo falla más adelante
+            if archivo_checkpoint is not None:
+                lote_checkpoint.append({'fuente': source_pdf_path, 'firma': _firma_archivo(source_pdf_path), 'agrupado': bool(is_grouped), 'registros': registros_fuente})
+                if len(lote_checkpoint) >= opciones_checkpoint.get('TAMANO_LOTE', 25):
+                    _confirmar_lote_checkpoint(archivo_checkpoint, lote_checkpoint)
+    finally:
+        if archivo_checkpoint is not None:
+            _confirmar_lote_checkpoint(archivo_checkpoint, lote_checkpoint)
+            archivo_checkpoint.close()
+    if reanudados:
+        print(f"INFO: {reanudados} archivos fuente se tomaron del checkpoint sin volver a extraerse.")
 
     print(f"\nProcesamiento de archivos fuente completado. Total de archivos fuente procesados: {total_files_processed_for_data_extraction}.")
     print(f"  - PDFs agrupados divididos: {total_grouped_pdfs_split}")
     print(f"  - Total de constancias individuales extraídas: {total_extracted_certificates}\n")
 
-    # 3. Cargar datos de empleados (HC)
-    df_hc = cargar_data_hc(config.hc_table_path, config.vocales_acentos)
+    # Constancias sin '#emp' de ejecuciones anteriores: se vuelven a asociar contra el HC actual (sin leer los PDFs)
+    registros_pendientes = cargar_constancias_pendientes(config.outpath_csv_constancias_pendientes)
+    rutas_pendientes = {registro['ruta_original'] for registro in registros_pendientes}
+    all_extracted_data.extend(registros_pendientes)
 
     # 4. Convertir datos extraídos a DataFrame, limpiar y fusionar con HC
-    df_constancias_merged = procesar_y_mergear_constancias(all_extracted_data, df_hc, config.vocales_acentos)
+    with medir('merge_hc', filas_entrada=len(all_extracted_data)) as metricas:
+        df_constancias_merged = procesar_y_mergear_constancias(all_extracted_data, df_hc, config.vocales_acentos, config.dtype_policy,
+                                                               cargar_reglas_correcciones(config.reglas_correcciones_path),
+                                                               contexto_hc.get('indice_nombres'), contexto_hc.get('indice_difuso'),
+                                                               config.emparejamiento_difuso)
+        metricas['filas_salida'] = len(df_constancias_merged)
 
     if df_constancias_merged.empty:
         print("El DataFrame resultante está vacío. Terminando el proceso.")
+        finalizar_cola_reintentos(cola_reintentos, config)
+        _limpiar_fin_ejecucion_pdf(config)
         return
 
     # Asegurar que 'original_source_path' sea de tipo string antes de pasarlo a otras funciones
@@ -1486,28 +2312,38 @@ def run_pdf_etl(config: Config):
     else:
         df_constancias_merged['original_source_path'] = '' # Fallback, no debería ocurrir si extraer_datos_constancia funciona bien
 
-    # 5. Identificar y reportar constancias sin número de empleado
+    # 5. Identificar y reportar constancias sin número de empleado, y actualizar la cola de pendientes
     identificar_y_reportar_constancias_sin_coincidencia(df_constancias_merged, config)
+    promovidas = int((df_constancias_merged['ruta_original'].isin(rutas_pendientes) & (df_constancias_merged['#emp'] != 0)).sum())
+    if promovidas:
+        print(f"INFO: {promovidas} constancias pendientes fueron asociadas a un '#emp' en esta ejecución.")
+    guardar_constancias_pendientes(df_constancias_merged, rutas_pendientes, config, cola_reintentos)
 
     # 6. Normalizar fechas y asignar estado de vigencia, y crear 'nombre_archivo_nuevo'
-    df_final = normalizar_y_categorizar_fechas(df_constancias_merged, config.mapeo_meses, config.vocales_acentos, df_hc)
+    with medir('normalizacion_fechas', filas_entrada=len(df_constancias_merged)) as metricas:
+        df_final = normalizar_y_categorizar_fechas(df_constancias_merged, config.mapeo_meses, config.vocales_acentos, df_hc, config.dtype_policy,
+                                            cursos_obligatorios=config.cursos_obligatorios, reglas_homologacion_cursos=config.reglas_homologacion_cursos)
+        metricas['filas_salida'] = len(df_final)
     if df_final.empty:
         print("El DataFrame final está vacío incluso después de añadir cursos esperados. Terminando el proceso.")
+        finalizar_cola_reintentos(cola_reintentos, config)
+        _guardar_registro_procesado_a_disco(config) # La cola de pendientes ya registró sus archivos fuente
+        _limpiar_fin_ejecucion_pdf(config)
         return
     
     # 7. Organizar los archivos PDF en carpetas por empleado
-    organizar_archivos_pdf(df_final, config)
+    with medir('organizacion', filas_entrada=len(df_final)):
+        organizar_archivos_pdf(df_final, config, rutas_pendientes, cola_reintentos)
 
     # 8. Exportar resultados
-    exportar_resultados(df_final, config)
+    with medir('exportacion', filas_entrada=len(df_final)):
+        exportar_resultados(df_final, config)
+
+    # Reintentar las operaciones de archivos diferidas y persistir las que sigan bloqueadas
+    with medir('cola_reintentos', filas_entrada=len(cola_reintentos)):
+        finalizar_cola_reintentos(cola_reintentos, config)
 
     # Guardar el set único de archivos procesados a disco
     _guardar_registro_procesado_a_disco(config)
 
-    # Limpiar la carpeta temporal al final de la ejecución
-    if os.path.exists(config.temp_split_pdfs_folder):
-        try:
-            shutil.rmtree(config.temp_split_pdfs_folder)
-            print(f"INFO: Carpeta temporal de PDFs divididos '{config.temp_split_pdfs_folder}' eliminada.")
-        except Exception as e:
-            print(f"ADVERTENCIA: No se pudo eliminar la carpeta temporal '{config.temp_split_pdfs_folder}' al final. Error: {e}")
\ No newline at end of file
+    _limpiar_fin_ejecucion_pdf(config)
\ No newline at end of file
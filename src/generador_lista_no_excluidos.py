@@ -3,6 +3,7 @@ import fitz
 from datetime import datetime
 
 from .config import Config
+from .metricas import anotar
 
 # --- 1. FUNCIÓN CARGAR SET REGISTROS(log) PROCESADOS ---
 def _cargar_set_registros_procesados(log_file_path):
@@ -143,6 +144,7 @@ def generador_lista_archivos_no_excluidos(config: Config): # La función ahora a
                 new_non_excluded_file_paths_for_export.append(f"{full_pdf_path}|{'grouped' if is_grouped else 'standalone'}")
 
     # --- 3. REPORTE FINAL ---
+    anotar(archivos=total_archivos_encontrados, filas_salida=len(new_non_excluded_file_paths_for_export))
     total_pdfs_excluidos = total_pdfs_excluidos_por_regla + total_pdfs_excluidos_por_fecha
     print(f"\n[SCRIPT NO DIARIO] Reporte de la generación de la lista de archivos NO excluidos:")
     print(f"  Total de archivos PDF encontrados (incluyendo excluidos y agrupados): {total_archivos_encontrados}")
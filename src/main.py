@@ -1,4 +1,5 @@
 import sys
+import argparse
 import os
 from datetime import datetime
 
@@ -16,13 +17,17 @@ if project_root not in sys.path:
 from src.config import Config
 from src.etl_bd_hc import run_hc_etl
 from src.generador_lista_no_excluidos import generador_lista_archivos_no_excluidos
-from src.etl_pdf_entrenamiento import run_pdf_etl
+from src.etl_pdf_entrenamiento import run_pdf_etl, preparar_contexto_hc, cargar_cola_reintentos
+from src.ejecutor_etapas import crear_etapa, ejecutar_etapas
+from src.metricas import iniciar_metricas, guardar_reporte_metricas, habilitar_perfil_regex
 
 def main_orchestrator():
     """
     Función principal que orquesta la ejecución de todos los procesos ETL.
     """
     print(f"\n--- INICIANDO PROCESO ETL COMPLETO - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---")
+    iniciar_metricas()
+    config = None
 
     try:
         # 1. Cargar configuración centralizada
@@ -30,23 +35,47 @@ def main_orchestrator():
         config = Config()
         print("[Orquestador] Configuración cargada y carpetas de salida verificadas.")
 
-        # 2. Ejecutar el ETL de la Base de Datos de Capital Humano (etl_bd_hc.py)
-        # Este paso genera el 'hc_table.csv' necesario para el siguiente script.
-        print("\n[Orquestador] Ejecutando ETL de Base de Datos de Capital Humano (etl_bd_hc.py)...")
-        run_hc_etl(config)
-        print("[Orquestador] ETL de Base de Datos de Capital Humano completado exitosamente.")
+        # 2. Definir las etapas con sus entradas y salidas. El código de cada etapa y 'config.py' son entradas, para que
+        # un cambio de reglas o de lógica vuelva a ejecutarla aunque los datos no hayan cambiado.
+        codigo_config = os.path.join(script_dir, 'config.py')
+        etapas = [
+            # ETL de la Base de Datos de Capital Humano (etl_bd_hc.py): genera 'hc_table.csv' y las tablas del dashboard;
+            # la tabla HC se entrega en memoria al ETL de PDFs.
+            crear_etapa(
+                'ETL HC',
+                lambda resultados: run_hc_etl(config)[0],
+                entradas=[*config.hc_etl_files.values(), *config.hc_etl_folders.values(), os.path.join(script_dir, 'etl_bd_hc.py'), codigo_config],
+                salidas=[os.path.join(config.dashboard_tables_folder, nombre) for nombre in config.hc_etl_out_filenames.values()],
+            ),
+            # Lista de archivos PDF no excluidos (generador_lista_no_excluidos.py): no depende del ETL HC, corre en paralelo.
+            crear_etapa(
+                'Lista PDFs no excluidos',
+                lambda resultados: generador_lista_archivos_no_excluidos(config),
+                entradas=[*config.source_folders_pdfs, config.outpath_processed_files_log, os.path.join(script_dir, 'generador_lista_no_excluidos.py'), codigo_config],
+                salidas=[config.outpath_list_new_non_excluded_pdfs],
+            ),
+            # ETL de Constancias PDF (etl_pdf_entrenamiento.py): usa la tabla HC en memoria si el ETL HC se ejecutó
+            # (si se omitió, la lee de 'hc_table.csv'). Se ejecuta siempre que haya operaciones de archivos pendientes de reintento.
+            crear_etapa(
+                'ETL Constancias PDF',
+                lambda resultados: run_pdf_etl(config, contexto_hc=preparar_contexto_hc(resultados.get('ETL HC'), config)),
+                entradas=[config.hc_table_path, config.outpath_list_new_non_excluded_pdfs, config.outpath_processed_files_log,
+                          config.outpath_csv_constancias_pendientes, config.outpath_json_cola_reintentos, config.outpath_checkpoint_extraccion,
+                          config.reglas_correcciones_path, os.path.join(script_dir, 'etl_pdf_entrenamiento.py'), codigo_config],
+                salidas=[config.historial_constancias_folder, config.outpath_xlsx_constancias, config.outpath_csv_constancias,
+                         config.outpath_processed_files_log, config.outpath_csv_constancias_pendientes, config.outpath_json_cola_reintentos,
+                         config.outpath_checkpoint_extraccion],
+                forzar=lambda: bool(cargar_cola_reintentos(config.outpath_json_cola_reintentos)),
+            ),
+        ]
 
-        # 3. Generar la lista de archivos PDF no excluidos (generador_lista_no_excluidos.py)
-        # Este paso crea 'lista_pdfs_nuevos_no_excluidos.txt' que es la entrada para el ETL de PDFs.
-        print("\n[Orquestador] Generando lista de archivos PDF no excluidos (generador_lista_no_excluidos.py)...")
-        generador_lista_archivos_no_excluidos(config)
-        print("[Orquestador] Generación de lista de PDFs no excluidos completada exitosamente.")
+        # 3. Ejecutar las etapas (las independientes en paralelo; las que no tienen cambios se omiten)
+        ejecutar_etapas(etapas, config.outpath_json_estado_etapas,
+                        config.ejecucion_etapas.get('MAX_WORKERS', 2), config.ejecucion_etapas.get('OMITIR_SIN_CAMBIOS', True))
 
-        # 4. Ejecutar el ETL de Constancias PDF (etl_pdf_entrenamiento.py)
-        # Este paso utiliza 'hc_table.csv' y 'lista_pdfs_nuevos_no_excluidos.txt'.
-        print("\n[Orquestador] Ejecutando ETL de Constancias PDF (etl_pdf_entrenamiento.py)...")
-        run_pdf_etl(config)
-        print("[Orquestador] ETL de Constancias PDF completado exitosamente.")
+        # 4. Reporte de métricas por etapa y sub-paso (y su historial)
+        if config.metricas_ejecucion.get('HABILITADO', True):
+            guardar_reporte_metricas(config)
 
         print(f"\n--- PROCESO ETL COMPLETO FINALIZADO EXITOSAMENTE - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---")
 
@@ -54,7 +83,17 @@ def main_orchestrator():
         print(f"\n!!! ERROR CRÍTICO EN EL PROCESO ETL !!! - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"Error: {e}")
         print("El proceso ha sido interrumpido.")
+        if config is not None and config.metricas_ejecucion.get('HABILITADO', True):
+            try:
+                guardar_reporte_metricas(config, 'ERROR', str(e))
+            except Exception as error_metricas:
+                print(f"ADVERTENCIA: No se pudo guardar el reporte de métricas. Error: {error_metricas}")
         sys.exit(1) # Salir con un código de error
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Orquestador del proceso ETL completo.")
+    parser.add_argument('--perfil-regex', action='store_true',
+                        help="Registra llamadas, coincidencias y tiempo de cada patrón de extracción en el reporte de métricas (equivale a ETL_PERFIL_REGEX=1).")
+    if parser.parse_args().perfil_regex:
+        habilitar_perfil_regex()
     main_orchestrator()
\ No newline at end of file
@@ -0,0 +1,196 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError: # Windows: el pico de memoria se lee con GetProcessMemoryInfo
+    resource = None
+
+from .config import Config
+
+# Pasos medidos en la ejecución actual: {ruta del paso: métricas acumuladas}. Las llamadas repetidas de un mismo paso
+# (p. ej. 'extraccion' por cada archivo fuente) se acumulan en un solo registro.
+_pasos = {}
+_candado = threading.Lock()
+_inicio = {'fecha': None, 'tiempo': None, 'cpu': None}
+# Paso en curso del hilo actual (ruta y registro), para anidar sub-pasos y anotar conteos desde las funciones
+_paso_actual = contextvars.ContextVar('paso_actual', default=(None, None))
+
+# Perfilado opcional de las expresiones regulares de la extracción: {clave del patrón: llamadas, coincidencias y tiempo}.
+# Se activa con la variable de entorno 'ETL_PERFIL_REGEX=1' o con 'python src/main.py --perfil-regex'.
+_regex = {}
+_perfil_regex = {'habilitado': os.environ.get('ETL_PERFIL_REGEX', '').strip().lower() in ('1', 'true', 'si', 'sí')}
+
+_CONTEOS = ('filas_entrada', 'filas_salida', 'archivos')
+_TIEMPO_MINIMO_REGRESION = 1.0 # Segundos; por debajo de esto la variación entre ejecuciones es ruido
+
+# --- 1. MEDICIÓN ---
+def _rss_pico_proceso_mb():
+    """
+    Pico de memoria residente de todo el proceso (MB) desde que inició, no solo del paso en curso: un paso que usa poca
+    memoria reporta el pico de los pasos anteriores o paralelos. None si no se puede obtener.
+    """
+    try:
+        if resource is not None:
+            pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return round(pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024, 1) # macOS reporta bytes; Linux, KB
+        import ctypes
+        from ctypes import wintypes
+
+        class _ContadoresMemoria(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        contadores = _ContadoresMemoria()
+        contadores.cb = ctypes.sizeof(contadores)
+        proceso = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(proceso, ctypes.byref(contadores), contadores.cb):
+            return None
+        return round(contadores.PeakWorkingSetSize / (1024 * 1024), 1)
+    except Exception:
+        return None
+
+def iniciar_metricas():
+    """Descarta las métricas anteriores y marca el inicio de la ejecución."""
+    with _candado:
+        _pasos.clear()
+        _regex.clear()
+        _inicio.update(fecha=datetime.now(), tiempo=time.perf_counter(), cpu=time.process_time())
+
+@contextmanager
+def medir(paso: str, **conteos):
+    """
+    Mide un paso: tiempo de reloj, tiempo de CPU del proceso (incluye lo que corre en paralelo, p. ej. otra etapa),
+    pico de memoria residente del proceso al terminar ('rss_pico_proceso_mb', acumulado desde el inicio del proceso, no
+    exclusivo del paso) y los conteos recibidos ('filas_entrada', 'filas_salida', 'archivos').
+    Entrega el registro del paso para completar los conteos dentro del bloque. Los pasos anidados en el mismo hilo
+    se registran como 'padre / hijo'. El paso se registra aunque el bloque lance una excepción.
+    """
+    ruta_padre, _ = _paso_actual.get()
+    ruta = f"{ruta_padre} / {paso}" if ruta_padre else paso
+    registro = dict(conteos)
+    token = _paso_actual.set((ruta, registro))
+    inicio_tiempo, inicio_cpu = time.perf_counter(), time.process_time()
+    try:
+        yield registro
+    finally:
+        _paso_actual.reset(token)
+        registro['tiempo_s'] = time.perf_counter() - inicio_tiempo
+        registro['cpu_s'] = time.process_time() - inicio_cpu
+        registro['rss_pico_proceso_mb'] = _rss_pico_proceso_mb()
+        _acumular_paso(ruta, registro)
+
+def anotar(**conteos):
+    """Suma conteos al paso en curso del hilo actual (sin efecto si no hay un paso en medición)."""
+    _, registro = _paso_actual.get()
+    if registro is None:
+        return
+    for clave, valor in conteos.items():
+        registro[clave] = registro.get(clave, 0) + valor
+
+def _acumular_paso(ruta: str, registro: dict):
+    with _candado:
+        acumulado = _pasos.setdefault(ruta, {'paso': ruta, 'llamadas': 0, 'tiempo_s': 0.0, 'cpu_s': 0.0, 'rss_pico_proceso_mb': None})
+        acumulado['llamadas'] += 1
+        acumulado['tiempo_s'] += registro.pop('tiempo_s')
+        acumulado['cpu_s'] += registro.pop('cpu_s')
+        rss = registro.pop('rss_pico_proceso_mb')
+        if rss is not None:
+            acumulado['rss_pico_proceso_mb'] = max(rss, acumulado['rss_pico_proceso_mb'] or 0)
+        for clave, valor in registro.items():
+            if clave in _CONTEOS:
+                acumulado[clave] = acumulado.get(clave, 0) + valor
+            else:
+                acumulado[clave] = valor
+
+def habilitar_perfil_regex(habilitado: bool = True):
+    """Activa (o desactiva) el perfilado de expresiones regulares para el resto del proceso."""
+    _perfil_regex['habilitado'] = habilitado
+
+def buscar_regex(clave: str, funcion, patron, texto: str, flags: int = 0):
+    """
+    Ejecuta 'funcion(patron, texto, flags)' (re.search, re.findall...). Con el perfilado activo, acumula para 'clave'
+    (p. ej. 'SMS.grupo[3]': tipo de constancia, campo y nivel de respaldo) las llamadas, las coincidencias y el tiempo.
+    """
+    if not _perfil_regex['habilitado']:
+        return funcion(patron, texto, flags)
+    inicio = time.perf_counter()
+    resultado = funcion(patron, texto, flags)
+    segundos = time.perf_counter() - inicio
+    with _candado:
+        acumulado = _regex.setdefault(clave, {'patron': clave, 'llamadas': 0, 'coincidencias': 0, 'tiempo_s': 0.0})
+        acumulado['llamadas'] += 1
+        acumulado['coincidencias'] += int(bool(resultado))
+        acumulado['tiempo_s'] += segundos
+    return resultado
+
+# --- 2. REPORTE E HISTORIAL ---
+def _comparar_con_historial(reporte: dict, historial: list, umbral: float):
+    """Reporta los pasos (de al menos un segundo) cuyo tiempo supera 'umbral' veces la mediana de las ejecuciones exitosas anteriores."""
+    tiempos_previos = {}
+    for ejecucion in historial:
+        if ejecucion.get('estado') != 'OK':
+            continue
+        for paso in ejecucion.get('pasos', []):
+            tiempos_previos.setdefault(paso['paso'], []).append(paso['tiempo_s'])
+    for paso in reporte['pasos']:
+        previos = sorted(tiempos_previos.get(paso['paso'], []))
+        if not previos or paso.get('omitida'):
+            continue
+        mediana = previos[len(previos) // 2]
+        if paso['tiempo_s'] >= _TIEMPO_MINIMO_REGRESION and paso['tiempo_s'] > umbral * mediana:
+            print(f"ADVERTENCIA: El paso '{paso['paso']}' tardó {paso['tiempo_s']:.1f}s (mediana de las últimas {len(previos)} ejecuciones: {mediana:.1f}s).")
+
+def guardar_reporte_metricas(config: Config, estado: str = 'OK', error: str = None) -> dict:
+    """
+    Escribe el reporte de la ejecución actual en 'metricas_ejecucion.json' y lo añade a 'historial_metricas.jsonl'
+    (una ejecución por línea; se conservan las últimas 'MAX_EJECUCIONES_HISTORIAL'). Retorna el reporte.
+    """
+    opciones = config.metricas_ejecucion
+    with _candado:
+        pasos = [{clave: (round(valor, 3) if isinstance(valor, float) else valor) for clave, valor in paso.items()} for paso in _pasos.values()]
+        inicio = dict(_inicio)
+        regex = sorted(({**patron, 'tiempo_s': round(patron['tiempo_s'], 6)} for patron in _regex.values()), key=lambda patron: -patron['tiempo_s'])
+    reporte = {
+        'inicio': inicio['fecha'].strftime('%Y-%m-%d %H:%M:%S') if inicio['fecha'] else None,
+        'fin': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'estado': estado,
+        'error': error,
+        'tiempo_s': round(time.perf_counter() - inicio['tiempo'], 3) if inicio['tiempo'] is not None else None,
+        'cpu_s': round(time.process_time() - inicio['cpu'], 3) if inicio['cpu'] is not None else None,
+        'rss_pico_proceso_mb': _rss_pico_proceso_mb(),
+        'pasos': pasos,
+    }
+    if _perfil_regex['habilitado']:
+        reporte['regex'] = regex
+        sin_coincidencias = [patron['patron'] for patron in regex if patron['coincidencias'] == 0]
+        if sin_coincidencias:
+            print(f"INFO: Patrones de extracción sin ninguna coincidencia en esta ejecución: {', '.join(sorted(sin_coincidencias))}")
+
+    historial = []
+    if os.path.exists(config.outpath_jsonl_historial_metricas):
+        with open(config.outpath_jsonl_historial_metricas, 'r', encoding='utf-8') as f:
+            for linea in f:
+                try:
+                    historial.append(json.loads(linea))
+                except json.JSONDecodeError:
+                    continue
+    _comparar_con_historial(reporte, historial, opciones.get('UMBRAL_REGRESION', 1.5))
+    historial = (historial + [reporte])[-opciones.get('MAX_EJECUCIONES_HISTORIAL', 200):]
+
+    for ruta, contenido in ((config.outpath_json_metricas, json.dumps(reporte, ensure_ascii=False, indent=2)),
+                            (config.outpath_jsonl_historial_metricas, ''.join(json.dumps(ejecucion, ensure_ascii=False) + '\n' for ejecucion in historial))):
+        with open(ruta + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(contenido)
+        os.replace(ruta + '.tmp', ruta)
+    print(f"INFO: Métricas de la ejecución guardadas en '{config.outpath_json_metricas}' ({len(pasos)} pasos).")
+    return reporte
@@ -0,0 +1,53 @@
+"""
+Paridad entre 'parse_fechas_vectorizado' y el parser de referencia 'parse_fecha_inicio'.
+
+Se compara sobre textos de fecha representativos de cada alternativa de la cascada y, si existe, sobre la columna
+'fecha' del historial real ('datos_constancias.csv').
+"""
+import sys
+import os
+
+import pandas as pd
+import pytest
+
+# Obtener la ruta de la carpeta raíz del proyecto para importar el paquete 'src' (igual que src/main.py)
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.config import Config
+from src.etl_pdf_entrenamiento import parse_fecha_inicio, parse_fechas_vectorizado
+
+FECHAS_MUESTRA = [
+    '25 de septiembre de 2025', '5 de Enero del 2025', '1 DE MARZO DE 2024',    # dd de mes (de)
+    '10 al 12 de junio de 2024', '3 a 5 julio 2025',                             # dd al dd mes
+    '29 JUNIO-2024.', '12-13 agosto 2025', '07-octubre-2024',                    # dd-dd mes
+    'Lun 14 noviembre 2024', 'vie-8-diciembre-2023',                             # dia dd mes
+    'Impartido el 4 mayo 2025', 'Fecha: 9 abril, 2024',                          # dd mes
+    '31 de febrero de 2025', '15 de mesinventado de 2025', 'sin fecha', '2025',  # no parseables (NaT)
+    '20 de mayo de 2024 / 20252026', '', '   ', None, float('nan'), 20250101,
+]
+
+def _comparar(serie_fechas: pd.Series, mapeo_meses: dict) -> pd.DataFrame:
+    esperado = pd.to_datetime(serie_fechas.apply(lambda x: parse_fecha_inicio(x, mapeo_meses)), errors='coerce')
+    obtenido = parse_fechas_vectorizado(serie_fechas, mapeo_meses)
+    difieren = ~((esperado == obtenido) | (esperado.isna() & obtenido.isna()))
+    return pd.DataFrame({'fecha': serie_fechas, 'esperado': esperado, 'obtenido': obtenido})[difieren]
+
+@pytest.fixture(scope='module')
+def config():
+    return Config()
+
+def test_paridad_fechas_muestra(config):
+    serie_fechas = pd.Series(FECHAS_MUESTRA, dtype=object)
+    diferencias = _comparar(serie_fechas, config.mapeo_meses)
+    assert diferencias.empty, diferencias.to_string()
+    # La muestra debe ejercitar fechas válidas, no solo NaT
+    assert parse_fechas_vectorizado(serie_fechas, config.mapeo_meses).notna().sum() >= 10
+
+def test_paridad_fechas_historial(config):
+    if not os.path.exists(config.outpath_csv_constancias):
+        pytest.skip(f"No existe el historial '{config.outpath_csv_constancias}'.")
+    df_historial = pd.read_csv(config.outpath_csv_constancias, dtype={'fecha': 'string'}, usecols=['fecha'], encoding='utf-8')
+    diferencias = _comparar(df_historial['fecha'].astype(object), config.mapeo_meses)
+    assert diferencias.empty, diferencias.head(50).to_string()